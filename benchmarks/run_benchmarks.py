@@ -0,0 +1,177 @@
+
+"""
+run_benchmarks.py
+
+Micro-benchmarks of the simulation kernels (get_c, firing.fr, make_step, TreeManager.simulate_step)
+and macro-benchmarks of full run_simulation calls at several (GROWTH_RATE, REP_TIME) regimes with
+increasing multifork depth. Results are written as JSON so that two runs can be compared.
+
+Usage:
+    python -m benchmarks.run_benchmarks --config src/configs/base.yaml
+    python -m benchmarks.run_benchmarks --config src/configs/base.yaml --compare results/benchmarks/old.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import time
+import timeit
+import tracemalloc
+from dataclasses import replace
+import numpy as np
+from src.utils.config_loader import load_config
+from src.utils.helpers import get_c
+from src.utils.setup import initialize_n_nforks, initial_tree, term_init_cycles
+from src.utils.optimal_parameters import make_optimal_config
+from src.utils.compiled_config import compile_config
+from src.simulation.cycle_updates import make_step
+from src.simulation.run_simulation import run_simulation
+import src.model.firing_rate as firing
+
+# (doubling time, replication time) pairs: one, two and four overlapping replication cycles
+REGIMES = {
+    "single_overlap": (35., 40.),
+    "base": (25., 40.),
+    "deep_multifork": (20., 60.),
+}
+
+def time_call(func, n_calls, repeat=5):
+    """
+        Times n_calls calls of func, repeated `repeat` times. Returns the per-call time in microseconds.
+    """
+    timer = timeit.Timer(func)
+    times = np.array(timer.repeat(repeat=repeat, number=n_calls))/n_calls*1e6
+    return {"best_us": float(times.min()), "mean_us": float(times.mean()), "calls": n_calls}
+
+def regime_config(cfg, tau, rep_time, t_max):
+    cfg = replace(cfg,
+                  model=replace(cfg.model, GROWTH_RATE=np.log(2.)/tau, REP_TIME=rep_time),
+                  simulation=replace(cfg.simulation, T_MAX=t_max))
+    return make_optimal_config(cfg)
+
+def bench_simulate_step(cfg, n_steps):
+    """
+        Runs the main loop of run_simulation for n_steps steps, timing only simulate_step, so that
+        the tree has the realistic number of origins and forks.
+    """
+    params = compile_config(cfg)
+    n_tot, n_forks = initialize_n_nforks(cfg)
+    tree_manager = initial_tree(params)
+    chi = params.CHI
+    volume, alpha, time_ = 1., 0.999, 0.
+    a_atp, a_adp = alpha*params.DNAA_CONCENTRATION, (1.-alpha)*params.DNAA_CONCENTRATION
+    elapsed = 0.
+    for _ in range(n_steps):
+        time_, a_atp, a_adp, c_atp, c_adp, volume, n_tot, f_rate = make_step(n_forks, n_tot, volume, a_atp, a_adp, time_,
+                                                                           params.DT, params.COOP, chi,
+                                                                           step=False, params=params)
+        tree_manager.update(time_, f_rate, volume, n_tot)
+        start = time.perf_counter()
+        tree_manager.simulate_step(params)
+        elapsed += time.perf_counter() - start
+        n_tot, volume, n_forks = tree_manager.n_tot, tree_manager.volume, tree_manager.n_forks
+    return {"best_us": elapsed/n_steps*1e6, "mean_us": elapsed/n_steps*1e6, "calls": n_steps}
+
+def kernel_benchmarks(cfg, n_calls):
+    m = cfg.model
+    dnaa, n_tot, volume, alpha = m.DNAA_CONCENTRATION, 975., 1.1, 0.1
+    c = get_c(dnaa, m.K, n_tot/volume)
+    a_atp, a_adp, c_atp, c_adp = alpha*dnaa, (1.-alpha)*dnaa, alpha*c, (1.-alpha)*c
+    params = compile_config(cfg)
+    chi = params.CHI
+    return {
+        "get_c": time_call(lambda: get_c(dnaa, m.K, n_tot/volume), n_calls),
+        "firing.fr": time_call(lambda: firing.fr(a_atp, a_adp, c_atp, c_adp, m.COOP, kori=m.K_OPEN,
+                                                 ori_sites=m.ORIGIN_SITES, epsilon_cost=m.E_COST,
+                                                 k_max=m.FIRING_MAX), n_calls),
+        "compile_config": time_call(lambda: compile_config.__wrapped__(cfg), max(n_calls//100, 1)),
+        "make_step": time_call(lambda: make_step(4, n_tot, volume, a_atp, a_adp, 0., params.DT, params.COOP, chi,
+                                                 step=False, params=params), n_calls),
+        "simulate_step": bench_simulate_step(cfg, n_calls),
+    }
+
+def simulation_benchmarks(cfg, t_max, memory=True):
+    results = {}
+    for name, (tau, rep_time) in REGIMES.items():
+        cfg_regime = regime_config(cfg, tau, rep_time, t_max)
+        _, _, _, cycles = term_init_cycles(cfg_regime)
+        start = time.perf_counter()
+        simulation_data = run_simulation(cfg_regime)
+        elapsed = time.perf_counter() - start
+        n_steps = len(simulation_data["time"])
+        results[name] = {
+            "tau": tau,
+            "REP_TIME": rep_time,
+            "cycles": int(cycles),
+            "max_origins": int(max(simulation_data["origins"])),
+            "steps": n_steps,
+            "seconds": elapsed,
+            "steps_per_second": n_steps/elapsed,
+        }
+        del simulation_data
+        if memory:
+            tracemalloc.start()
+            run_simulation(cfg_regime)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name]["peak_memory_mb"] = peak/2**20
+    return results
+
+def compare(current, previous):
+    """
+        Prints the ratio previous/current of the timings (>1 means the current run is faster).
+    """
+    print("%-32s %12s %12s %8s"%("benchmark", "previous", "current", "speedup"))
+    for name, values in current["kernels"].items():
+        if name in previous.get("kernels", {}):
+            old, new = previous["kernels"][name]["best_us"], values["best_us"]
+            print("%-32s %10.3fus %10.3fus %8.2f"%(name, old, new, old/new))
+    for name, values in current["simulations"].items():
+        if name in previous.get("simulations", {}):
+            old, new = previous["simulations"][name]["steps_per_second"], values["steps_per_second"]
+            print("%-32s %10.0f/s %10.0f/s %8.2f"%("run_simulation[%s]"%name, old, new, new/old))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the simulation kernels and full simulations."
+    )
+    parser.add_argument("--config", default="src/configs/base.yaml", metavar="YAML_FILE",
+                        help="Path to the YAML config (e.g., src/configs/base.yaml)")
+    parser.add_argument("--output", default="results/benchmarks", metavar="DIR",
+                        help="Directory where the JSON results are written")
+    parser.add_argument("--compare", default=None, metavar="JSON_FILE",
+                        help="Previous benchmark results to compare against")
+    parser.add_argument("--calls", type=int, default=20000, help="Calls per kernel benchmark")
+    parser.add_argument("--t-max", type=float, default=2000., help="Simulated time of the macro benchmarks")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory measurements")
+    args = parser.parse_args()
+
+    cfg = make_optimal_config(load_config(args.config))
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "config": args.config,
+        "kernels": kernel_benchmarks(cfg, args.calls),
+        "simulations": simulation_benchmarks(cfg, args.t_max, memory=not args.no_memory),
+    }
+    for name, values in results["kernels"].items():
+        print("%-16s %8.3f us/call"%(name, values["best_us"]))
+    for name, values in results["simulations"].items():
+        print("%-16s %10.0f steps/s  cycles=%d  peak=%s MB"%(name, values["steps_per_second"], values["cycles"],
+                                                          "%.1f"%values["peak_memory_mb"] if "peak_memory_mb" in values else "-"))
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, "bench_%s.json"%time.strftime("%Y%m%d_%H%M%S"))
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print("results written to", path)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+validate_engines.py
+
+Statistical equivalence of candidate simulation engines with the reference engine
+(run_simulation + TreeManager).
+
+Every engine is run on a panel of configs (the regimes of run_benchmarks) for several seeds. From
+each run, after a burn-in, the harness collects:
+    - initiation volumes and inter-division times (continuous: two-sample Kolmogorov-Smirnov test),
+    - the number of forks and of origins, sampled at uniformly random times (seeded per run), one
+      every `thin` minutes on average, about one cell cycle so that the samples are nearly
+      independent (discrete: chi-square test on the contingency table of the two samples). A
+      fixed grid would lock to the phase of the cell cycle and give the same sequence in every
+      run, whatever the engine.
+The relative differences of the mean and of the standard deviation get confidence intervals from a
+bootstrap over whole runs (samples within a run are correlated). A comparison
+    - is "equivalent" if both intervals lie inside the tolerance bands,
+    - fails if one interval lies entirely above its band (a difference that matters), or if the
+      test rejects at level alpha (Bonferroni-corrected over all comparisons of the engine) and
+      the difference is not shown to be inside the bands,
+    - passes otherwise (no evidence of a difference).
+The wall time of each engine gives its speedup with respect to the reference.
+
+Engines are functions engine(cfg, seed) -> simulation_data with at least time, volume, n_forks and
+origins; they are given by name (see ENGINES) or as "module:function".
+
+Usage:
+    python -m benchmarks.validate_engines --candidates crn population
+    python -m benchmarks.validate_engines --candidates mypackage.fast:run --seeds 16 --t-max 8000
+The exit status is 1 if any candidate fails.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import random
+import sys
+import time
+import zlib
+import numpy as np
+from scipy.stats import ks_2samp, chi2_contingency
+from benchmarks.run_benchmarks import REGIMES, regime_config
+from src.utils.config_loader import load_config
+from src.utils.compiled_config import compile_config
+from src.utils.optimal_parameters import make_optimal_config
+from src.utils.statistics import get_discontinuities, initiation_volumes
+from src.utils.sweep import run_bounded
+from src.simulation.run_simulation import run_simulation
+from src.simulation.population import Population
+from src.model.genome_sites import SiteIndex
+from src.utils.crn import with_crn
+
+CONTINUOUS = ("initiation_volume", "division_time")
+DISCRETE = ("n_forks", "origins")
+
+# --- engines --------------------------------------------------------------------------------------
+
+def engine_reference(cfg, seed):
+    random.seed(seed)
+    return run_simulation(cfg, verbose=False)
+
+def engine_crn(cfg, seed):
+    """
+        Common-random-numbers mode: hazard-budget firing on seeded streams.
+    """
+    return run_simulation(with_crn(cfg, seed), verbose=False)
+
+def engine_uniform_sites(cfg, seed):
+    """
+        Titration sites from a uniform SiteIndex instead of the continuous update.
+    """
+    random.seed(seed)
+    return run_simulation(cfg, verbose=False, site_index=SiteIndex.uniform(cfg.model.SITES))
+
+def engine_population(cfg, seed):
+    """
+        Array engine of src/simulation/population.py with a single cell, i.e. a single lineage.
+    """
+    params = compile_config(cfg)
+    population = Population(params, 1, mode="moran", seed=seed)
+    data = {"time": [], "volume": [], "n_forks": [], "origins": []}
+    while population.time < params.T_MAX:
+        population.step(params.DT)
+        data["time"].append(population.time)
+        data["volume"].append(float(population.volume[0]))
+        data["n_forks"].append(float(population.n_forks[0]))
+        data["origins"].append(int(population.alive[0].sum()))
+    return data
+
+ENGINES = {
+    "reference": engine_reference,
+    "crn": engine_crn,
+    "uniform_sites": engine_uniform_sites,
+    "population": engine_population,
+}
+
+def get_engine(name):
+    if name in ENGINES:
+        return ENGINES[name]
+    module, _, function = name.partition(":")
+    if not function:
+        raise ValueError("unknown engine %r: use one of %s or module:function"%(name, ", ".join(ENGINES)))
+    return getattr(importlib.import_module(module), function)
+
+# --- observables ----------------------------------------------------------------------------------
+
+def observables(simulation_data, burn_in=1./3., thin=25., rng=None):
+    """
+        Samples of the compared quantities from one run, after the first burn_in fraction of time.
+        The counts are taken at (t_max-t0)/thin uniformly random times drawn from rng.
+    """
+    rng = np.random.default_rng(rng)
+    t = np.asarray(simulation_data["time"])
+    t0 = t[0] + burn_in*(t[-1] - t[0])
+    _, _, divisions = get_discontinuities(simulation_data["origins"], simulation_data["n_forks"])
+    division_times = t[np.asarray(divisions, dtype=int)]
+    division_times = division_times[division_times >= t0]
+    sampled = np.searchsorted(t, np.sort(rng.uniform(t0, t[-1], int((t[-1] - t0)/thin))))
+    return {
+        "initiation_volume": initiation_volumes(simulation_data, burn_in=burn_in),
+        "division_time": np.diff(division_times),
+        "n_forks": np.asarray(simulation_data["n_forks"])[sampled],
+        "origins": np.asarray(simulation_data["origins"])[sampled],
+    }
+
+def _run(task):
+    engine, _, cfg, seed, burn_in, thin = task
+    start = time.perf_counter()
+    simulation_data = get_engine(engine)(cfg, seed)
+    elapsed = time.perf_counter() - start
+    # sampling times differ between engines and seeds, and are reproducible for each run
+    rng = [seed, zlib.crc32(engine.encode())]
+    return elapsed, {name: values.tolist() for name, values in observables(simulation_data, burn_in, thin, rng).items()}
+
+# --- comparisons ----------------------------------------------------------------------------------
+
+def relative_differences(reference, candidate):
+    """
+        |relative difference| of the mean and of the standard deviation.
+    """
+    def rel(a, b):
+        return abs(b - a)/abs(a) if a != 0 else (0. if b==0 else np.inf)
+    return rel(np.mean(reference), np.mean(candidate)), rel(np.std(reference), np.std(candidate))
+
+def bootstrap_intervals(reference_runs, candidate_runs, level, n_boot=500, rng=0):
+    """
+        Bootstrap intervals of the relative differences of mean and std, resampling whole runs.
+    """
+    rng = np.random.default_rng(rng)
+    draws = []
+    for _ in range(n_boot):
+        reference = np.concatenate([reference_runs[i] for i in rng.integers(0, len(reference_runs), len(reference_runs))])
+        candidate = np.concatenate([candidate_runs[i] for i in rng.integers(0, len(candidate_runs), len(candidate_runs))])
+        if len(reference) and len(candidate):
+            draws.append(relative_differences(reference, candidate))
+    draws = np.array(draws)
+    # no interpolation between draws, which may be infinite (zero spread in the reference)
+    return [np.array([np.quantile(draws[:, k], (1. - level)/2., method="lower"),
+                      np.quantile(draws[:, k], (1. + level)/2., method="higher")]) for k in (0, 1)]
+
+def compare_samples(name, reference_runs, candidate_runs, alpha, tol_mean, tol_std, level=0.95):
+    """
+        Compares the samples of one observable, given as lists with one array per run.
+    """
+    reference_runs = [np.asarray(run, dtype=float) for run in reference_runs]
+    candidate_runs = [np.asarray(run, dtype=float) for run in candidate_runs]
+    reference, candidate = np.concatenate(reference_runs), np.concatenate(candidate_runs)
+    result = {"n_reference": len(reference), "n_candidate": len(candidate)}
+    if len(reference) < 2 or len(candidate) < 2:
+        result.update(p_value=np.nan, passed=False, verdict="fail", reason="too few samples")
+        return result
+    if name in CONTINUOUS:
+        statistic, p_value = ks_2samp(reference, candidate)
+        result["test"] = "ks"
+    else:
+        values = np.union1d(reference, candidate)
+        table = np.array([[np.sum(reference==v) for v in values], [np.sum(candidate==v) for v in values]])
+        if len(values) < 2:
+            statistic, p_value = 0., 1.
+        else:
+            statistic, p_value = chi2_contingency(table)[:2]
+        result["test"] = "chi2"
+    mean_diff, std_diff = relative_differences(reference, candidate)
+    mean_ci, std_ci = bootstrap_intervals(reference_runs, candidate_runs, level)
+    if mean_ci[1] <= tol_mean and std_ci[1] <= tol_std:
+        verdict, reason = "equivalent", None
+    elif mean_ci[0] > tol_mean or std_ci[0] > tol_std:
+        verdict, reason = "fail", "outside tolerance"
+    elif p_value < alpha:
+        verdict, reason = "fail", "%s test rejects"%result["test"]
+    else:
+        verdict, reason = "pass", None
+    result.update(
+        statistic=float(statistic), p_value=float(p_value),
+        mean_reference=float(np.mean(reference)), mean_candidate=float(np.mean(candidate)),
+        std_reference=float(np.std(reference)), std_candidate=float(np.std(candidate)),
+        mean_rel_diff=float(mean_diff), std_rel_diff=float(std_diff),
+        mean_rel_diff_ci=[float(v) for v in mean_ci], std_rel_diff_ci=[float(v) for v in std_ci],
+        verdict=verdict, passed=verdict!="fail",
+    )
+    if reason:
+        result["reason"] = reason
+    return result
+
+def validate(cfgs, candidates, seeds, alpha=0.01, tol_mean=0.03, tol_std=0.15, burn_in=1./3., thin=25., max_workers=None):
+    """
+        Runs the reference and every candidate on every config and seed, and compares them.
+        Returns a report dict; report["passed"] is True if every candidate passed every comparison.
+    """
+    engines = ["reference"] + list(candidates)
+    tasks = [(engine, name, cfg, seed, burn_in, thin) for engine in engines for name, cfg in cfgs.items() for seed in seeds]
+    # one array per run, so that the bootstrap can resample whole runs
+    samples = {(engine, name): {key: [] for key in CONTINUOUS + DISCRETE} for engine in engines for name in cfgs}
+    seconds = {(engine, name): 0. for engine in engines for name in cfgs}
+    results = ((task, _run(task)) for task in tasks) if max_workers==1 else run_bounded(_run, tasks, max_workers=max_workers)
+    for task, (elapsed, values) in results:
+        key = (task[0], task[1])
+        seconds[key] += elapsed
+        for name, sample in values.items():
+            samples[key][name].append(sample)
+
+    n_comparisons = len(cfgs)*len(CONTINUOUS + DISCRETE)
+    report = {"alpha": alpha, "tol_mean": tol_mean, "tol_std": tol_std, "seeds": list(seeds), "candidates": {}}
+    for candidate in candidates:
+        entry = {"configs": {}, "passed": True}
+        for name in cfgs:
+            comparisons = {key: compare_samples(key, samples[("reference", name)][key], samples[(candidate, name)][key],
+                                                alpha/n_comparisons, tol_mean, tol_std)
+                           for key in CONTINUOUS + DISCRETE}
+            passed = all(c["passed"] for c in comparisons.values())
+            entry["configs"][name] = {
+                "comparisons": comparisons,
+                "passed": passed,
+                "seconds_reference": seconds[("reference", name)],
+                "seconds_candidate": seconds[(candidate, name)],
+                "speedup": seconds[("reference", name)]/seconds[(candidate, name)],
+            }
+            entry["passed"] = entry["passed"] and passed
+        report["candidates"][candidate] = entry
+    report["passed"] = all(entry["passed"] for entry in report["candidates"].values())
+    return report
+
+def print_report(report):
+    for candidate, entry in report["candidates"].items():
+        print("%s: %s"%(candidate, "PASS" if entry["passed"] else "FAIL"))
+        for name, config in entry["configs"].items():
+            print("  %-16s speedup %6.2f  %s"%(name, config["speedup"], "pass" if config["passed"] else "FAIL"))
+            for key, c in config["comparisons"].items():
+                print("    %-18s %-4s p=%-9.3g mean %+7.2f%%  std %+7.2f%%  %s"%(
+                    key, c.get("test", "-"), c["p_value"],
+                    100*(c.get("mean_candidate", np.nan)/c.get("mean_reference", np.nan) - 1),
+                    100*(c.get("std_candidate", np.nan)/c.get("std_reference", np.nan) - 1),
+                    c["verdict"] if c["passed"] else "FAIL (%s)"%c["reason"]))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that candidate engines reproduce the statistics of run_simulation."
+    )
+    parser.add_argument("--config", default="src/configs/base.yaml", metavar="YAML_FILE",
+                        help="Path to the YAML config (e.g., src/configs/base.yaml)")
+    parser.add_argument("--candidates", nargs="+", default=["crn", "uniform_sites", "population"],
+                        help="Engines to validate: %s or module:function"%", ".join(name for name in ENGINES if name!="reference"))
+    parser.add_argument("--regimes", nargs="+", default=list(REGIMES), choices=list(REGIMES))
+    parser.add_argument("--seeds", type=int, default=8, help="Runs per engine and config")
+    parser.add_argument("--t-max", type=float, default=4000., help="Simulated time of every run")
+    parser.add_argument("--alpha", type=float, default=0.01, help="Family-wise level of the tests")
+    parser.add_argument("--tol-mean", type=float, default=0.03, help="Tolerance on the relative difference of means")
+    parser.add_argument("--tol-std", type=float, default=0.15, help="Tolerance on the relative difference of std")
+    parser.add_argument("--thin", type=float, default=25., help="Mean minutes between the random samples of the fork and origin counts")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (1 runs serially)")
+    parser.add_argument("--output", default="results/benchmarks", metavar="DIR",
+                        help="Directory where the JSON report is written")
+    args = parser.parse_args()
+
+    for name in args.candidates:
+        get_engine(name)
+    cfg = make_optimal_config(load_config(args.config))
+    cfgs = {name: regime_config(cfg, *REGIMES[name], args.t_max) for name in args.regimes}
+    report = validate(cfgs, args.candidates, range(args.seeds), alpha=args.alpha, tol_mean=args.tol_mean,
+                      tol_std=args.tol_std, thin=args.thin, max_workers=args.workers)
+    report.update(timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"), config=args.config, t_max=args.t_max)
+    print_report(report)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, "validate_%s.json"%time.strftime("%Y%m%d_%H%M%S"))
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print("report written to", path)
+    sys.exit(0 if report["passed"] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+build_figures.py
+
+Renders every figure of the project headless (Agg backend), in a process pool, into
+<output_dir> of the config at its dpi:
+
+    python -m experiments.build_figures --config src/configs/base.yaml --workers 4
+
+Each figure job has a key, the hash of its options, of the dpi and format, of its source modules
+and of the content of its inputs in the result store (work_queue.write_result, .json or .json.gz). The keys of the
+last build are kept in <output_dir>/figures_manifest.json, and a job whose key has not changed and
+whose files all exist is skipped, so rebuilding after a change only renders the figures it touches.
+The time traces are read from the store entry of the config itself, simulated and written there
+if missing; the CV figure of the COOP x CHANGE sweep needs every point of the sweep in the store
+(experiments/sweeps/run_y_and_chi0.py) and is skipped until they are all there.
+"""
+
+import os
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib import pyplot as plt
+from src.utils.config_loader import load_config
+from src.utils.sweep import iter_configs, load_spec, run_bounded
+from src.utils.work_queue import find_result, read_result, result_path, write_result
+
+MANIFEST = "figures_manifest.json"
+
+def render_v_star(cfg, options):
+    from src.model import V_star_vs_V
+    return {"V_star_vs_V_%s"%name: fig for name, fig in V_star_vs_V.figures().items()}
+
+def render_cobweb(cfg, options):
+    from src.dynamical_stability_analysis import cobweb_figure
+    return {"cobweb_%g"%options["tau"]: cobweb_figure(tau=options["tau"])}
+
+def render_cobweb_chi(cfg, options):
+    from src.dynamical_stability_analysis_with_chi import cobweb_figure
+    return {"cobweb_chi_%g"%options["tau"]: cobweb_figure(tau=options["tau"], gamma=options["gamma"])}
+
+def render_alpha_vs_V(cfg, options):
+    from src.alpha_vs_V import figure
+    return {"alpha_vs_V": figure()}
+
+def render_time_traces(cfg, options):
+    from src.simulation.plot_simulation import figures
+    result = read_result(cfg)
+    if result is None:
+        from src.simulation.run_simulation import run_simulation
+        simulation_data = run_simulation(cfg)
+        write_result(cfg, {}, simulation_data)
+    else:
+        simulation_data = result["simulation_data"]
+    return {"time_traces_%s"%name: fig for name, fig in figures(cfg, simulation_data).items()}
+
+def render_cv_sweep(cfg, options):
+    from experiments.sweeps.make_plots_opty_and_chi0 import cv_table, cv_figure
+    return {"cv_coop_change": cv_figure(cv_table(cfg, load_spec(options["sweep"])))}
+
+def time_traces_inputs(cfg, options):
+    return [find_result(cfg) or result_path(cfg)]
+
+def cv_sweep_inputs(cfg, options):
+    """
+        Store entries of every point of the sweep, or None if some are missing.
+    """
+    if not os.path.exists(options["sweep"]):
+        return None
+    paths = [find_result(cfg0) for _, cfg0 in iter_configs(cfg, load_spec(options["sweep"]))]
+    return paths if all(paths) else None
+
+@dataclass
+class FigureJob:
+    """
+        name: key of the job in the manifest.
+        render(cfg, options): returns {file name (without extension): figure}.
+        sources: files whose content the figures depend on (besides the result store).
+        inputs(cfg, options): result store files the job reads, or None if they are not all there
+            (the job is then skipped). A listed file that does not exist yet is created by render.
+    """
+    name: str
+    render: Callable
+    sources: tuple
+    inputs: Optional[Callable] = None
+    options: dict = field(default_factory=dict)
+
+PLOTTING = "src/utils/plotting.py"
+STABILITY = ("src/dynamical_stability_analysis.py", "src/model/stability.py", PLOTTING)
+
+JOBS = [
+    FigureJob("V_star_vs_V", render_v_star, ("src/model/V_star_vs_V.py", "src/model/v_star_trajectory.py")),
+    FigureJob("cobweb", render_cobweb, STABILITY, options={"tau": 25.}),
+    FigureJob("cobweb_chi", render_cobweb_chi, STABILITY + ("src/dynamical_stability_analysis_with_chi.py",),
+              options={"tau": 25., "gamma": 0.6}),
+    FigureJob("alpha_vs_V", render_alpha_vs_V, ("src/alpha_vs_V.py", "src/model/optimal_volume.py")),
+    FigureJob("time_traces", render_time_traces, ("src/simulation/plot_simulation.py", "src/utils/downsample.py"),
+              inputs=time_traces_inputs),
+    FigureJob("cv_coop_change", render_cv_sweep,
+              ("experiments/sweeps/make_plots_opty_and_chi0.py", "src/utils/statistics.py"),
+              inputs=cv_sweep_inputs, options={"sweep": "src/configs/sweeps/y_and_chi0.yaml"}),
+]
+
+def file_hash(path, chunk=1<<20):
+    """
+        sha256 of the content of path, or None if it does not exist.
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(chunk), b""):
+                digest.update(block)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+def job_key(job, cfg, fmt, inputs):
+    state = {"options": job.options, "dpi": cfg.dpi, "format": fmt,
+             "sources": {path: file_hash(path) for path in job.sources},
+             "inputs": {path: file_hash(path) for path in inputs}}
+    return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+def render_job(item):
+    """
+        Renders one job in a worker and saves its figures. Returns the saved paths, or the error
+        message if the job failed, so that one broken figure does not stop the others.
+    """
+    job, cfg, fmt = item
+    paths = []
+    try:
+        for name, fig in job.render(cfg, job.options).items():
+            path = os.path.join(cfg.output_dir, "%s.%s"%(name, fmt))
+            fig.savefig(path, dpi=cfg.dpi)
+            plt.close(fig)
+            paths.append(path)
+    except Exception as error:
+        return "%s: %s"%(type(error).__name__, error)
+    finally:
+        plt.close("all")
+    return paths
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_manifest(path, manifest):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def build(cfg, jobs=JOBS, fmt="png", workers=None, force=False):
+    """
+        Renders the jobs whose key changed (or whose files are missing) and updates the manifest.
+        Returns {name: "rendered" | "skipped" | "missing inputs" | error message}.
+    """
+    os.makedirs(cfg.output_dir, exist_ok=True)
+    manifest_path = os.path.join(cfg.output_dir, MANIFEST)
+    manifest = load_manifest(manifest_path)
+    status = {}
+    todo = []
+    for job in jobs:
+        inputs = job.inputs(cfg, job.options) if job.inputs else []
+        if inputs is None:
+            status[job.name] = "missing inputs"
+            continue
+        entry = manifest.get(job.name)
+        if (not force and entry and entry["key"]==job_key(job, cfg, fmt, inputs)
+                and all(os.path.exists(path) for path in entry["outputs"])):
+            status[job.name] = "skipped"
+            continue
+        todo.append((job, cfg, fmt))
+    for (job, _, _), outputs in run_bounded(render_job, todo, max_workers=workers):
+        if isinstance(outputs, str):
+            status[job.name] = outputs
+            continue
+        # the inputs are hashed after rendering, since the job may have written them
+        inputs = job.inputs(cfg, job.options) if job.inputs else []
+        manifest[job.name] = {"key": job_key(job, cfg, fmt, inputs), "outputs": outputs, "time": time.time()}
+        save_manifest(manifest_path, manifest)
+        status[job.name] = "rendered"
+    return status
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render every figure headless into the output_dir of the config, skipping unchanged ones."
+    )
+    parser.add_argument(
+        "--config",
+        required=True,
+        metavar="YAML_FILE",
+        help="Path to the YAML config (e.g., configs/base.yaml)"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Figures rendered in parallel (default: all cores)")
+    parser.add_argument("--format", default="png", help="File format of the figures (png, pdf, svg, ...)")
+    parser.add_argument("--only", nargs="+", default=None, metavar="JOB",
+                        help="Build only these jobs (%s)"%", ".join(job.name for job in JOBS))
+    parser.add_argument("--sweep", default=None, metavar="YAML_FILE",
+                        help="COOP x CHANGE sweep of the CV figure (default: src/configs/sweeps/y_and_chi0.yaml)")
+    parser.add_argument("--force", action="store_true", help="Render every figure, even if unchanged")
+    args = parser.parse_args()
+    cfg = load_config(args.config)
+    jobs = [job for job in JOBS if args.only is None or job.name in args.only]
+    if args.sweep is not None:
+        jobs = [FigureJob(job.name, job.render, job.sources, job.inputs, {**job.options, "sweep": args.sweep})
+                if "sweep" in job.options else job for job in jobs]
+    for name, state in build(cfg, jobs, fmt=args.format, workers=args.workers, force=args.force).items():
+        print("%-16s %s"%(name, state))
+    print("figures in", cfg.output_dir)
+
+if __name__ == "__main__":
+    main()
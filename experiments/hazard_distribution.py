@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import numpy as np
+from dataclasses import replace
+from src.utils.config_loader import load_config
+from src.utils.crn import with_crn
+from src.utils.statistics import get_discontinuities
+from src.simulation.run_simulation import run_simulation
+from src.model.hazard import initiation_distribution
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+def simulated_volumes_per_origin(cfg, t_max, burn_in=1./3.):
+    """
+        Volume per origin at the initiations of one run_simulation, with the origins counted before
+        the round (origins before the event, rounded down to a power of two).
+    """
+    simulation_data = run_simulation(with_crn(replace(cfg, simulation=replace(cfg.simulation, T_MAX=t_max))),
+                                     verbose=False)
+    volume, origins = np.asarray(simulation_data["volume"]), np.asarray(simulation_data["origins"])
+    time = np.asarray(simulation_data["time"])
+    initiations, _, _ = get_discontinuities(simulation_data["origins"], simulation_data["n_forks"])
+    initiations = np.asarray(initiations, dtype=int)
+    initiations = initiations[time[initiations] >= burn_in*t_max]
+    return volume[initiations]/2.**np.floor(np.log2(origins[initiations - 1]))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stationary distribution of the initiation volume per origin from the integrated firing hazard."
+    )
+    parser.add_argument(
+        "--config",
+        required=True,
+        metavar="YAML_FILE",
+        help="Path to the YAML config (e.g., configs/base.yaml)"
+    )
+    parser.add_argument("--order", type=int, choices=(0, 1), default=0,
+                        help="0: chain on the volume per origin, 1: chain on the last two volumes")
+    parser.add_argument("--grid", type=int, default=None, help="Bins of the log grid (default: 200 for order 0, 80 for order 1)")
+    parser.add_argument("--generations", type=int, default=0,
+                        help="Also print the relaxation over this many generations from the median volume")
+    parser.add_argument("--simulate", type=float, default=None, metavar="T_MAX",
+                        help="Cross-check with one common-random-numbers simulation of this length")
+    parser.add_argument("--output", default=None, metavar="JSON_FILE",
+                        help="Where to write the results (default: <output_dir>/hazard_distribution.json)")
+    args = parser.parse_args()
+
+    cfg = load_config(args.config)
+    result = initiation_distribution(cfg, order=args.order, n_grid=args.grid)
+    operator = result.pop("operator")
+    result.pop("stationary")
+    quantiles = list(result["quantiles"].values())
+    print("hazard (order %d, %.3f s): mean %.4g, CV %.4g, quantiles %s, interval %.4g (CV %.3g), leak %.1e"%(
+        args.order, result["seconds"], result["mean"], result["cv"], np.round(quantiles, 4),
+        result["interval_mean"], result["interval_cv"], result["leak"]))
+    output = {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in result.items()}
+    output["quantiles"] = quantiles
+    if args.generations:
+        marginals = operator.iterate(operator.initial(quantiles[2]), args.generations)
+        output["generations"] = [operator.moments(marginal) for marginal in marginals]
+        for i, (mean, cv) in enumerate(output["generations"]):
+            print("generation %d: mean %.4g, CV %.4g"%(i + 1, mean, cv))
+    if args.simulate:
+        volumes = simulated_volumes_per_origin(cfg, args.simulate)
+        simulated = {"mean": float(np.mean(volumes)), "cv": float(np.std(volumes)/np.mean(volumes)),
+                     "quantiles": np.quantile(volumes, QUANTILES).tolist(), "n": len(volumes)}
+        print("simulation (%d initiations): mean %.4g, CV %.4g, quantiles %s"%(
+            simulated["n"], simulated["mean"], simulated["cv"], np.round(simulated["quantiles"], 4)))
+        output["simulation"] = simulated
+    path = args.output or os.path.join(cfg.output_dir, "hazard_distribution.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(output, f, indent=2)
+    print("results written to", path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import numpy as np
+from src.utils.config_loader import load_config
+from src.utils.sweep import load_spec
+from src.utils.inference import ABCSMC, SummaryCache, load_observations
+
+def to_json(value):
+    if isinstance(value, np.ndarray):
+        return [None if not np.isfinite(item) else float(item) for item in value]
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="ABC-SMC posterior of model parameters from measured initiation and division volumes."
+    )
+    parser.add_argument(
+        "--config",
+        required=True,
+        metavar="YAML_FILE",
+        help="Path to the YAML config (e.g., configs/base.yaml); T_MAX and DT of every simulation"
+    )
+    parser.add_argument(
+        "--prior",
+        required=True,
+        metavar="YAML_FILE",
+        help="Sweep spec whose params (min_val/max_val/scale) are the uniform priors, e.g. src/configs/sweeps/abc_prior.yaml"
+    )
+    parser.add_argument(
+        "--data",
+        required=True,
+        metavar="FILE",
+        help="Measured volumes (.json, .npz or .csv with initiation_volume and/or division_volume), in model units"
+    )
+    parser.add_argument("--particles", type=int, default=200, help="Particles per generation")
+    parser.add_argument("--generations", type=int, default=6, help="Generations, including the prior one")
+    parser.add_argument("--quantile", type=float, default=0.5, help="Quantile of the previous distances used as tolerance")
+    parser.add_argument("--samples", type=int, default=1000, help="Resampled posterior samples written to the output")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (1 runs serially)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", default=None, metavar="JSONL_FILE",
+                        help="Summary cache shared between runs (default: <output>/summaries.jsonl)")
+    parser.add_argument("--output", default=None, metavar="DIR",
+                        help="Where the posterior is written (default: <output_dir>/abc_<tag>)")
+    args = parser.parse_args()
+
+    # K_OPEN is only derived from the cooperativity when it is not inferred itself
+    spec = load_spec(args.prior)
+    cfg = load_config(args.config)
+    observed = load_observations(args.data)
+    output = args.output or os.path.join(cfg.output_dir, "abc_%s"%spec.get("tag", "prior"))
+    os.makedirs(output, exist_ok=True)
+    cache = SummaryCache(args.cache or os.path.join(output, "summaries.jsonl"))
+    print("observed:", {name: round(value, 4) for name, value in observed.items()})
+    print("%d cached simulations"%len(cache))
+
+    def report(abc):
+        last = abc.history[-1]
+        print("generation %d: epsilon = %.4g, acceptance = %.3g, ESS = %.1f, simulations = %d (cached %d)"%(
+            last["generation"], last["epsilon"], last["acceptance_rate"], last["ess"],
+            last["simulations"], last["cache_hits"]))
+
+    abc = ABCSMC(cfg, spec, observed, n_particles=args.particles, quantile=args.quantile, cache=cache, seed=args.seed)
+    posterior = abc.run(args.generations, max_workers=args.workers, callback=report)
+    for name, summary in posterior["summary"].items():
+        q = summary["quantiles"]
+        print("%s: mean %.4g, median %.4g, 90%% interval [%.4g, %.4g]"%(name, summary["mean"], q[1], q[0], q[2]))
+    with open(os.path.join(output, "posterior.json"), "w") as f:
+        json.dump(to_json({"observed": observed, "prior": spec, "history": abc.history,
+                           "posterior": posterior, "samples": abc.resample(args.samples)}), f, indent=2)
+    print("results written to", output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import json
+import os
+import numpy as np
+from src.utils.config_loader import load_config
+from src.utils.sweep import load_spec
+from src.utils.surrogate import SurrogateOptimizer
+from src.utils.adaptive_sweep import initiation_cv
+from src.utils.monitor import Monitor, Monitored
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find the cooperativity (and any other swept parameter) minimizing the CV of the initiation volume."
+    )
+    parser.add_argument(
+        "--config",
+        required=True,
+        metavar="YAML_FILE",
+        help="Path to the YAML config (e.g., configs/base.yaml)"
+    )
+    parser.add_argument(
+        "--sweep",
+        required=True,
+        metavar="YAML_FILE",
+        help="Path to the YAML sweep giving the search ranges (min_val/max_val/scale of each param)"
+    )
+    parser.add_argument("--budget", type=int, default=40, help="Total number of simulations")
+    parser.add_argument("--initial", type=int, default=None, help="Simulations of the initial design")
+    parser.add_argument("--batch", type=int, default=4, help="Simulations per optimization step")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (1 runs serially)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, metavar="DIR",
+                        help="Where the optimum, history and surrogate are written (default: <output_dir>/optimize_y)")
+    parser.add_argument("--monitor", type=int, default=None, metavar="PORT",
+                        help="Serve the progress of every simulation as JSON on http://127.0.0.1:PORT/")
+    args = parser.parse_args()
+
+    spec=load_spec(args.sweep)
+    cfg = load_config(args.config)
+    output = args.output or os.path.join(cfg.output_dir, "optimize_y")
+    os.makedirs(output, exist_ok=True)
+
+    def report(optimizer):
+        print("simulations: %d, best observed CV: %.4g"%(len(optimizer.value), np.nanmin(optimizer.value)))
+
+    monitor = Monitor(port=args.monitor) if args.monitor is not None else None
+    measure = Monitored(initiation_cv, monitor.queue) if monitor else initiation_cv
+    if monitor:
+        print("progress served on", monitor.url)
+    try:
+        optimizer = SurrogateOptimizer(cfg, spec, measure=measure, seed=args.seed)
+        optimum = optimizer.run(args.budget, n_initial=args.initial, batch=args.batch,
+                                max_workers=args.workers, callback=report)
+    finally:
+        if monitor:
+            monitor.close()
+    print("optimum: ", optimum["point"])
+    print("CV = %.4g (log CV = %.3f +- %.3f)"%(optimum["value"], optimum["log_value"], optimum["log_value_std"]))
+    for name, quantiles in optimum["point_quantiles"].items():
+        print("%s: 90%% interval of the minimizer [%.4g, %.4g]"%(name, quantiles[0], quantiles[2]))
+    with open(os.path.join(output, "optimum.json"), "w") as f:
+        json.dump({"optimum": optimum, "history": optimizer.history()}, f, indent=2)
+    optimizer.surrogate().save(os.path.join(output, "surrogate.npz"))
+    print("results written to", output)
+
+if __name__ == "__main__":
+    main()
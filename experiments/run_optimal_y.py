@@ -2,20 +2,16 @@
 import argparse
 from src.utils.config_loader import load_config
 from src.simulation.run_simulation import run_simulation
-from src.utils.setup import get_n_star_n_forks, get_v_opt, get_chi0, get_alpha_opt, get_y_opt
+from src.utils.optimal_parameters import make_optimal_config
 import json
-from dataclasses import replace
 
 
 def make_optimal(cfg):
-    n_star, _ = get_n_star_n_forks(cfg) 
-    v_opt = get_v_opt(cfg, n_star)
-    chi_0 = get_chi0(cfg, v_opt)
-    cfg = replace(cfg, model=replace(cfg.model, CHI0=chi_0))
-    alpha_opt=get_alpha_opt(cfg, v_opt)
-    y_opt=get_y_opt(cfg, alpha_opt)
-    cfg = replace(cfg, model=replace(cfg.model, COOP=y_opt))
-    return cfg
+    """
+        Sets CHI0 and COOP to their optimal values (get_chi0 and get_y_opt in src/utils/setup.py),
+        memoized per base configuration.
+    """
+    return make_optimal_config(cfg)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -2,6 +2,8 @@
 import argparse
 from src.utils.config_loader import load_config
 from src.simulation.run_simulation import run_simulation
+from src.simulation.profiling import Profiler
+from src.model.genome_sites import SiteIndex, ECOLI_LOCI
 import json
 
 def main():
@@ -14,10 +16,32 @@ def main():
         metavar="YAML_FILE",
         help="Path to the YAML config (e.g., configs/base.yaml)"
     )
+    parser.add_argument(
+        "--profile",
+        default=None,
+        metavar="JSON_FILE",
+        help="Time the phases of the simulation step and write the summary to this file"
+    )
+    parser.add_argument(
+        "--sites",
+        default=None,
+        metavar="FILE",
+        help="Positions of the titration sites (fractions of the replichore, one per line), "
+             "or 'uniform' for evenly spaced sites; the E. coli datA/DARS loci are tracked"
+    )
     args = parser.parse_args()
 
     cfg = load_config(args.config)
-    simulation_data=run_simulation(cfg)
+    profiler = Profiler() if args.profile else None
+    site_index = None
+    if args.sites == "uniform":
+        site_index = SiteIndex.uniform(cfg.model.SITES, loci=ECOLI_LOCI)
+    elif args.sites:
+        site_index = SiteIndex.load(args.sites, loci=ECOLI_LOCI)
+    simulation_data=run_simulation(cfg, profiler=profiler, site_index=site_index)
+    if profiler is not None:
+        print(profiler.report())
+        profiler.save(args.profile)
     with open(rf"C:\Users\Albi\Desktop\DnaA_manuscript\results\simulation_data.json", "w") as f:
         json.dump(simulation_data, f, indent=2)
 
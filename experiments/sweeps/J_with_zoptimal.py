@@ -2,27 +2,8 @@
 import argparse
 from src.utils.config_loader import load_config
 from src.simulation.run_simulation import run_simulation
-from experiments.run_optimal_y import make_optimal
+from src.utils.sweep import load_spec, iter_configs
 import json
-from dataclasses import replace
-import yaml
-import numpy as np
-
-def change_kori(cfg, y):
-    """
-        This function returns a new value of K_ori, still optimal, corresponding to a new 
-        value of the cooperativity strength y, all other parameters being kept the same. 
-    """
-    epsilon_cost, origin_sites, K, dnaa, kori_old, y_old =  (cfg.model.E_COST,
-                                                             cfg.model.ORIGIN_SITES,
-                                                             cfg.model.K,
-                                                             cfg.model.DNAA_CONCENTRATION,
-                                                             cfg.model.K_OPEN,
-                                                             cfg.model.COOP)
-    alpha=kori_old*np.exp(epsilon_cost/origin_sites)/(y_old*np.sqrt(K*dnaa))
-    kori =y/(np.exp(epsilon_cost/origin_sites)/(alpha*np.sqrt(K*dnaa)))
-    return kori
-
 
 def main():
     parser = argparse.ArgumentParser(
@@ -41,27 +22,14 @@ def main():
         help="Path to the YAML sweep (e.g., configs/base.yaml)"
     )
     args = parser.parse_args()
-    sweep_dict=yaml.safe_load(open(args.sweep))
-    if sweep_dict["scale"]=="log":
-        maxexp=np.log(sweep_dict["max_val"])
-        minexp=np.log(sweep_dict["min_val"])
-        steps=sweep_dict["steps"]
-        y_values=np.exp(np.linspace(minexp, maxexp, steps))
-    else:
-        max_v=sweep_dict["max_val"]
-        min_v=sweep_dict["min_val"]
-        steps=sweep_dict["steps"]
-        y_values=np.exp(np.linspace(min_v, max_v, steps))        
-
+    # optimal configuration at CHANGE=1.05, K_OPEN re-optimized for each cooperativity
+    spec=load_spec(args.sweep)
+    spec["fixed"]={"CHANGE": 1.05, **spec["fixed"]}
     cfg = load_config(args.config)
-    cfg = replace(cfg, model=replace(cfg.model, CHANGE=1.05))
-    cfg = make_optimal(cfg)
-    for y_new in y_values:
-        print("cooperativity strength (y): ", y_new)
-        kori_new=change_kori(cfg, y_new)
-        cfg0=replace(cfg, model=replace(cfg.model, COOP=y_new, K_OPEN=kori_new))
+    for point, cfg0 in iter_configs(cfg, spec):
+        print("cooperativity strength (y): ", cfg0.model.COOP)
         simulation_data=run_simulation(cfg0)
-        with open(rf"C:\Users\Albi\Desktop\DnaA_manuscript\results\data\optimal_y_%g_chi0_%g.json"%(y_new, cfg.model.CHI0), "w") as f:
+        with open(rf"C:\Users\Albi\Desktop\DnaA_manuscript\results\data\optimal_y_%g_chi0_%g.json"%(cfg0.model.COOP, cfg0.model.CHI0), "w") as f:
             json.dump(simulation_data, f, indent=2)
 
     print("Loaded config:", args.config)
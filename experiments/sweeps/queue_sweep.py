@@ -0,0 +1,74 @@
+"""
+Distributed sweeps through a shared SQLite work queue.
+
+    python -m experiments.sweeps.queue_sweep enqueue --db sweep.db --config src/configs/base.yaml --sweep src/configs/sweeps/y_and_chi0.yaml
+    python -m experiments.sweeps.queue_sweep work --db sweep.db        # on every node, as many times as wanted
+    python -m experiments.sweeps.queue_sweep status --db sweep.db
+"""
+
+import argparse
+import json
+from dataclasses import replace
+from src.utils.config_loader import load_config
+from src.utils.sweep import load_spec, iter_configs
+from src.utils.work_queue import WorkQueue, run_worker
+from src.simulation.run_simulation import run_simulation
+
+def enqueue(args):
+    spec = load_spec(args.sweep)
+    if args.derived is not None:
+        spec["derived"] = args.derived
+    cfg = load_config(args.config)
+    if args.output_dir:
+        cfg = replace(cfg, output_dir=args.output_dir)
+    queue = WorkQueue(args.db)
+    added = queue.enqueue(iter_configs(cfg, spec))
+    print("added %d points; %s"%(added, queue.status()))
+
+def work(args):
+    queue = WorkQueue(args.db, timeout=args.timeout, max_attempts=args.max_attempts)
+    done = run_worker(queue, run_simulation, heartbeat=args.heartbeat, max_points=args.max_points)
+    print("completed %d points; %s"%(done, queue.status()))
+
+def status(args):
+    queue = WorkQueue(args.db)
+    if args.retry_failed:
+        print("requeued %d failed points"%queue.retry_failed())
+    print(json.dumps(queue.status()))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a sweep through a SQLite work queue shared by several workers."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parser_enqueue = commands.add_parser("enqueue", help="Add the points of a sweep to the queue")
+    parser_enqueue.add_argument("--db", required=True, help="SQLite database of the queue")
+    parser_enqueue.add_argument("--config", required=True, metavar="YAML_FILE", help="Base configuration")
+    parser_enqueue.add_argument("--sweep", required=True, metavar="YAML_FILE", help="Sweep specification")
+    parser_enqueue.add_argument("--derived", nargs="*", default=None,
+                                help="Derived parameters, overriding the sweep file "
+                                     "(default: its own, or chi0 change_kori when it lists none)")
+    parser_enqueue.add_argument("--output-dir", default=None,
+                                help="Directory of the results, overriding output.dir of the config")
+    parser_enqueue.set_defaults(func=enqueue)
+
+    parser_work = commands.add_parser("work", help="Claim and run points until the queue is empty")
+    parser_work.add_argument("--db", required=True, help="SQLite database of the queue")
+    parser_work.add_argument("--heartbeat", type=float, default=30., help="Seconds between heartbeats")
+    parser_work.add_argument("--timeout", type=float, default=300.,
+                             help="Seconds without heartbeat after which a point is requeued")
+    parser_work.add_argument("--max-attempts", type=int, default=3)
+    parser_work.add_argument("--max-points", type=int, default=None, help="Stop after this many points")
+    parser_work.set_defaults(func=work)
+
+    parser_status = commands.add_parser("status", help="Number of points per status")
+    parser_status.add_argument("--db", required=True, help="SQLite database of the queue")
+    parser_status.add_argument("--retry-failed", action="store_true", help="Put the failed points back in the queue")
+    parser_status.set_defaults(func=status)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
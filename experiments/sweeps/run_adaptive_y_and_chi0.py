@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+from src.utils.config_loader import load_config
+from src.utils.sweep import load_spec, sweep_size
+from src.utils.adaptive_sweep import AdaptiveSweep, initiation_cv
+from src.utils.monitor import Monitor, Monitored
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Adaptive (COOP, CHANGE) sweep: refines COOP where the CV of the initiation volume changes fastest."
+    )
+    parser.add_argument(
+        "--config",
+        required=True,
+        metavar="YAML_FILE",
+        help="Path to the YAML config (e.g., configs/base.yaml)"
+    )
+    parser.add_argument(
+        "--sweep",
+        required=True,
+        metavar="YAML_FILE",
+        help="Path to the YAML sweep giving the coarse grid"
+    )
+    parser.add_argument("--refine", default="COOP", help="Swept parameter to refine")
+    parser.add_argument("--budget", type=int, default=64, help="Total number of simulations")
+    parser.add_argument("--batch", type=int, default=8, help="Simulations per refinement step")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (1 runs serially)")
+    parser.add_argument("--output", default=None, metavar="JSON_FILE",
+                        help="Where to write the curves (default: <output_dir>/adaptive_<tag>.json)")
+    parser.add_argument("--monitor", type=int, default=None, metavar="PORT",
+                        help="Serve the progress of every simulation as JSON on http://127.0.0.1:PORT/")
+    args = parser.parse_args()
+
+    spec=load_spec(args.sweep)
+    cfg = load_config(args.config)
+    output = args.output or os.path.join(cfg.output_dir, "adaptive_%s.json"%spec.get("tag", "sweep"))
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    def save(sweep):
+        print("simulations: %d/%d"%(sweep.n_evaluations, args.budget))
+        with open(output, "w") as f:
+            json.dump(sweep.results(), f, indent=2)
+
+    print("coarse grid: %d points, budget: %d"%(sweep_size(spec), args.budget))
+    monitor = Monitor(port=args.monitor) if args.monitor is not None else None
+    measure = Monitored(initiation_cv, monitor.queue) if monitor else initiation_cv
+    if monitor:
+        print("progress served on", monitor.url)
+    try:
+        sweep = AdaptiveSweep(cfg, spec, refine=args.refine, measure=measure)
+        sweep.run(args.budget, batch=args.batch, max_workers=args.workers, callback=save)
+    finally:
+        if monitor:
+            monitor.close()
+    print("results written to", output)
+
+if __name__ == "__main__":
+    main()
@@ -2,41 +2,19 @@
 import argparse
 from src.utils.config_loader import load_config
 from src.simulation.run_simulation import run_simulation
-from experiments.run_optimal_y import make_optimal
-import json
-from dataclasses import replace
-import yaml
-import numpy as np
+from src.utils.sweep import load_spec, iter_configs, sweep_size
+from src.utils.compiled_config import config_hash
+from src.utils.work_queue import ResultWriter
+from src.utils.monitor import Monitor, ProgressReporter
+from src.utils.shared_results import run_shared
 
-def change_kori(cfg, y):
-    """
-        This function returns a new value of K_ori, still optimal, corresponding to a new 
-        value of the cooperativity strength y, all other parameters being kept the same. 
-    """
-    epsilon_cost, origin_sites, K, dnaa, kori_old, y_old =  (cfg.model.E_COST,
-                                                             cfg.model.ORIGIN_SITES,
-                                                             cfg.model.K,
-                                                             cfg.model.DNAA_CONCENTRATION,
-                                                             cfg.model.K_OPEN,
-                                                             cfg.model.COOP)
-    alpha=kori_old*np.exp(epsilon_cost/origin_sites)/(y_old*np.sqrt(K*dnaa))
-    kori =y/(np.exp(epsilon_cost/origin_sites)/(alpha*np.sqrt(K*dnaa)))
-    return kori
-
-
-def get_range(sweep_dict):
-    if sweep_dict["scale"]=="log":
-        maxexp=np.log(sweep_dict["max_val"])
-        minexp=np.log(sweep_dict["min_val"])
-        steps=sweep_dict["steps"]
-        values=np.exp(np.linspace(minexp, maxexp, steps))
-    else:
-        max_v=sweep_dict["max_val"]
-        min_v=sweep_dict["min_val"]
-        steps=sweep_dict["steps"]
-        values=np.linspace(min_v, max_v, steps)    
-    
-    return values
+def simulate(item):
+    point, cfg0, queue = item
+    progress = ProgressReporter(queue, config_hash(cfg0)[:12], point=point) if queue is not None else None
+    simulation_data=run_simulation(cfg0, progress=progress)
+    if progress:
+        progress.finish(cfg0.simulation.T_MAX)
+    return simulation_data
 
 def main():
     parser = argparse.ArgumentParser(
@@ -54,26 +32,44 @@ def main():
         metavar="YAML_FILE",
         help="Path to the YAML sweep"
     )
+    parser.add_argument("--monitor", type=int, default=None, metavar="PORT",
+                        help="Serve the progress of every simulation as JSON on http://127.0.0.1:PORT/")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Simulations run in parallel; results come back through shared memory")
+    parser.add_argument("--write-queue", type=int, default=2, metavar="N",
+                        help="Results waiting for the background writer at most (caps their memory)")
+    parser.add_argument("--no-compress", action="store_true",
+                        help="Write <hash>.json instead of <hash>.json.gz")
     args = parser.parse_args()
-    sweep_dict=yaml.safe_load(open(args.sweep))
-    print("base path = ",sweep_dict["base_yaml"])
-    params=sweep_dict["params"]
-    sweep_coop=params["COOP"]
-    sweep_change=params["CHANGE"]
-    y_values=get_range(sweep_coop)
-    change_values=get_range(sweep_change)
-    for change in change_values:
-        cfg = load_config(args.config)
-        cfg = replace(cfg, model=replace(cfg.model, CHANGE=change))
-        cfg = make_optimal(cfg)
-        for y_new in y_values:
-            print("cooperativity strength (y): ", y_new)
-            kori_new=change_kori(cfg, y_new)
-            cfg0=replace(cfg, model=replace(cfg.model, COOP=y_new, K_OPEN=kori_new))
-            simulation_data=run_simulation(cfg0)
-            with open(rf"C:\Users\Albi\Desktop\DnaA_manuscript\results\data\optimal_y_%g_change_%g.json"%(y_new, cfg.model.CHANGE), "w") as f:
-                json.dump(simulation_data, f, indent=2)
-            print("chi0 and coop = ", cfg0.model.CHI0, cfg0.model.COOP)
+    spec=load_spec(args.sweep)
+    print("base path = ",spec.get("base_yaml"))
+    cfg = load_config(args.config)
+    print("points in the sweep: ", sweep_size(spec))
+    monitor = Monitor(port=args.monitor) if args.monitor is not None else None
+    if monitor:
+        print("progress served on", monitor.url)
+    queue = monitor.queue if monitor else None
+    try:
+        # results are serialized, compressed and written by a background thread while the next
+        # points run; leaving the with block waits until all of them are on disk
+        with ResultWriter(maxsize=args.write_queue, compress=not args.no_compress) as writer:
+            if args.workers > 1:
+                items = ((point, cfg0, queue) for point, cfg0 in iter_configs(cfg, spec))
+                for (point, cfg0, _), simulation_data in run_shared(simulate, items, max_workers=args.workers):
+                    print("sweep point: ", point)
+                    with simulation_data:
+                        writer.submit(cfg0, point, simulation_data.to_dict(lists=True))
+                    print("chi0 and coop = ", cfg0.model.CHI0, cfg0.model.COOP)
+            else:
+                for point, cfg0 in iter_configs(cfg, spec):
+                    print("sweep point: ", point)
+                    simulation_data=simulate((point, cfg0, queue))
+                    writer.submit(cfg0, point, simulation_data)
+                    print("chi0 and coop = ", cfg0.model.CHI0, cfg0.model.COOP)
+        print("results written: %d, time waiting for the writer: %.2f s"%(len(writer.paths), writer.waited))
+    finally:
+        if monitor:
+            monitor.close()
     print("Loaded config:", args.config)
     print("LICENSING =", cfg.model.LICENSING)
 
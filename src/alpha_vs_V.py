@@ -1,16 +1,18 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
+from src.model.optimal_volume import v_star_of_alpha, get_alpha_array, intersection
 
 # Parameters
 K = 1
 z = 10
 a = 1000
 n_star = 975
+chi = 0.9
 
 # Define V*(alpha)
 def V_star(alpha):
-    return (alpha * n_star * z) / ((alpha * a - z)  * (alpha * K + z))
+    return v_star_of_alpha(alpha, n_star, a, K, z)
 
 # Alpha domain that shows behavior and skips poles
 pole1 = z / a      # 0.01
@@ -18,25 +20,37 @@ pole2 = -z / K     # -10
 alpha_min, alpha_max = 1.1*z/a, 1.
 
 
-alpha = np.linspace(alpha_min, alpha_max, 5000)
-
-V_plot = V_star(alpha)
-
 def alpha_of_V(volume):
-    return 1.-0.9/volume
-
-# Plot
-
-volumes=np.linspace(0.1, 5., 1000)
-alphas=alpha_of_V(volumes)
-plt.figure(figsize=(8, 5))
-plt.plot(alpha, V_plot, color='navy', lw=2)
-plt.plot(alphas, volumes, color='red', lw=2)
-
-
-plt.xlim(0., 1.)
-plt.xlabel(r"$\alpha$")
-plt.ylabel(r"$V^*(\alpha)$")
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.show()
+    return get_alpha_array(1., chi, volume, regime="constant")
+
+def figure():
+    """
+        V*(alpha) against alpha(V), with their intersection.
+    """
+    alpha = np.linspace(alpha_min, alpha_max, 5000)
+    V_plot = V_star(alpha)
+    V_int, alpha_int = intersection(n_star, 1., chi, a, K, z, regime="constant")
+
+    # Plot
+    volumes=np.linspace(0.1, 5., 1000)
+    alphas=alpha_of_V(volumes)
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.plot(alpha, V_plot, color='navy', lw=2)
+    ax.plot(alphas, volumes, color='red', lw=2)
+    ax.plot(alpha_int, V_int, 'ko')
+
+    ax.set_xlim(0., 1.)
+    ax.set_xlabel(r"$\alpha$")
+    ax.set_ylabel(r"$V^*(\alpha)$")
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+def main():
+    V_int, alpha_int = intersection(n_star, 1., chi, a, K, z, regime="constant")
+    print("intersection: V =", V_int, "alpha =", alpha_int)
+    figure()
+    plt.show()
+
+if __name__=="__main__":
+    main()
@@ -44,4 +44,14 @@ def fr(a_atp, a_adp, c_atp, c_adp, y, kori, ori_sites, epsilon_cost, k_max):
     """
     p_open=get_p_open(a_atp, a_adp, c_atp, c_adp, y, kori, ori_sites, epsilon_cost)
     f_rate=get_firing_rate(p_open, k_max)
-    return f_rate
\ No newline at end of file
+    return f_rate
+
+def fr_array(a_atp, a_adp, c_atp, c_adp, y, kori, ori_sites, epsilon_cost, k_max):
+    """
+        Same as fr for arrays of concentrations (one value per cell).
+    """
+    x_t_open = (np.asarray(a_atp)-c_atp)/kori
+    x_d_open = (np.asarray(a_adp)-c_adp)/kori
+    D = np.maximum((x_d_open + x_t_open*y + 1)**2.-4.*x_t_open*(y-1.), 0.)
+    q_open = ((x_d_open + x_t_open*y + 1)/2 + np.sqrt(D)/2)**ori_sites
+    return k_max*open_probability(q_open, epsilon_cost)
@@ -0,0 +1,89 @@
+"""
+genome_sites.py
+
+Titration sites and loci with explicit positions along the chromosome.
+
+Positions are fractions of a replichore: 0 is oriC and 1 the terminus. A replication round
+(one entry of TreeManager.multifork, i.e. two forks moving in opposite directions) started at
+t_fire has reached x = (t - t_fire)/REP_TIME on both arms, and has replicated the sites with
+position <= x. The index stores the sorted positions and the cumulative number of sites, so the
+number of replicated sites of a round is a bisection, O(log n) per round and step:
+
+    sites = SiteIndex.uniform(300)          # same n_tot as the uniform approximation
+    sites = SiteIndex.load("sites.txt", loci=ECOLI_LOCI)
+    run_simulation(cfg, site_index=sites)
+
+The copy number of a locus at position p is the number of origins minus the rounds that have
+not reached p yet.
+"""
+
+from bisect import bisect_right
+import numpy as np
+
+# approximate positions of the DnaA regulatory loci of E. coli, as fractions of the replichore
+# from oriC (genome of 4.64 Mb, oriC at 3.93 Mb)
+ECOLI_LOCI = {"datA": 0.04, "DARS2": 0.41, "DARS1": 0.65}
+
+class SiteIndex:
+    """
+        Attributes:
+            positions (list): Sorted positions of the sites, in [0, 1].
+            cumulative (list): cumulative[k] is the number (total weight) of the first k sites.
+            loci (dict): Named loci and their positions.
+    """
+    def __init__(self, positions, weights=None, loci=None):
+        positions = np.asarray(positions, dtype=float)
+        if np.any((positions < 0.) | (positions > 1.)):
+            raise ValueError("site positions must be fractions of the replichore, in [0, 1]")
+        weights = np.ones(len(positions)) if weights is None else np.asarray(weights, dtype=float)
+        order = np.argsort(positions, kind="stable")
+        self.positions = positions[order].tolist()
+        self.cumulative = [0.] + np.cumsum(weights[order]).tolist()
+        self.loci = dict(loci or {})
+
+    @classmethod
+    def uniform(cls, n_sites, loci=None):
+        """
+            n_sites evenly spaced sites: the replicated sites grow linearly with the fork position,
+            as in cycle_updates.update_n_titration.
+        """
+        n = max(int(round(n_sites)), 1)
+        return cls((np.arange(n) + 0.5)/n, weights=np.full(n, n_sites/n), loci=loci)
+
+    @classmethod
+    def load(cls, path, loci=None):
+        """
+            Text file with one site per line: position, and optionally its weight.
+        """
+        data = np.atleast_2d(np.loadtxt(path, ndmin=2))
+        return cls(data[:, 0], weights=data[:, 1] if data.shape[1] > 1 else None, loci=loci)
+
+    @property
+    def total(self):
+        return self.cumulative[-1]
+
+    def count(self, x):
+        """
+            Number of sites with position <= x.
+        """
+        return self.cumulative[bisect_right(self.positions, x)]
+
+    def replicated(self, t, multifork, rep_time):
+        """
+            Sites replicated at time t by the ongoing rounds in multifork.
+        """
+        return sum(self.count(min((t - fire_time)/rep_time, 1.)) for _, fire_time in multifork)
+
+    def increment(self, t0, t1, multifork, rep_time):
+        """
+            Sites replicated between t0 and t1 by the ongoing rounds.
+        """
+        count = self.count
+        added = 0.
+        for _, fire_time in multifork:
+            added += count(min((t1 - fire_time)/rep_time, 1.)) - count(min((t0 - fire_time)/rep_time, 1.))
+        return added
+
+    def locus_copies(self, name, t, n_origins, multifork, rep_time):
+        position = self.loci[name]
+        return n_origins - sum((t - fire_time)/rep_time < position for _, fire_time in multifork)
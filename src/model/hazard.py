@@ -0,0 +1,275 @@
+"""
+hazard.py
+
+Semi-analytic distribution of the initiation volume: the firing hazard is integrated between
+initiations instead of being sampled, and the distribution is carried from one replication round
+to the next by a transfer operator.
+
+Everything is written per origin. With u the volume per origin at an initiation (before the
+origins double) and t the time since that initiation, the volume per origin is w(t) = u/2 exp(g t),
+and the forks and titration sites per origin are set by the ages a_k of the ongoing rounds
+(a_1 = t for the newest one, a_2 = t + T_1 with T_1 the previous interval between initiations):
+
+    forks = sum_k 2^(1-k),      sites = SITES*(1 - sum_k (1 - a_k/C) 2^(-k)),      over rounds with a_k < C.
+
+alpha, the free DnaA and P_open only depend on w, the forks times chi and sites/w
+(response.logit_p_open), and these per-origin quantities do not jump at division, so the map
+does not need to follow divisions. Siblings are assumed to fire together (synchronous rounds): the
+state of the cell is that of the tagged origin. Rounds older than T_1 are placed at the mean
+spacing tau = ln 2/g.
+
+After the eclipse (t > ECLIPSE) the origin fires with hazard k(t) = FIRING_MAX*P_open(t), and
+initiates LICENSING later, so the next volume per origin has
+
+    P(u' > u/2 exp(g (t + LICENSING))) = exp(-int_ECLIPSE^t k(s) ds).
+
+The stochastic engines expose an origin for TreeManager.dt per step of DT (population.FIRING_DT),
+so k is scaled by FIRING_DT/DT, and g is the growth rate of the discrete steps (LOG_GROWTH/DT).
+
+On a log grid of u the survival function gives a transition matrix, of u -> u' (order=0, T_1 = tau)
+or of (u_prev, u) -> (u, u') (order=1, T_1 from the two volumes). Its stationary distribution is
+the steady-state distribution of the volume per origin at initiation; in a steady replication
+pattern the number of origins at initiation is fixed, so its CV is also that of the cell volume.
+
+The synchronous picture holds when the rounds are regular: for sweep points with derived CHI0 and
+K_OPEN the mean and the quartiles of the volume per origin agree with run_simulation to about 1%.
+The simulated CV is larger even there, since it also contains the rare rounds in which siblings
+fire far apart or a division splits an odd number of chromosomes, which a chain on one tagged
+origin does not have; where such rounds are common (e.g. src/configs/base.yaml) only the median
+agrees. Compare quantiles, not only CVs.
+"""
+
+import time
+import numpy as np
+from src.model.response import logit_p_open
+from src.simulation.population import FIRING_DT
+from src.utils.compiled_config import compile_config
+
+class HazardOperator:
+    """
+        Transfer operator of the volume per origin at initiation.
+
+        Arguments:
+            cfg: Configuration.
+            bounds (tuple): Range of the volume per origin covered by the grid (default: found by
+                HazardOperator.auto_bounds).
+            n_grid (int): Number of bins of the log grid.
+            order (int): 0 for a chain on u (older intervals at tau), 1 for a chain on (u_prev, u).
+            substeps (int): Hazard evaluations per bin in the integral of the survival function.
+
+        Attributes:
+            edges, centers (ndarray): Bin edges and centers of the volume per origin.
+            kernel (ndarray): Transition probabilities, shape (n, n) for order 0 and (n, n, n)
+                (u_prev, u, u') for order 1; mass beyond the grid goes to the first or last bin.
+            leak (ndarray): Mass of every source state that fell beyond the grid.
+    """
+    def __init__(self, cfg, bounds=None, n_grid=200, order=0, substeps=4):
+        if order not in (0, 1):
+            raise ValueError("order must be 0 or 1, got %r"%order)
+        self.cfg = cfg
+        self.params = compile_config(cfg)
+        self.g = self.params.LOG_GROWTH/self.params.DT
+        self.tau = np.log(2.)/self.g
+        self.rate_scale = FIRING_DT/self.params.DT
+        self.order = order
+        self.substeps = substeps
+        if bounds is None:
+            bounds = self.auto_bounds()
+        self.set_grid(bounds, n_grid)
+
+    def set_grid(self, bounds, n_grid):
+        self.x_edges = np.linspace(np.log(bounds[0]), np.log(bounds[1]), n_grid + 1)
+        self.dx = self.x_edges[1] - self.x_edges[0]
+        self.edges = np.exp(self.x_edges)
+        self.centers = np.exp((self.x_edges[:-1] + self.x_edges[1:])/2.)
+        self.kernel, self.leak = self.build_kernel()
+
+    # --- hazard -----------------------------------------------------------------------------------
+
+    def hazard(self, t, u, T_1):
+        """
+            Firing hazard per unit time of an origin, t after an initiation at volume per origin u
+            that came T_1 after the previous one. Broadcasts over its arguments.
+        """
+        p = self.params
+        t, u, T_1 = np.broadcast_arrays(np.asarray(t, dtype=float), np.asarray(u, dtype=float),
+                                        np.maximum(np.asarray(T_1, dtype=float), 0.))
+        forks = np.zeros(t.shape)
+        missing = np.zeros(t.shape)
+        n_rounds = 3 + int(np.ceil(p.REP_TIME/self.tau))
+        for k in range(1, n_rounds + 1):
+            age = t if k==1 else t + T_1 + (k - 2)*self.tau
+            ongoing = age < p.REP_TIME
+            forks += np.where(ongoing, 2.**(1 - k), 0.)
+            missing += np.where(ongoing, (1. - age/p.REP_TIME)*2.**(-k), 0.)
+        w = u/2.*np.exp(self.g*t)
+        logit = logit_p_open(w, p.COOP, p.K_OPEN, p.E_COST, p.ORIGIN_SITES, n_tot=p.SITES*(1. - missing),
+                             chi=forks*p.CHI, regime=self.cfg.model.REGIME, dnaa=p.DNAA_CONCENTRATION, K=p.K)
+        rate = p.FIRING_MAX*0.5*(1. + np.tanh(logit/2.))*self.rate_scale
+        return np.where(t > p.ECLIPSE, rate, 0.)
+
+    def survival(self, x, T_1):
+        """
+            Probability that the next initiation comes after log volume per origin x_edges, for
+            sources at log volume x with interval T_1 (arrays of equal shape (m,)). Returns the
+            survival at every edge, shape (m, n_grid + 1).
+        """
+        p = self.params
+        S = self.substeps
+        fine = self.x_edges[0] + np.arange(S*(len(self.x_edges) - 1) + 1)*self.dx/S
+        # firing time of an initiation at every fine log volume
+        t_fire = (fine[None, :] - x[:, None] + np.log(2.))/self.g - p.LICENSING
+        k = self.hazard(t_fire, np.exp(x)[:, None], T_1[:, None])
+        H = np.concatenate([np.zeros((len(x), 1)), np.cumsum((k[:, 1:] + k[:, :-1])/2., axis=1)*self.dx/(S*self.g)], axis=1)
+        # hazard between the end of the eclipse and the lower edge of the grid
+        start = np.maximum(t_fire[:, 0], p.ECLIPSE)
+        s = p.ECLIPSE + (start - p.ECLIPSE)[:, None]*np.linspace(0., 1., 33)[None, :]
+        k0 = self.hazard(s, np.exp(x)[:, None], T_1[:, None])
+        H0 = np.sum((k0[:, 1:] + k0[:, :-1])/2., axis=1)*(start - p.ECLIPSE)/32.
+        return np.exp(-(H0[:, None] + H[:, ::S]))
+
+    def transitions(self, x, T_1):
+        """
+            Transition probabilities to every bin (mass beyond the grid in the end bins) and the
+            mass beyond the grid, for sources (x, T_1).
+        """
+        survival = self.survival(x, T_1)
+        P = survival[:, :-1] - survival[:, 1:]
+        below, above = 1. - survival[:, 0], survival[:, -1]
+        P[:, 0] += below
+        P[:, -1] += above
+        return P, below + above
+
+    def build_kernel(self):
+        x = np.log(self.centers)
+        if self.order==0:
+            return self.transitions(x, np.full(len(x), self.tau))
+        n = len(x)
+        kernel, leak = np.empty((n, n, n)), np.empty((n, n))
+        for a in range(n):
+            kernel[a], leak[a] = self.transitions(x, (x - x[a] + np.log(2.))/self.g)
+        return kernel, leak
+
+    # --- distributions ----------------------------------------------------------------------------
+
+    def auto_bounds(self, width=np.log(2.), n_iter=50):
+        """
+            Grid range around the fixed point of the median map u -> median(u'), width on each side
+            in log volume.
+        """
+        x = 0.
+        for _ in range(n_iter):
+            # a coarse order-0 grid of one bin per 0.01 in log volume around the current guess
+            self.x_edges = x + np.arange(-150, 151)*0.01
+            self.dx = 0.01
+            survival = self.survival(np.array([x]), np.array([self.tau]))[0]
+            new_x = np.interp(0.5, survival[::-1], self.x_edges[::-1])
+            if abs(new_x - x) < 1e-6:
+                break
+            x = new_x
+        return np.exp(x - width), np.exp(x + width)
+
+    def step(self, p):
+        """
+            One generation of the chain: p over u (order 0) or over (u_prev, u) (order 1).
+        """
+        if self.order==0:
+            return p@self.kernel
+        return np.einsum("ab,abc->bc", p, self.kernel)
+
+    def initial(self, u0):
+        """
+            Point mass at volume per origin u0 (for order 1, with the previous interval at tau).
+        """
+        p = np.zeros(len(self.centers))
+        p[np.clip(np.searchsorted(self.edges, u0) - 1, 0, len(p) - 1)] = 1.
+        return p if self.order==0 else np.diag(p)
+
+    def marginal(self, p):
+        return p if self.order==0 else p.sum(axis=0)
+
+    def iterate(self, p0, n_generations):
+        """
+            Distributions of the volume per origin at the first n_generations initiations from p0.
+        """
+        marginals, p = [], p0
+        for _ in range(n_generations):
+            p = self.step(p)
+            marginals.append(self.marginal(p))
+        return np.array(marginals)
+
+    def stationary(self, tol=1e-12, max_iter=100000):
+        """
+            Stationary distribution (over u for order 0, over (u_prev, u) for order 1), and the
+            number of iterations used (0 for the direct solve of order 0).
+        """
+        n = len(self.centers)
+        if self.order==0:
+            A = self.kernel.T - np.eye(n)
+            A[-1] = 1.
+            b = np.zeros(n)
+            b[-1] = 1.
+            p = np.clip(np.linalg.solve(A, b), 0., None)
+            return p/np.sum(p), 0
+        p = np.full((n, n), 1./n**2)
+        for i in range(1, max_iter + 1):
+            new_p = self.step(p)
+            if np.max(np.abs(new_p - p)) < tol:
+                return new_p, i
+            p = new_p
+        return p, max_iter
+
+    def quantiles(self, marginal, q):
+        cdf = np.concatenate([[0.], np.cumsum(marginal)])
+        return np.exp(np.interp(q, cdf/cdf[-1], self.x_edges))
+
+    def moments(self, marginal):
+        mean = float(marginal@self.centers)
+        std = float(np.sqrt(max(marginal@self.centers**2 - mean**2, 0.)))
+        return mean, std/mean
+
+    def statistics(self, p, q=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        """
+            Mean, CV and quantiles q of the volume per origin, mean and CV of the interval between
+            initiations under the distribution p (stationary or not), and the mass that left the grid.
+        """
+        marginal = self.marginal(p)
+        mean, cv = self.moments(marginal)
+        x = np.log(self.centers)
+        if self.order==0:
+            joint = p[:, None]*self.kernel
+            leak = float(p@self.leak)
+        else:
+            joint = np.einsum("ab,abc->bc", p, self.kernel)
+            leak = float(np.sum(p*self.leak))
+        interval = (x[None, :] - x[:, None] + np.log(2.))/self.g
+        interval_mean = float(np.sum(joint*interval))
+        interval_std = float(np.sqrt(max(np.sum(joint*interval**2) - interval_mean**2, 0.)))
+        return {"mean": mean, "cv": cv, "quantiles": dict(zip(q, self.quantiles(marginal, q).tolist())),
+                "interval_mean": interval_mean, "interval_cv": interval_std/interval_mean, "leak": leak}
+
+def initiation_distribution(cfg, order=0, n_grid=None, substeps=4, refine=True, tail=1e-9):
+    """
+        Stationary distribution of the volume per origin at initiation and its statistics.
+        With refine, a first pass on the automatic range is followed by a second one on the range
+        where the stationary density exceeds tail (widened by a quarter on each side).
+
+        Returns a dict with the bin centers, the stationary density per bin (and the stationary
+        distribution of the chain), mean, CV, quantiles, interval statistics, leak, the operator
+        and the time taken.
+    """
+    start = time.perf_counter()
+    n_grid = n_grid or (200 if order==0 else 80)
+    operator = HazardOperator(cfg, n_grid=n_grid, order=order, substeps=substeps)
+    p, n_iter = operator.stationary()
+    if refine:
+        marginal = operator.marginal(p)
+        inside = np.nonzero(marginal > tail*np.max(marginal))[0]
+        lo, hi = np.log(operator.edges[inside[0]]), np.log(operator.edges[inside[-1] + 1])
+        margin = (hi - lo)/4.
+        operator.set_grid((np.exp(lo - margin), np.exp(hi + margin)), n_grid)
+        p, n_iter = operator.stationary()
+    result = operator.statistics(p)
+    result.update(centers=operator.centers, density=operator.marginal(p), order=order, n_iter=n_iter,
+                  seconds=time.perf_counter() - start, operator=operator, stationary=p)
+    return result
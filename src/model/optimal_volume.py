@@ -0,0 +1,91 @@
+"""
+optimal_volume.py
+
+Threshold volume V*(alpha) and its intersection with the fraction of active DnaA alpha(V),
+evaluated on broadcastable arrays of parameters.
+
+V*(alpha) = alpha*n_star*z/((alpha*a - z)*(alpha*K + z)) is finite and positive for alpha > z/a,
+while alpha(V) follows the "constant" or "linear" regime of cycle_updates.get_alpha.
+The self-consistent initiation volume solves V = V*(alpha(V)).
+"""
+
+import numpy as np
+
+def get_alpha_array(n_forks, chi, volume, regime):
+    """
+        Vectorized version of cycle_updates.get_alpha.
+    """
+    chi = np.asarray(n_forks)*np.asarray(chi)
+    volume = np.asarray(volume, dtype=float)
+    if regime=="constant":
+        alpha = (volume-chi)/volume
+    elif regime=="linear":
+        alpha = volume/(volume+chi)
+    else:
+        raise ValueError("unknown regime: %s"%regime)
+    return np.maximum(alpha, 1e-10)
+
+def v_star_of_alpha(alpha, n_star, a, K, z):
+    """
+        Volume at which origins open for a given fraction alpha of active DnaA.
+    """
+    return (alpha*n_star*z)/((alpha*a - z)*(alpha*K + z))
+
+def pole_volume(n_forks, chi, a, z, regime):
+    """
+        Volume at which alpha(V) = z/a, below which V*(alpha(V)) is not defined.
+    """
+    chi = np.asarray(n_forks)*np.asarray(chi)
+    ratio = z/np.asarray(a, dtype=float)
+    if regime=="constant":
+        return chi/(1. - ratio)
+    if regime=="linear":
+        return chi*ratio/(1. - ratio)
+    raise ValueError("unknown regime: %s"%regime)
+
+def intersection(n_star, n_forks, chi, a, K, z, regime, n_iter=100):
+    """
+        Solves V = V*(alpha(V)) for the broadcast of all parameter arrays by bisection in log(V).
+        The bracket starts just above the pole volume, where V*(alpha(V)) diverges, and is
+        expanded upwards until V exceeds V*(alpha(V)). Points with a <= z get NaN.
+
+        Returns the volume and alpha at the intersection, with the broadcast shape.
+    """
+    n_star, n_forks, chi, a, K, z = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (n_star, n_forks, chi, a, K, z)))
+    valid = a > z
+    a = np.where(valid, a, 2.*z + 1.)
+
+    def F(volume):
+        alpha = get_alpha_array(n_forks, chi, volume, regime)
+        return volume - v_star_of_alpha(alpha, n_star, a, K, z)
+
+    v_pole = pole_volume(n_forks, chi, a, z, regime)
+    v_inf = v_star_of_alpha(1., n_star, a, K, z)
+    lo = np.maximum(v_pole*(1.+1e-12), 1e-12*np.maximum(v_inf, 1.))
+    hi = np.maximum(2.*v_pole, 2.*v_inf)
+    for _ in range(200):
+        below = F(hi) < 0.
+        if not np.any(below):
+            break
+        hi = np.where(below, 2.*hi, hi)
+    log_lo, log_hi = np.log(lo), np.log(hi)
+    for _ in range(n_iter):
+        log_mid = 0.5*(log_lo + log_hi)
+        negative = F(np.exp(log_mid)) < 0.
+        log_lo = np.where(negative, log_mid, log_lo)
+        log_hi = np.where(negative, log_hi, log_mid)
+    volume = np.where(valid, np.exp(0.5*(log_lo + log_hi)), np.nan)
+    return volume, get_alpha_array(n_forks, chi, volume, regime)
+
+def main():
+    K = np.array([1., 2., 5.])[:, None]
+    chi = np.linspace(0., 2., 5)[None, :]
+    for regime in ("constant", "linear"):
+        volume, alpha = intersection(n_star=975., n_forks=1., chi=chi, a=1000., K=K, z=10., regime=regime)
+        print(regime)
+        print(volume)
+        print(alpha)
+    return 0
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+response.py
+
+Switch-like response of the origin, P_open(V), for many parameter sets at once.
+
+At fixed titration sites n_tot, total chi and DnaA concentration (by default the steady state at
+initiation: n_star sites and CHI0), the volume sets alpha(V) (cycle_updates.get_alpha), the free
+and bound DnaA (helpers.get_c) and P_open (firing_rate.get_p_open). With
+lambda(V) the largest eigenvalue of the transfer matrix,
+
+    logit P_open(V) = ORIGIN_SITES*log(lambda(V)) - E_COST,
+
+so the effective Hill coefficient is the log-derivative n_eff(V) = d logit P_open/d log V,
+which equals 4*dP_open/dlogV at the midpoint P_open = 1/2 and is exactly H for a Hill function.
+
+The parameters COOP, K_OPEN, E_COST and ORIGIN_SITES can be arrays of any (broadcastable) shape.
+analyze(..., method="analytic") locates the midpoint by vectorized bisection on log V and takes the
+log-derivative there; method="fit" fits Hill functions to all the curves at once with batched
+Levenberg-Marquardt steps and the analytic Jacobian.
+"""
+
+from dataclasses import asdict
+import numpy as np
+from src.model.optimal_volume import get_alpha_array
+from src.utils.helpers import get_c_array
+from src.utils.optimal_parameters import get_optimal_parameters
+
+def response_state(cfg):
+    """
+        Sites, total chi and concentrations at initiation in the steady state of cfg.
+    """
+    model = cfg.model
+    n_star = float(get_optimal_parameters(**asdict(model))["n_star"])
+    return {"n_tot": n_star, "chi": model.CHI0, "regime": model.REGIME,
+            "dnaa": model.DNAA_CONCENTRATION, "K": model.K}
+
+def logit_p_open(volume, COOP, K_OPEN, E_COST, ORIGIN_SITES, n_tot, chi, regime, dnaa, K):
+    """
+        logit of P_open at the given volumes, broadcast over the volumes and the parameters.
+    """
+    volume = np.asarray(volume, dtype=float)
+    alpha = get_alpha_array(1., chi, volume, regime)
+    c = get_c_array(dnaa, K, n_tot/volume)
+    x_t = alpha*(dnaa - c)/K_OPEN
+    x_d = (1. - alpha)*(dnaa - c)/K_OPEN
+    b = x_d + x_t*COOP + 1.
+    lam = b/2. + np.sqrt(np.maximum(b**2. - 4.*x_t*(COOP - 1.), 0.))/2.
+    return ORIGIN_SITES*np.log(lam) - E_COST
+
+def p_open(volume, COOP, K_OPEN, E_COST, ORIGIN_SITES, state):
+    """
+        P_open(V), computed through its logit so that it does not overflow for large ORIGIN_SITES.
+    """
+    logit = logit_p_open(volume, COOP, K_OPEN, E_COST, ORIGIN_SITES, **state)
+    return 0.5*(1. + np.tanh(logit/2.))
+
+def hill(volume, H, midpoint):
+    """
+        V^H/(midpoint^H + V^H), written with tanh so that it does not overflow for large H.
+    """
+    return 0.5*(1. + np.tanh(H*np.log(volume/midpoint)/2.))
+
+def hill_jacobian(volume, H, midpoint):
+    """
+        Derivatives of hill with respect to H and midpoint.
+    """
+    P = hill(volume, H, midpoint)
+    dP = P*(1. - P)
+    return dP*np.log(volume/midpoint), -dP*H/midpoint
+
+def midpoint_bisection(params, state, v_min, v_max, n_grid=64, n_iter=50):
+    """
+        Volume of the first crossing of P_open = 1/2 in [v_min, v_max], for every parameter set.
+        A coarse log grid brackets the crossing, then bisection on log V refines all sets at once.
+        Sets without a crossing get NaN.
+    """
+    shape = np.broadcast(*(np.asarray(value) for value in params.values())).shape
+    flat = {name: np.broadcast_to(value, shape).reshape(-1, 1) for name, value in params.items()}
+    grid = np.linspace(np.log(v_min), np.log(v_max), n_grid)
+    logit = logit_p_open(np.exp(grid), **flat, **state)
+    crossing = (logit[:, :-1] < 0.) & (logit[:, 1:] >= 0.)
+    found = crossing.any(axis=1)
+    k = np.argmax(crossing, axis=1)
+    lo, hi = grid[k], grid[np.minimum(k + 1, n_grid - 1)]
+    flat = {name: value[:, 0] for name, value in flat.items()}
+    for _ in range(n_iter):
+        mid = (lo + hi)/2.
+        below = logit_p_open(np.exp(mid), **flat, **state) < 0.
+        lo, hi = np.where(below, mid, lo), np.where(below, hi, mid)
+    midpoint = np.where(found, np.exp((lo + hi)/2.), np.nan)
+    return midpoint.reshape(shape)
+
+def hill_coefficient(volume, params, state, h=1e-4):
+    """
+        Effective Hill coefficient d logit P_open/d log V at the given volumes (central difference).
+    """
+    up = logit_p_open(volume*np.exp(h), **params, **state)
+    down = logit_p_open(volume*np.exp(-h), **params, **state)
+    return (up - down)/(2.*h)
+
+def fit_hill(volume, P, H0, midpoint0, n_iter=50):
+    """
+        Least-squares fit of hill(V, H, midpoint) to every row of P (shape (n_sets, n_volumes)),
+        by Levenberg-Marquardt steps solved in closed form (2x2 normal equations) for all rows at
+        once; each row keeps its own damping, and a step is taken only if it reduces the residual.
+        Returns H, midpoint and the rms residual of every row.
+    """
+    volume = np.asarray(volume, dtype=float)
+    H, midpoint = np.array(H0, dtype=float), np.array(midpoint0, dtype=float)
+    mu = np.full(H.shape, 1e-3)
+
+    def sse(H, midpoint):
+        return np.sum((P - hill(volume, H[:, None], midpoint[:, None]))**2, axis=1)
+
+    cost = sse(H, midpoint)
+    for _ in range(n_iter):
+        r = P - hill(volume, H[:, None], midpoint[:, None])
+        J_H, J_m = hill_jacobian(volume, H[:, None], midpoint[:, None])
+        a, b, d = np.sum(J_H*J_H, axis=1), np.sum(J_H*J_m, axis=1), np.sum(J_m*J_m, axis=1)
+        g_H, g_m = np.sum(J_H*r, axis=1), np.sum(J_m*r, axis=1)
+        a_mu, d_mu = a*(1. + mu) + 1e-12, d*(1. + mu) + 1e-12
+        det = a_mu*d_mu - b*b
+        new_H = H + (d_mu*g_H - b*g_m)/det
+        new_midpoint = midpoint + (a_mu*g_m - b*g_H)/det
+        valid = (new_midpoint > 0.) & np.isfinite(new_H)
+        new_cost = np.where(valid, sse(new_H, np.where(valid, new_midpoint, midpoint)), np.inf)
+        better = new_cost < cost
+        H = np.where(better, new_H, H)
+        midpoint = np.where(better, new_midpoint, midpoint)
+        cost = np.where(better, new_cost, cost)
+        mu = np.where(better, mu/3., mu*4.)
+    rms = np.sqrt(cost/P.shape[1])
+    return H, midpoint, rms
+
+def analyze(params, state, v_min=0.05, v_max=20., method="analytic", n_grid=200):
+    """
+        Midpoint and effective Hill coefficient of P_open(V) for every parameter set.
+
+        Arguments:
+            params (dict): COOP, K_OPEN, E_COST and ORIGIN_SITES, scalars or arrays.
+            state (dict): n_tot, chi, regime, dnaa and K, e.g. response_state(cfg).
+            method (str): "analytic" (log-derivative at the midpoint) or "fit" (Hill fit on a log
+                grid of n_grid volumes, started from the analytic values).
+        Returns a dict of arrays with the shape of the broadcast parameters.
+    """
+    params = {name: np.asarray(params[name], dtype=float) for name in ("COOP", "K_OPEN", "E_COST", "ORIGIN_SITES")}
+    midpoint = midpoint_bisection(params, state, v_min, v_max)
+    shape = midpoint.shape
+    n_eff = hill_coefficient(midpoint, {name: np.broadcast_to(value, shape) for name, value in params.items()}, state)
+    result = {"midpoint": midpoint, "n_eff": n_eff}
+    if method=="analytic":
+        return result
+    if method!="fit":
+        raise ValueError("unknown method: %s"%method)
+    flat = {name: np.broadcast_to(value, shape).reshape(-1, 1) for name, value in params.items()}
+    volume = np.geomspace(v_min, v_max, n_grid)
+    P = 0.5*(1. + np.tanh(logit_p_open(volume, **flat, **state)/2.))
+    ok = np.isfinite(midpoint.ravel())
+    H0 = np.where(ok, n_eff.ravel(), 1.)
+    m0 = np.where(ok, midpoint.ravel(), np.sqrt(v_min*v_max))
+    H, m, rms = fit_hill(volume, P, H0, m0)
+    # without a crossing in [v_min, v_max] there is no switch to fit
+    H, m, rms = np.where(ok, H, np.nan), np.where(ok, m, np.nan), np.where(ok, rms, np.nan)
+    result.update(H_fit=H.reshape(shape), midpoint_fit=m.reshape(shape), rms_fit=rms.reshape(shape))
+    return result
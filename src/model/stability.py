@@ -0,0 +1,175 @@
+"""
+stability.py
+
+Return map of the initiation times used in the dynamical stability analysis and a batch
+engine that classifies the stability of its fixed point over grids of (C, tau, gamma).
+
+The map sends the time t1 between two consecutive initiations to the next one, t2, by solving
+    (1 + rho(t1) + gamma) exp(lambda t2) = 2 (1 + rho(t2) + gamma),     rho(t) = min(1, t/C).
+Its fixed point is t* = tau; the multiplier f'(t*) decides whether the replication schedule
+relaxes to the steady state or keeps oscillating.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.optimize import root_scalar
+
+STABLE = "stable"
+UNSTABLE = "unstable"
+MARGINAL = "marginal"
+PERIOD_2 = "period_2"
+NOT_CONVERGED = "not_converged"
+NO_SOLUTION = "no_solution"
+CLASSES = (STABLE, UNSTABLE, MARGINAL, PERIOD_2, NOT_CONVERGED, NO_SOLUTION)
+
+def h(t2, t1, C, lamb, gamma=0.):
+    rho = min(1, t1 / C)
+    LHS = (1 + rho + gamma) * np.exp(lamb * t2)
+    new_rho = min(1, t2 / C)
+    RHS = 2 * (1 + new_rho + gamma)
+    return LHS - RHS
+
+def solve_t2(t1, C, lamb, gamma=0., t3_bounds=(1e-6, 100)):
+    try:
+        result = root_scalar(h, args=(t1, C, lamb, gamma), bracket=t3_bounds, method='brentq')
+        return result.root if result.converged else 0
+    except ValueError:
+        return 0
+
+def gamma_threshold(C, tau):
+    """
+        Smallest gamma for which the fixed point t*=tau is linearly stable.
+    """
+    return tau/C*(2./np.log(2.)-1.)-1.
+
+def analytic_multiplier(C, tau, gamma):
+    """
+        Derivative of the return map at the fixed point t*=tau, from implicit differentiation of h.
+    """
+    C, tau, gamma = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (C, tau, gamma)))
+    lamb = np.log(2.)/tau
+    rho_prime = np.where(tau < C, 1./C, 0.)
+    rho = np.minimum(1., tau/C)
+    return -2.*rho_prime/(2.*lamb*(1.+rho+gamma) - 2.*rho_prime)
+
+def solve_t2_array(t1, C, lamb, gamma, n_bisect=64):
+    """
+        Vectorized version of solve_t2: solves the return map for arrays of (t1, C, lambda, gamma)
+        at once by bisection on [1e-6, 4 ln2/lambda]. Entries without a sign change are set to 0,
+        as in the scalar solver.
+    """
+    t1, C, lamb, gamma = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (t1, C, lamb, gamma)))
+    lhs_factor = 1. + np.minimum(1., t1/C) + gamma
+
+    def F(t2):
+        return lhs_factor*np.exp(lamb*t2) - 2.*(1. + np.minimum(1., t2/C) + gamma)
+
+    lo = np.full(t1.shape, 1e-6)
+    hi = 4.*np.log(2.)/lamb
+    f_lo = F(lo)
+    valid = np.sign(f_lo) != np.sign(F(hi))
+    for _ in range(n_bisect):
+        mid = 0.5*(lo+hi)
+        f_mid = F(mid)
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(left, mid, lo)
+        f_lo = np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+    return np.where(valid, 0.5*(lo+hi), 0.)
+
+def classify_orbit(C, tau, gamma, t0=None, n_iter=200, tol=1e-7, eps=1e-5):
+    """
+        Iterates the return map for arrays of (C, tau, gamma) starting from t0 (default C/2) and
+        classifies the asymptotic behavior.
+
+        Returns a dict with:
+            - "multiplier": numerical derivative of the map at the fixed point (product of the
+              derivatives along the orbit for a 2-cycle).
+            - "t_final": last two iterates of the orbit.
+            - "failed": the orbit left the bracket of the solver (e.g. it diverged from an
+              unstable fixed point).
+            - "converged": the orbit reached a fixed point within n_iter iterations.
+            - "label": one of CLASSES. A fixed point that is stable by its multiplier but that the
+              orbit did not reach from t0 within n_iter iterations (slow relaxation close to the
+              threshold, or t0 outside of its basin) is NOT_CONVERGED. NO_SOLUTION only where the
+              multiplier at t*=tau cannot be computed.
+    """
+    C, tau, gamma = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (C, tau, gamma)))
+    lamb = np.log(2.)/tau
+    t = 0.5*C if t0 is None else np.broadcast_to(np.asarray(t0, dtype=float), C.shape)
+    failed = np.zeros(C.shape, dtype=bool)
+    history = [t]
+    for _ in range(n_iter):
+        t = solve_t2_array(t, C, lamb, gamma)
+        failed |= t == 0.
+        history.append(t)
+    t_prev, t_last = history[-2], history[-1]
+    period_1 = np.abs(t_last-t_prev) < tol*tau
+    period_2 = ~period_1 & (np.abs(t_last-history[-3]) < tol*tau)
+
+    def derivative(x):
+        return (solve_t2_array(x+eps, C, lamb, gamma) - solve_t2_array(x-eps, C, lamb, gamma))/(2.*eps)
+
+    # the fixed point of the map is t*=tau whether or not the orbit reaches it
+    multiplier = derivative(tau)
+    cycle_multiplier = derivative(t_prev)*derivative(t_last)
+
+    # the solver returns 0 outside of its bracket, so the derivative at tau is meaningless there
+    no_multiplier = ~np.isfinite(multiplier) | (solve_t2_array(tau-eps, C, lamb, gamma) == 0.) \
+                    | (solve_t2_array(tau+eps, C, lamb, gamma) == 0.)
+
+    label = np.where(np.abs(multiplier) < 1.-1e-3, STABLE,
+                     np.where(np.abs(multiplier) > 1.+1e-3, UNSTABLE, MARGINAL)).astype(object)
+    label[period_2 & ~failed & (np.abs(multiplier) >= 1.)] = PERIOD_2
+    label[(label == STABLE) & ~period_1] = NOT_CONVERGED
+    label[no_multiplier] = NO_SOLUTION
+    multiplier = np.where(label == PERIOD_2, cycle_multiplier, multiplier)
+    return {"multiplier": multiplier, "t_final": np.stack((t_prev, t_last), axis=-1), "failed": failed,
+            "converged": period_1, "label": label}
+
+def _classify_chunk(args):
+    C, tau, gamma, kwargs = args
+    return classify_orbit(C, tau, gamma, **kwargs)
+
+def phase_diagram(C, tau, gamma, n_workers=None, chunk_size=4096, **kwargs):
+    """
+        Classifies the stability of the return map on the grid spanned by the broadcast of
+        (C, tau, gamma). Duplicated parameter triplets are evaluated once (the only reuse of map
+        evaluations: the orbits of distinct points share nothing), the unique points are split
+        into chunks and each chunk is iterated in a vectorized way in a separate process.
+
+        Returns a dict with "multiplier", "label" and "gamma_threshold", all with the broadcast shape.
+    """
+    C, tau, gamma = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (C, tau, gamma)))
+    shape = C.shape
+    points = np.stack((C.ravel(), tau.ravel(), gamma.ravel()), axis=1)
+    unique, inverse = np.unique(points, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    chunks = [(unique[i:i+chunk_size, 0], unique[i:i+chunk_size, 1], unique[i:i+chunk_size, 2], kwargs)
+              for i in range(0, len(unique), chunk_size)]
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(chunks) == 1:
+        results = [_classify_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(_classify_chunk, chunks))
+    multiplier = np.concatenate([r["multiplier"] for r in results])[inverse]
+    label = np.concatenate([r["label"] for r in results])[inverse]
+    return {
+        "multiplier": multiplier.reshape(shape),
+        "label": label.reshape(shape),
+        "gamma_threshold": gamma_threshold(C, tau),
+    }
+
+def main():
+    C = np.linspace(20., 80., 61)[:, None, None]
+    tau = np.linspace(15., 60., 46)[None, :, None]
+    gamma = np.linspace(0., 2., 21)[None, None, :]
+    diagram = phase_diagram(C, tau, gamma)
+    for name in CLASSES:
+        print(name, int(np.sum(diagram["label"] == name)))
+    return 0
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+v_star_trajectory.py
+
+Deterministic prediction of the threshold volume V*(t) along the steady-state cell cycle.
+
+In steady state replication rounds start every doubling time tau. Taking the initiation of
+interest at t=0, round k starts at k*tau on 2**(cycles+k) origins (cycles as in
+src/utils/setup.term_init_cycles) and adds 2 forks per origin for a time C. The number of
+titration sites n_star(t), the number of forks, chi(t)=chi0*n_forks(t) and
+    V*(t) = (n_star + a*chi)*(1 + sqrt(z/a))/(2*(a - z))
+are evaluated here for arbitrary C, D, tau and chi0, broadcasting over parameter sets.
+"""
+
+import numpy as np
+from src.utils.setup import get_n_star_n_forks
+
+def _as_arrays(*args):
+    return np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in args))
+
+def get_cycles(C, D, tau):
+    """
+        Largest number of co-existing replication cycles, as in term_init_cycles.
+    """
+    return np.floor((C+D)/tau)
+
+def get_t_in(C, D, tau):
+    """
+        Time of initiation measured from cell birth, as in term_init_cycles.
+    """
+    return (get_cycles(C, D, tau)+1)*tau - C - D
+
+def fork_site_schedule(t, C, tau, D, sites, last_round=None, per_cell=True):
+    """
+        Returns the number of forks, titration sites and origins at times t (relative to the
+        initiation at t=0) for the broadcast of the parameters (C, tau, D, sites).
+        Rounds with index larger than last_round (if given) are not initiated.
+        With per_cell=True the counts are those of a single cell, i.e. they are halved at each
+        division (divisions happen at -t_in + j*tau); otherwise the whole lineage is counted.
+
+        The output arrays have shape broadcast(C, tau, D, sites).shape + t.shape.
+    """
+    t = np.asarray(t, dtype=float)
+    C, tau, D, sites = _as_arrays(C, tau, D, sites)
+    cycles = get_cycles(C, D, tau)[..., None]
+    C_, tau_, sites_ = C[..., None], tau[..., None], sites[..., None]
+    # any round completed before min(t) can be taken as the reference genome content
+    k_lo = int(np.floor((t.min() - C.max())/tau.min())) - 1
+    k_hi = int(np.floor(t.max()/tau.min()))
+    if last_round is not None:
+        k_hi = min(k_hi, int(last_round))
+    shape = C.shape + t.shape
+    genomes = np.broadcast_to(2.**(cycles+k_lo), shape).copy()
+    n_forks = np.zeros(shape)
+    origins = genomes.copy()
+    for k in range(k_lo, k_hi+1):
+        start = k*tau_
+        n_origins = 2.**(cycles+k)
+        elapsed = t - start
+        genomes += n_origins*np.clip(elapsed/C_, 0., 1.)
+        n_forks += 2.*n_origins*((elapsed >= 0.) & (elapsed < C_))
+        origins += n_origins*(elapsed >= 0.)
+    n_star = sites_*genomes
+    if per_cell:
+        t_in = get_t_in(C, D, tau)[..., None]
+        scale = 2.**(-np.floor((t + t_in)/tau_))
+        n_forks, n_star, origins = n_forks*scale, n_star*scale, origins*scale
+    return n_forks, n_star, origins
+
+def get_v_star(n_star, chi, a, z):
+    """
+        Threshold volume at which the free DnaA-ATP reaches z.
+    """
+    if np.any(np.asarray(a) <= z):
+        raise ValueError("Parameters must satisfy a > 0 and a > z for V* to be finite.")
+    return ((n_star + a*chi)*(1. + np.sqrt(z/a)))/(2.*(a - z))
+
+def v_star_trajectory(t, C, tau, D, sites, chi0, a=1000., z=10., per_cell=True, normalize=True):
+    """
+        Evaluates V*(t) together with the exponentially growing volume V(t), with V(0)=V*(0^-),
+        i.e. the cell reaches the threshold exactly at the initiation at t=0.
+        With normalize=True both volumes are divided by V(0).
+
+        Returns a dict of arrays with the broadcast parameter shape followed by t.shape.
+    """
+    t = np.asarray(t, dtype=float)
+    C, tau, D, sites, chi0, a = _as_arrays(C, tau, D, sites, chi0, a)
+    n_forks, n_star, origins = fork_site_schedule(t, C, tau, D, sites, per_cell=per_cell)
+    chi = chi0[..., None]*n_forks
+    V_star = get_v_star(n_star, chi, a[..., None], z)
+
+    forks_0, n_star_0, _ = fork_site_schedule(np.zeros(1), C, tau, D, sites, last_round=-1, per_cell=per_cell)
+    V0 = get_v_star(n_star_0, chi0[..., None]*forks_0, a[..., None], z)
+    V = V0*np.exp(np.log(2.)/tau[..., None]*t)
+    if per_cell:
+        t_in = get_t_in(C, D, tau)[..., None]
+        V = V*2.**(-np.floor((t + t_in)/tau[..., None]))
+    if normalize:
+        V, V_star = V/V0, V_star/V0
+    return {
+        "t": t,
+        "n_forks": n_forks,
+        "n_star": n_star,
+        "origins": origins,
+        "chi": chi,
+        "V_star": V_star,
+        "V": V,
+    }
+
+def from_config(cfg, t, z=10., **kwargs):
+    """
+        V*(t) for the parameters of a Config. As in run_simulation, chi per fork is
+        CHI0 divided by the number of forks at initiation.
+    """
+    _, n_forks_init = get_n_star_n_forks(cfg)
+    return v_star_trajectory(t,
+                             C=cfg.model.REP_TIME,
+                             tau=np.log(2.)/cfg.model.GROWTH_RATE,
+                             D=cfg.model.D,
+                             sites=cfg.model.SITES,
+                             chi0=cfg.model.CHI0/n_forks_init,
+                             a=cfg.model.DNAA_CONCENTRATION,
+                             z=z,
+                             **kwargs)
@@ -4,24 +4,27 @@ from src.utils.helpers import get_c
 def get_alpha(n_forks, chi, volume, regime):
     """
         returns the fraction of active DnaA
+        regime: "constant" or "linear", as a str or a compiled_config.Regime (CompiledParams.REGIME).
     """
     chi=n_forks*chi
-    if regime=="constant":
-        alpha=(volume-chi)/volume
-    elif regime=="linear":
+    if regime=="linear":
         alpha=volume/(volume+chi)
+    elif regime=="constant":
+        alpha=(volume-chi)/volume
     else:
-        print("unknown regime in get_alpha_opt")
-        return 0
-    return max((alpha, 1e-10))
+        raise ValueError("unknown regime: %s"%regime)
+    return 1e-10 if alpha<1e-10 else alpha
 
-def update_volume(volume, dt, cfg):
+def update_volume(volume, dt, params):
     """
         Exponentially updates cell volume based on the growth rate.
+        At the step of the config, the factor 1+GROWTH_RATE*dt is the precomputed GROWTH_FACTOR.
     """
-    return volume*(1. + cfg.model.GROWTH_RATE*dt)
+    if dt==params.DT:
+        return volume*params.GROWTH_FACTOR
+    return volume*(1. + params.GROWTH_RATE*dt)
 
-def update_n_titration(n_tot, n_forks, dt, cfg):
+def update_n_titration(n_tot, n_forks, dt, params):
     """
         Updates the total number of titration sites over time.
 
@@ -29,39 +32,67 @@ def update_n_titration(n_tot, n_forks, dt, cfg):
         As replication progresses, new sites are added proportionally to the number of forks.
 
     """
-    return n_tot + n_forks*cfg.model.SITES/(2*cfg.model.REP_TIME)*dt
+    return n_tot + n_forks*params.SITE_RATE*dt
 
-def make_step(n_forks, n_tot, volume, a_atp, a_adp, time, dt, y, chi, step, cfg):
+def grow(n_forks, n_tot, volume, time, dt, params, sites=None):
     """
-        This function updates the cell volume, titration site count, DnaA activation state,
-        and computes the firing rate. 
+        Growth phase of make_step: new volume and number of titration sites.
+    """
+    volume = update_volume(volume, dt, params)
+    if sites is None:
+        n_tot = update_n_titration(n_tot, n_forks, dt, params=params)
+    else:
+        n_tot = n_tot + sites(time, time+dt, params)
+    return volume, n_tot
+
+def activation(n_forks, chi, volume, params):
+    """
+        Active fraction alpha and concentrations of DnaA-ATP and DnaA-ADP.
+    """
+    alpha = get_alpha(n_forks, chi, volume, params.REGIME)
+    return alpha, alpha*params.DNAA_CONCENTRATION, (1.-alpha)*params.DNAA_CONCENTRATION
+
+def bound(alpha, n_tot, volume, params):
+    """
+        Concentrations of DnaA-ATP and DnaA-ADP bound to the titration sites.
+    """
+    c = get_c(params.DNAA_CONCENTRATION, params.K, n_tot/volume)
+    return alpha*c, (1.-alpha)*c
+
+def firing_rate(a_atp, a_adp, c_atp, c_adp, n_forks, n_tot, volume, y, chi, step, params):
+    """
+        Firing rate k_max*P_open, or the perfect step-wise response if step is set.
     """
-    volume = update_volume(volume, dt, cfg)
-    n_tot = update_n_titration(n_tot, n_forks, dt, cfg=cfg)
-    c_tot = n_tot/volume
-    alpha = get_alpha(n_forks, chi, volume, regime=cfg.model.REGIME)
-    a_atp, a_adp = alpha*cfg.model.DNAA_CONCENTRATION, (1.-alpha)*cfg.model.DNAA_CONCENTRATION  
-    c = get_c(cfg.model.DNAA_CONCENTRATION, cfg.model.K, c_tot)
-    c_atp, c_adp = alpha*c, (1.-alpha)*c
     if step:
         #if a_atp>c_tot-c_adp:
         #if a_atp-c_atp>10.:
-        if cfg.model.REGIME=="linear":
-            if volume>(n_tot+10.*chi*n_forks)/(cfg.model.DNAA_CONCENTRATION-10.):
-                f_rate=1e6
-            else:
-                f_rate=0.
-        else: 
-            if a_atp-c_atp>10.:
-                f_rate=1e6
-            else: 
-                f_rate=0
-    else:
-        f_rate = firing.fr(a_atp, a_adp, c_atp, c_adp, y, 
-                        kori=cfg.model.K_OPEN, 
-                        ori_sites=cfg.model.ORIGIN_SITES, 
-                        epsilon_cost=cfg.model.E_COST, 
-                        k_max=cfg.model.FIRING_MAX) 
+        if params.LINEAR:
+            if volume>(n_tot+10.*chi*n_forks)/(params.DNAA_CONCENTRATION-10.):
+                return 1e6
+            return 0.
+        if a_atp-c_atp>10.:
+            return 1e6
+        return 0
+    return firing.fr(a_atp, a_adp, c_atp, c_adp, y, 
+                     kori=params.K_OPEN, 
+                     ori_sites=params.ORIGIN_SITES, 
+                     epsilon_cost=params.E_COST, 
+                     k_max=params.FIRING_MAX) 
+
+def make_step(n_forks, n_tot, volume, a_atp, a_adp, time, dt, y, chi, step, params, sites=None):
+    """
+        This function updates the cell volume, titration site count, DnaA activation state,
+        and computes the firing rate. 
+        params is the CompiledParams returned by src.utils.compiled_config.compile_config.
+        If sites is given (e.g. TreeManager.new_sites), sites(time, time+dt, params) replaces the
+        uniform update of the titration sites.
+        The phases (grow, activation, bound, firing_rate) are shared with
+        profiling.profiled_make_step, which times each of them.
+    """
+    volume, n_tot = grow(n_forks, n_tot, volume, time, dt, params, sites)
+    alpha, a_atp, a_adp = activation(n_forks, chi, volume, params)
+    c_atp, c_adp = bound(alpha, n_tot, volume, params)
+    f_rate = firing_rate(a_atp, a_adp, c_atp, c_adp, n_forks, n_tot, volume, y, chi, step, params)
     time += dt
     return time, a_atp, a_adp, c_atp, c_adp, volume, n_tot, f_rate
 
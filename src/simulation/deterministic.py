@@ -0,0 +1,226 @@
+"""
+deterministic.py
+
+Noise-free (mean-field) version of the replication cycle. All origins of the cell fire together
+as soon as the step response of make_step switches on, i.e. initiation is a threshold crossing.
+Between two events the volume grows exponentially and the number of titration sites grows
+linearly with the number of forks, so the crossing time is found by root finding on these
+analytic trajectories instead of stepping with a fixed DT.
+
+Events follow the same rules as TreeManager: firing -> initiation after LICENSING,
+no re-firing during ECLIPSE after an initiation, termination REP_TIME after initiation and
+division D after termination.
+"""
+
+import numpy as np
+from scipy.optimize import brentq
+from src.simulation.cycle_updates import get_alpha
+from src.utils.compiled_config import compile_config
+from src.utils.config_loader import load_config
+
+THRESHOLD = 10.     # free DnaA-ATP concentration at which the step response switches on
+
+def threshold_function(volume, n_tot, n_forks, chi, cfg, z=THRESHOLD):
+    """
+        Positive when the step response of make_step fires, negative otherwise.
+        Works on arrays of volumes and site numbers.
+    """
+    dnaa = cfg.model.DNAA_CONCENTRATION
+    if cfg.model.REGIME=="linear":
+        return volume - (n_tot + z*chi*n_forks)/(dnaa - z)
+    alpha = np.maximum((volume - n_forks*chi)/volume, 1e-10)
+    c_tot = n_tot/volume
+    K = cfg.model.K
+    c = ((dnaa+K+c_tot)-np.sqrt((dnaa+K+c_tot)**2.-4.*dnaa*c_tot))/2.
+    return alpha*(dnaa - c) - z
+
+class MeanFieldCell:
+    """
+        State of the cell in the deterministic model.
+
+        Attributes:
+            time (float): Current time.
+            volume (float): Cell volume.
+            n_tot (float): Number of titration sites.
+            origins (float): Number of origins.
+            genomes (float): Number of fully replicated chromosomes (ancestor origins).
+            rounds (list): Ongoing replication rounds as [initiation time, number of fired origins].
+            divisions (list): Scheduled division times.
+            pending_initiation (float or None): Time of the next initiation, if origins have fired.
+            last_initiation (float or None): Time of the last initiation (for the eclipse period).
+    """
+    def __init__(self, cfg):
+        self.time = 0.
+        self.volume = 1.
+        self.n_tot = cfg.model.SITES
+        self.origins = 1.
+        self.genomes = 1.
+        self.rounds = []
+        self.divisions = []
+        self.pending_initiation = None
+        self.last_initiation = None
+
+    @property
+    def n_forks(self):
+        return 2.*sum(n for _, n in self.rounds)
+
+    def advance(self, new_time, cfg):
+        """
+            Moves the state along the analytic trajectory up to new_time.
+        """
+        dt = new_time - self.time
+        self.volume *= np.exp(cfg.model.GROWTH_RATE*dt)
+        self.n_tot += self.n_forks*cfg.model.SITES/(2*cfg.model.REP_TIME)*dt
+        self.time = new_time
+
+    def trajectory(self, times, cfg):
+        dt = np.asarray(times) - self.time
+        volume = self.volume*np.exp(cfg.model.GROWTH_RATE*dt)
+        n_tot = self.n_tot + self.n_forks*cfg.model.SITES/(2*cfg.model.REP_TIME)*dt
+        return volume, n_tot
+
+    def next_event_time(self, cfg):
+        candidates = [start + cfg.model.REP_TIME for start, _ in self.rounds] + self.divisions
+        if self.pending_initiation is not None:
+            candidates.append(self.pending_initiation)
+        return min(candidates) if candidates else np.inf
+
+    def initiate(self):
+        self.rounds.append([self.time, self.origins])
+        self.origins *= 2.
+        self.last_initiation = self.time
+        self.pending_initiation = None
+
+    def terminate(self, cfg):
+        finished = [r for r in self.rounds if r[0] + cfg.model.REP_TIME <= self.time]
+        for r in finished:
+            self.rounds.remove(r)
+            self.genomes += r[1]
+        if finished:
+            self.divisions.append(self.time + cfg.model.D)
+
+    def divide(self, cfg):
+        self.divisions.pop(0)
+        self.volume /= 2.
+        self.genomes = max(1., self.genomes/2.)
+        self.origins /= 2.
+        for r in self.rounds:
+            r[1] /= 2.
+        self.n_tot = cfg.model.SITES*(self.genomes + sum(n*(self.time - start) for start, n in self.rounds)/cfg.model.REP_TIME)
+
+def find_crossing(cell, t_start, t_end, chi, cfg, z=THRESHOLD, n_scan=16):
+    """
+        First time in [t_start, t_end] at which the threshold is crossed, or None.
+        The interval is scanned on a coarse grid and the first sign change is refined with brentq.
+    """
+    times = np.linspace(t_start, t_end, n_scan+1)
+    volume, n_tot = cell.trajectory(times, cfg)
+    g = threshold_function(volume, n_tot, cell.n_forks, chi, cfg, z)
+    above = np.nonzero(g > 0.)[0]
+    if len(above)==0:
+        return None
+    i = above[0]
+    if i==0:
+        return t_start
+
+    def g_of_t(t):
+        v, n = cell.trajectory(t, cfg)
+        return threshold_function(v, n, cell.n_forks, chi, cfg, z)
+
+    return brentq(g_of_t, times[i-1], times[i], xtol=1e-10)
+
+def detect_period(values, max_period=4, tol=1e-6):
+    """
+        Smallest p such that the last 2p values repeat with period p, 0 if there is none.
+        A slowly converging cycle can pass the test at a multiple of its period first, so the
+        period found is reduced to its smallest divisor that holds with a 100 times looser tolerance.
+    """
+    values = np.asarray(values)
+
+    def is_periodic(p, tol):
+        recent, previous = values[-p:], values[-2*p:-p]
+        return np.all(np.abs(recent - previous) <= tol*np.abs(recent))
+
+    for p in range(1, max_period+1):
+        if len(values) < 3*p:
+            break
+        if is_periodic(p, tol):
+            for d in range(1, p):
+                if p%d==0 and is_periodic(d, 100.*tol):
+                    return d
+            return p
+    return 0
+
+def run_deterministic(cfg, z=THRESHOLD, max_initiations=500, min_initiations=10, max_period=4, tol=1e-6):
+    """
+        Runs the mean-field cycle from the same initial condition as run_simulation until the
+        per-origin initiation volume settles on a limit cycle (or cfg.simulation.T_MAX is reached).
+
+        Returns a dict with:
+            - "period": length of the limit cycle in initiations (1: fixed point, 2: period
+              doubling, 0: no convergence).
+            - "converged": whether a limit cycle was found.
+            - "initiation_volume", "volume_per_origin", "n_forks", "origins", "alpha", "n_tot":
+              values at the initiations of the limit cycle (last max_period values if not converged).
+            - "history": the same quantities, plus "time", for all initiations.
+    """
+    # chi per fork; compile_config raises ValueError if no replication is ongoing at initiation
+    chi = compile_config(cfg).CHI
+    tau = np.log(2.)/cfg.model.GROWTH_RATE
+    cell = MeanFieldCell(cfg)
+    history = {key: [] for key in ("time", "initiation_volume", "volume_per_origin", "n_forks", "origins", "alpha", "n_tot")}
+    period = 0
+    while cell.time < cfg.simulation.T_MAX and len(history["time"]) < max_initiations:
+        t_next = min(cell.next_event_time(cfg), cfg.simulation.T_MAX)
+        if cell.pending_initiation is None:
+            eligible = cell.time if cell.last_initiation is None else max(cell.time, cell.last_initiation + cfg.model.ECLIPSE)
+            t_end = t_next if np.isfinite(t_next) else eligible + tau
+            if eligible <= t_end:
+                crossing = find_crossing(cell, eligible, t_end, chi, cfg, z)
+                if crossing is not None:
+                    cell.advance(crossing, cfg)
+                    cell.pending_initiation = crossing + cfg.model.LICENSING
+                    continue
+            if not np.isfinite(t_next):
+                cell.advance(t_end, cfg)
+                continue
+        cell.advance(t_next, cfg)
+        if cell.pending_initiation is not None and cell.pending_initiation <= cell.time:
+            log_initiation = {
+                "time": cell.time,
+                "initiation_volume": cell.volume,
+                "volume_per_origin": cell.volume/cell.origins,
+                "origins": cell.origins,
+                "alpha": get_alpha(cell.n_forks, chi, cell.volume, cfg.model.REGIME),
+                "n_tot": cell.n_tot,
+            }
+            cell.initiate()
+            log_initiation["n_forks"] = cell.n_forks
+            for key, value in log_initiation.items():
+                history[key].append(value)
+            if len(history["time"]) >= min_initiations:
+                period = detect_period(history["volume_per_origin"], max_period, tol)
+                if period:
+                    break
+        cell.terminate(cfg)
+        while cell.divisions and cell.divisions[0] <= cell.time:
+            cell.divide(cfg)
+
+    n_last = period if period else max_period
+    result = {key: np.array(values[-n_last:]) for key, values in history.items() if key!="time"}
+    result["period"] = period
+    result["converged"] = period > 0
+    result["history"] = {key: np.array(values) for key, values in history.items()}
+    return result
+
+def main():
+    cfg = load_config("src/configs/base.yaml")
+    result = run_deterministic(cfg)
+    print("period =", result["period"])
+    print("initiation volumes =", result["initiation_volume"])
+    print("forks after initiation =", result["n_forks"])
+    print("alpha at initiation =", result["alpha"])
+    return 0
+
+if __name__=="__main__":
+    main()
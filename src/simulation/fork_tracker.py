@@ -4,10 +4,19 @@ fork_tracker.py
 Keeps the record of the origins that have fired and when they have fired. 
 Determines when an origin fires on the basis of the firing probability rate. 
 
+In common-random-numbers mode (use_common_random_numbers, cfg.simulation.crn) firing uses hazard
+budgets: an origin that becomes eligible draws a unit exponential and fires once the integrated
+firing rate exceeds it. This has the same law as the per-step draws, but each number is tied to
+the origin that uses it: it is drawn from a stream seeded by cfg.simulation.seed, the genealogy of
+the origin (Origin.key) and the number of times it has fired. The choice of the chromosomes kept
+at division uses a stream seeded by the number of divisions. Runs with different parameters and
+the same seed therefore give the same random numbers to the same origins, whatever the order in
+which the events happen.
 """
 
 import random
 import numpy as np
+from src.simulation.profiling import profiled_simulate_step
 
 class Origin:
     """
@@ -18,17 +27,25 @@ class Origin:
             parent_origin_id (int): ID of the parent origin (if any).
             created_at (float): Time at which the origin was created.
             firing_time (float or None): Time of the most recent firing event, or None if it hasn't fired yet.
+            key (int): Identifier derived from the genealogy of the origin, the same in every run
+                (common random numbers).
+            n_fired (int): Number of times the origin has fired.
     """
-    def __init__(self, origin_id, parent_origin_id, created_at):
+    def __init__(self, origin_id, parent_origin_id, created_at, key=1):
         self.origin_id = origin_id
         self.parent_origin_id = parent_origin_id
         self.created_at = created_at
         self.firing_time = None
+        self.key = key
+        self.n_fired = 0
 
-    def eligible_to_fire(self, current_time, cfg):
+    def child_key(self):
+        return (self.key*0x9E3779B1 + self.n_fired + 1) % (1 << 61)
+
+    def eligible_to_fire(self, current_time, params):
         if self.firing_time is None:
             return True
-        return (current_time - self.firing_time) > cfg.model.ECLIPSE
+        return (current_time - self.firing_time) > params.ECLIPSE
     
 class TreeManager:
     """
@@ -36,8 +53,10 @@ class TreeManager:
         and division events.
     """
 
-    def __init__(self, cfg):
+    def __init__(self, params):
         """
+            params is the CompiledParams of the configuration (src/utils/compiled_config.py).
+
             Attributes:
                 n_forks (int): Number of active replication forks.
                 firing_probability_rate (float): Rate at which origins attempt to initiate replication.
@@ -53,6 +72,13 @@ class TreeManager:
                 licensing (float): Delay between origin firing and actual initiation.
                 multifork (list): List of active forks, together with the time they were created and the 
                     corresponding origins.
+                profiler (Profiler or None): If set, simulate_step times its phases and counts events.
+                site_index (SiteIndex or None): If set, titration sites have explicit genome positions
+                    (src/model/genome_sites.py) instead of being uniform along the chromosome.
+                crn_seed (int or None): Seed of the common-random-numbers mode; None uses the global
+                    random module.
+                hazard (dict): Remaining hazard budget of each eligible origin (common random numbers).
+                generation (int): Number of divisions so far.
         """
         self.n_forks=0
         self.firing_probability_rate = 0.02
@@ -64,9 +90,24 @@ class TreeManager:
         self.initiation_scheduled = [[],[]]
         self.volume = 1.
         self.dt = 0.01
-        self.n_tot = cfg.model.SITES
-        self.licensing = cfg.model.LICENSING 
+        self.n_tot = params.SITES
+        self.licensing = params.LICENSING 
         self.multifork = []
+        self.profiler = None
+        self.site_index = None
+        self.hazard = {}
+        self.crn_seed = None
+        self.generation = 0
+
+    def use_common_random_numbers(self, seed):
+        """
+            Switches firing and division to the seeded streams of the common-random-numbers mode.
+        """
+        self.crn_seed = seed
+        self.hazard = {}
+
+    def crn_stream(self, *labels):
+        return random.Random("-".join(str(label) for label in (self.crn_seed,) + labels))
 
     def add_initial_origin(self):
         """
@@ -79,7 +120,7 @@ class TreeManager:
         self.origins[initial_origin.origin_id] = initial_origin
         self.next_origin_id += 1
 
-    def get_eligible_origins(self, cfg):
+    def get_eligible_origins(self, params):
         """
         Returns a list of origin IDs that are eligible to fire at the current simulation time.
 
@@ -92,41 +133,68 @@ class TreeManager:
         """
         firing_origins = []
         for origin in self.origins.values():
-            if origin.eligible_to_fire(self.current_time, cfg) and origin.origin_id not in self.initiation_scheduled[1]:
+            if origin.eligible_to_fire(self.current_time, params) and origin.origin_id not in self.initiation_scheduled[1]:
                 firing_origins.append(origin.origin_id)
         return firing_origins
 
-    def schedule_initiation(self, origin_id, cfg):
+    def schedule_initiation(self, origin_id, params):
         """
             Schedules a replication initiation event for the specified origin.
 
-            The initiation is set to occur after a fixed licensing delay (cfg.model.LICENSING)
+            The initiation is set to occur after a fixed licensing delay (params.LICENSING)
             from the current simulation time, and the origin ID is recorded for future processing.
         """
-        self.initiation_scheduled[0].append(self.current_time+cfg.model.LICENSING)
+        self.initiation_scheduled[0].append(self.current_time+params.LICENSING)
         self.initiation_scheduled[1].append(origin_id)
 
-    def process_eligible_origins(self, cfg):
+    def process_eligible_origins(self, params):
         """
             Each eligible origin can fire with a probability rate 'firing_probability_rate'.
             If the origin fires, it is scheduled for initiation after the licensing delay.
+            Returns the number of eligible origins (i.e. of random draws).
         """
-        firing_origins = self.get_eligible_origins(cfg)
+        firing_origins = self.get_eligible_origins(params)
+        if self.crn_seed is not None:
+            return self.process_hazard_budgets(firing_origins, params)
         for origin_id in firing_origins:
             if random.random() < 1. - np.exp(-self.firing_probability_rate * self.dt):
-                self.schedule_initiation(origin_id, cfg)
+                self.schedule_initiation(origin_id, params)
+        return len(firing_origins)
 
-    def perform_initiations(self, cfg):
+    def process_hazard_budgets(self, firing_origins, params):
+        """
+            Common-random-numbers firing: each eligible origin spends firing_probability_rate*dt of
+            its hazard budget and is scheduled for initiation when the budget is exhausted.
+            Returns the number of eligible origins.
         """
-            Performs the initiation of scheduled origins.
+        exposure = self.firing_probability_rate * self.dt
+        for origin_id in firing_origins:
+            budget = self.hazard.get(origin_id)
+            if budget is None:
+                origin = self.origins[origin_id]
+                budget = self.crn_stream("firing", origin.key, origin.n_fired).expovariate(1.)
+            budget -= exposure
+            if budget <= 0.:
+                self.hazard.pop(origin_id, None)
+                self.schedule_initiation(origin_id, params)
+            else:
+                self.hazard[origin_id] = budget
+        return len(firing_origins)
+
+    def perform_initiations(self, params):
+        """
+            Performs the initiation of scheduled origins. Returns the number of initiations.
         """
+        n_initiations = 0
         while self.initiation_scheduled[0] and self.initiation_scheduled[0][0] < self.current_time:
             if self.initiation_scheduled[1][0] in self.origins:
-                self.fire_origin(self.initiation_scheduled[1][0], cfg)
+                self.fire_origin(self.initiation_scheduled[1][0], params)
+                n_initiations += 1
             self.initiation_scheduled[0].pop(0)
             self.initiation_scheduled[1].pop(0)
+        return n_initiations
 
-    def fire_origin(self, origin_id, cfg):
+    def fire_origin(self, origin_id, params):
         """
             Fires the specified origin and creates a new child origin.
 
@@ -140,15 +208,17 @@ class TreeManager:
         """
         origin = self.origins[origin_id]
         origin.firing_time = self.current_time
-        new_origin = Origin(origin_id=self.next_origin_id, parent_origin_id=origin_id, created_at=self.current_time)
+        new_origin = Origin(origin_id=self.next_origin_id, parent_origin_id=origin_id, created_at=self.current_time,
+                            key=origin.child_key())
+        origin.n_fired += 1
         new_origin.firing_time = self.current_time
         self.origins[new_origin.origin_id] = new_origin
         self.next_origin_id += 1
         self.n_forks += 2
         self.multifork.append([(origin_id, new_origin.origin_id), self.current_time])
-        self.termination_scheduled.append((self.current_time + cfg.model.REP_TIME, (origin_id, new_origin.origin_id) ))
+        self.termination_scheduled.append((self.current_time + params.REP_TIME, (origin_id, new_origin.origin_id) ))
 
-    def perform_termination(self, cfg):
+    def perform_termination(self, params):
         """
             Checks whether any replication termination events are scheduled at the current time.
             If so, performs them by:
@@ -160,25 +230,29 @@ class TreeManager:
 
             This ensures that once replication ends, the origins are correctly reclassified for future replication cycles,
             and the cell division machinery is activated at the appropriate time.
+            Returns the number of terminations.
         """
         divide=False
+        n_terminations = 0
         while self.termination_scheduled and self.current_time >= self.termination_scheduled[0][0]:
             if self.termination_scheduled[0][1][0] in self.origins.keys():           
-                divide = self.current_time + cfg.model.D
+                divide = self.current_time + params.D
                 self.n_forks -= 2
                 daughter_id=self.termination_scheduled[0][1][1]
                 daughter=self.origins[daughter_id]
                 daughter.parent_origin_id=None
                 self.multifork.pop(0)
+                n_terminations += 1
 
             self.termination_scheduled.pop(0)
         if divide:
             self.schedule_division(divide)
+        return n_terminations
 
     def schedule_division(self, division_time):
         self.division_scheduled.append(division_time)
 
-    def perform_division(self, cfg):
+    def perform_division(self, params):
         """
             Performs cell division if the scheduled division time has been reached.
 
@@ -194,11 +268,16 @@ class TreeManager:
 
             This allows the simulation to support multifork replication and division into cells with multiple chromosomes,
             while maintaining biological consistency in origin inheritance.
+            Returns True if the cell has divided.
         """
         if self.division_scheduled and self.current_time >= self.division_scheduled[0]:
             ancestors = [ancestor for ancestor in self.origins.values() if ancestor.parent_origin_id==None]
             genomes=np.max((1, int(len(ancestors)/2)))
-            selected_ancestors = random.sample(ancestors, genomes)
+            if self.crn_seed is not None:
+                ancestors.sort(key=lambda ancestor: ancestor.key)
+                selected_ancestors = self.crn_stream("division", self.generation).sample(ancestors, genomes)
+            else:
+                selected_ancestors = random.sample(ancestors, genomes)
             selected_trees = []
             available_origins = []
             for ancestor in selected_ancestors:
@@ -207,11 +286,19 @@ class TreeManager:
                 available_origins += a_tree
 
             self.origins = {origin_id: self.origins[origin_id] for origin_id in available_origins}
+            self.generation += 1
+            if self.hazard:
+                self.hazard = {origin_id: budget for origin_id, budget in self.hazard.items() if origin_id in self.origins}
             self.multifork = [fork for fork in self.multifork if fork[0][0] in available_origins]            
             self.volume /= 2
-            self.n_tot=cfg.model.SITES*(genomes+np.sum([self.current_time-fork[1] for fork in self.multifork])/cfg.model.REP_TIME)
+            if self.site_index is not None:
+                self.n_tot=self.site_index.total*genomes+self.site_index.replicated(self.current_time, self.multifork, params.REP_TIME)
+            else:
+                self.n_tot=params.SITES*(genomes+np.sum([self.current_time-fork[1] for fork in self.multifork])/params.REP_TIME)
             self.n_forks = len(self.multifork)*2.
             self.division_scheduled.pop(0)
+            return True
+        return False
 
     def get_tree(self, root_id):
         """
@@ -231,6 +318,16 @@ class TreeManager:
         traverse(root_id)
         return tree
 
+    def new_sites(self, t0, t1, params):
+        """
+            Titration sites replicated between t0 and t1 by the ongoing rounds, from the positions
+            in site_index.
+        """
+        return self.site_index.increment(t0, t1, self.multifork, params.REP_TIME)
+
+    def locus_copies(self, name, params):
+        return self.site_index.locus_copies(name, self.current_time, len(self.origins), self.multifork, params.REP_TIME)
+
     def update(self, time, fpr, volume, n_tot):
         '''
             this update is performed at every simulation step. 
@@ -243,7 +340,7 @@ class TreeManager:
     def update_time(self):
         self.current_time += self.dt
 
-    def simulate_step(self, cfg, update_time=False):
+    def simulate_step(self, params, update_time=False):
         '''
             Simulates a single step in the cell cycle model.
 
@@ -258,10 +355,13 @@ class TreeManager:
         '''
         if update_time:
             self.update_time()
-        self.process_eligible_origins(cfg)
-        self.perform_initiations(cfg) 
-        self.perform_termination(cfg)
-        self.perform_division(cfg) 
+        if self.profiler is not None:
+            profiled_simulate_step(self, params, self.profiler)
+            return
+        self.process_eligible_origins(params)
+        self.perform_initiations(params) 
+        self.perform_termination(params)
+        self.perform_division(params) 
 
     def visualize_tree(self):
         children_map = {}
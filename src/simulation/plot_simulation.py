@@ -0,0 +1,150 @@
+from src.simulation.run_simulation import run_simulation
+from src.utils.config_loader import load_config
+from src.utils.downsample import TracePyramid, save_trajectory, plot_trace
+from matplotlib import pyplot as plt
+import numpy as np
+
+def initiation_and_division(initiation_times, division_times, ax, cfg):
+    """
+        This is just needed for the plots. 
+    """
+    for in_time in initiation_times:
+        ax.axvspan(in_time - cfg.model.LICENSING,  # left boundary
+                    in_time,                          # right boundary
+                    color='k',                        # fill color (black)
+                    alpha=0.2,                        # transparency
+                    linewidth=0)                      # no edge line
+
+    for div_time in division_times:
+        ax.axvline(div_time,linestyle='--', color='k')
+
+def figures(cfg, simulation_data):
+    """
+        The time-trace figures of one run_simulation output, by name. Nothing is shown or saved.
+    """
+    time=simulation_data["time"]
+    origins=np.array(simulation_data["origins"])
+    sites=np.array(simulation_data["n_tot"])
+    volume=np.array(simulation_data["volume"])
+    a_ATP=simulation_data["a_atp"]
+    a_ADP=simulation_data["a_adp"]
+    f_rate=simulation_data["fpr"]
+    division_times=[]
+    initiation_times=[]
+    for volume_index in range(1, len(volume)):
+        if volume[volume_index]<volume[volume_index-1]:
+            division_times.append(time[volume_index-1])
+            initiation_times.append(time[volume_index-1]-60.)
+ 
+    start=int(len(volume)/50)
+    end=min(start+4000, len(volume)-1)
+    starting_time=time[start]
+    time =np.array(time)-starting_time
+    initiation_times =np.array(initiation_times)-starting_time
+    division_times =np.array(division_times)-starting_time
+
+    colors = [
+        "#1f77b4",  # Blue
+        "#ff7f0e",  # Orange
+        "#2ca02c",  # Green
+        "#d62728",  # Red
+        "#9467bd"   # Purple
+        ]
+
+    #fig, axs = create_figure(layout='stacked', figsize=(6,8), n_stacked=5, sharex=True, sharey=False, 
+    #              xlim=(time[start], time[end]), xticks=None, yticks=None, labelsize=14)
+    
+
+    a_tot=np.array(a_ATP)+np.array(a_ADP)    
+    alphas=np.array(a_ATP)/a_tot
+    """
+    axs[0].plot(time, sites, '--', label="sites", color=colors[0])
+    axs[0].plot(time, volume*a_tot, label="DnaA proteins", color=colors[0])
+    axs[0].set_ylim(300., 1500.)
+    axs[0].set_ylabel("copy numbers")
+    initiation_and_division(initiation_times, division_times, axs[0])
+    axs[0].legend(frameon=True, loc='upper right', framealpha=1, facecolor='white', edgecolor='black')
+
+    conc_ratio=(sites/volume)/cfg.model.DNAA_CONCENTRATION
+    axs[1].plot(time, conc_ratio, color=colors[1])
+    axs[1].axhline(1., color='k')
+    initiation_and_division(initiation_times, division_times, axs[1])
+    axs[1].set_ylim(0.9, 1.2)
+    axs[1].set_ylabel(r"$c_{tot}/a$")
+    
+    axs[2].plot(time, origins, color=colors[2])   
+    axs[2].set_ylim(-0.1, 10.)
+    axs[2].set_ylabel("origins")
+    initiation_and_division(initiation_times, division_times, axs[2])
+
+    axs[3].plot(time, alphas, color=colors[3])
+    axs[3].set_ylim(-0.05, 0.3)
+    axs[3].set_ylabel(rf"$\alpha$")
+    initiation_and_division(initiation_times, division_times, axs[3])
+
+    axs[4].plot(time, f_rate, color=colors[4])   
+    axs[4].set_ylim(-5., 101.)
+    initiation_and_division(initiation_times, division_times, axs[4])
+    axs[4].set_ylabel(r"$P_{open}k_{max}$")
+
+    """
+    # every trace is drawn from a min/max pyramid, with about one point per pixel in the window
+    # and every step edge of the origins
+    traces=TracePyramid(time, {"volume": volume, "alpha": alphas, "origins": origins, "sites": sites,
+                               "initiators": volume*a_tot, "fpr": np.array(f_rate),
+                               "conc_ratio": (sites/volume)/cfg.model.DNAA_CONCENTRATION})
+    window=(time[start], time[end])
+    figs={}
+
+    figs["volume"], ax = plt.subplots()
+    plot_trace(ax, traces, "volume", *window)
+    ax.set_xlim(*window)
+    #ax.set_ylim(-0.05, 1.5)
+
+    figs["alpha"], ax = plt.subplots()
+    plot_trace(ax, traces, "alpha", *window)
+    ax.set_xlim(*window)
+    ax.set_ylim(-0.02, 0.4)
+
+
+    figs["origins"], ax = plt.subplots()
+    plot_trace(ax, traces, "origins", *window)
+    ax.set_xlim(*window)
+    ax.set_ylim(-0.1, 10.)
+
+    figs["sites_and_initiators"], ax = plt.subplots()
+    plot_trace(ax, traces, "sites", *window)
+    plot_trace(ax, traces, "initiators", *window)
+    #initiation_and_division(initiation_times, division_times, ax, cfg)
+    ax.set_xlim(*window)
+    ax.set_ylim(-5., 2000)
+
+
+    figs["firing_rate"], ax = plt.subplots()
+    plot_trace(ax, traces, "fpr", *window)
+    #initiation_and_division(initiation_times, division_times, ax, cfg)
+    ax.set_xlim(*window)
+
+
+    figs["c_tot"], ax = plt.subplots()
+    plot_trace(ax, traces, "conc_ratio", *window)
+    ax.axhline(1., color='k')
+    #initiation_and_division(initiation_times, division_times, ax, cfg)
+    ax.set_xlim(*window)
+    ax.set_ylim(0.5, 1.5)
+    return figs
+
+def main(cfg=None, trajectory=None):
+    """
+        trajectory: optional .npz path where the simulation and its downsampling pyramid are saved.
+    """
+    if cfg is None:
+        cfg = load_config("src/configs/base.yaml")
+    simulation_data=run_simulation(cfg)
+    if trajectory is not None:
+        save_trajectory(trajectory, simulation_data)
+    figures(cfg, simulation_data)
+    plt.show()
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+population.py
+
+Population version of run_simulation. TreeManager follows a single lineage: at division a random
+half of the chromosomes is kept and the other daughter is thrown away. Here both daughters are kept
+and the number of cells is held fixed, so that snapshot (population-level) distributions can be
+measured from a single run.
+
+The cells are stored in arrays, one row per cell:
+    - volume, n_tot, n_forks: shape (N,)
+    - origins: alive, parent (slot of the parent origin, -1 for the root of a chromosome),
+      fired (time of the last firing, NaN if never fired), scheduled (time of the scheduled
+      initiation, inf if none): shape (N, O)
+    - forks (replication rounds, i.e. pairs of forks): start time (NaN for a free slot) and the
+      parent and child origin slots: shape (N, F)
+    - scheduled divisions: shape (N, K), inf for a free slot
+O, F and K grow by doubling when a cell runs out of slots. The rules of each step are those of
+make_step and TreeManager.simulate_step; the chromosome of each origin at division is found by
+pointer jumping on the parent array.
+
+The population size is controlled in one of two ways:
+    - "moran": every newborn daughter replaces a uniformly chosen cell of the population,
+    - "resample": daughters are appended, and when the population reaches 2*n_cells it is
+      resampled uniformly down to n_cells.
+In both cases log_growth accumulates the log of the population growth, so that
+log_growth/time estimates the population growth rate.
+"""
+
+import numpy as np
+import src.model.firing_rate as firing
+from src.model.optimal_volume import get_alpha_array
+from src.utils.compiled_config import compile_config
+from src.utils.helpers import get_c_array
+
+# TreeManager.dt: time step used for the firing probability of an origin
+FIRING_DT = 0.01
+
+class Population:
+    """
+        Array-based ensemble of cells.
+
+        Arguments:
+            params: CompiledParams of the configuration.
+            n_cells (int): Size of the population.
+            mode (str): "moran" or "resample".
+            seed: Seed of the random generator (default: params.seed).
+            n_origins, n_forks, n_divisions (int): Initial number of slots per cell.
+    """
+    def __init__(self, params, n_cells, mode="moran", seed=None, n_origins=8, n_forks=4, n_divisions=2):
+        if mode not in ("moran", "resample"):
+            raise ValueError("unknown population mode: %s"%mode)
+        self.params = params
+        self.n_cells = n_cells
+        self.mode = mode
+        self.rng = np.random.default_rng(params.seed if seed is None else seed)
+        self.time = 0.
+        self.log_growth = 0.
+        N = n_cells
+        self.volume = np.ones(N)
+        self.n_tot = np.full(N, float(params.SITES))
+        self.n_forks = np.zeros(N)
+        self.alive = np.zeros((N, n_origins), dtype=bool)
+        self.alive[:, 0] = True
+        self.parent = np.full((N, n_origins), -1, dtype=np.int32)
+        self.fired = np.full((N, n_origins), np.nan)
+        self.scheduled = np.full((N, n_origins), np.inf)
+        self.fork_start = np.full((N, n_forks), np.nan)
+        self.fork_parent = np.zeros((N, n_forks), dtype=np.int32)
+        self.fork_child = np.zeros((N, n_forks), dtype=np.int32)
+        self.division = np.full((N, n_divisions), np.inf)
+        self.initiation_volumes = []
+        self.birth_volumes = []
+
+    # --- storage --------------------------------------------------------------------------------
+
+    ORIGIN_ARRAYS = ("alive", "parent", "fired", "scheduled")
+    FORK_ARRAYS = ("fork_start", "fork_parent", "fork_child")
+    CELL_ARRAYS = ("volume", "n_tot", "n_forks") + ORIGIN_ARRAYS + FORK_ARRAYS + ("division",)
+    FILL = {"alive": False, "parent": -1, "fired": np.nan, "scheduled": np.inf,
+            "fork_start": np.nan, "fork_parent": 0, "fork_child": 0, "division": np.inf}
+
+    def _grow(self, names):
+        for name in names:
+            array = getattr(self, name)
+            padding = np.full_like(array, self.FILL[name])
+            setattr(self, name, np.concatenate([array, padding], axis=1))
+
+    def _allocate(self, free, cells, names):
+        """
+            Returns one free slot per entry of cells (sorted cell indices, possibly repeated),
+            growing the arrays in names if a cell has fewer free slots than requests.
+        """
+        rows, first, counts = np.unique(cells, return_index=True, return_counts=True)
+        while np.any(free(rows).sum(axis=1) < counts):
+            self._grow(names)
+        free_rows = free(rows)
+        order = np.argsort(~free_rows, axis=1, kind="stable")
+        rank = np.arange(len(cells)) - np.repeat(first, counts)
+        return order[np.repeat(np.arange(len(rows)), counts), rank]
+
+    def size(self):
+        return len(self.volume)
+
+    # --- one step -------------------------------------------------------------------------------
+
+    def step(self, dt):
+        """
+            Advances every cell by dt: growth and titration (make_step), then firing, initiation,
+            termination and division (TreeManager.simulate_step).
+        """
+        p = self.params
+        self.volume *= 1. + p.GROWTH_RATE*dt
+        self.n_tot += self.n_forks*p.SITE_RATE*dt
+        alpha = get_alpha_array(self.n_forks, p.CHI, self.volume, p.REGIME)
+        a_atp, a_adp = alpha*p.DNAA_CONCENTRATION, (1.-alpha)*p.DNAA_CONCENTRATION
+        c = get_c_array(p.DNAA_CONCENTRATION, p.K, self.n_tot/self.volume)
+        f_rate = firing.fr_array(a_atp, a_adp, alpha*c, (1.-alpha)*c, p.COOP, kori=p.K_OPEN,
+                                 ori_sites=p.ORIGIN_SITES, epsilon_cost=p.E_COST, k_max=p.FIRING_MAX)
+        self.time += dt
+        self.fire(f_rate)
+        self.initiate()
+        self.terminate()
+        self.divide()
+
+    def fire(self, f_rate):
+        """
+            Every eligible origin fires with probability 1-exp(-f_rate*FIRING_DT). The number of
+            firing origins of each cell is drawn from a binomial, and only the few cells with at
+            least one firing pick which of their eligible origins fire.
+        """
+        t = self.time
+        eligible = self.alive & np.isinf(self.scheduled) & ~(t - self.fired <= self.params.ECLIPSE)
+        n_eligible = eligible.sum(axis=1)
+        n_fire = self.rng.binomial(n_eligible, 1. - np.exp(-f_rate*FIRING_DT))
+        rows = np.nonzero(n_fire)[0]
+        if len(rows)==0:
+            return
+        keys = np.where(eligible[rows], self.rng.random(eligible[rows].shape), np.inf)
+        chosen = np.argsort(np.argsort(keys, axis=1), axis=1) < n_fire[rows, None]
+        cells, slots = np.nonzero(chosen)
+        self.scheduled[rows[cells], slots] = t + self.params.LICENSING
+
+    def initiate(self):
+        t = self.time
+        rows = np.nonzero(np.min(self.scheduled, axis=1) < t)[0]
+        if len(rows)==0:
+            return
+        cells, slots = np.nonzero(self.alive[rows] & (self.scheduled[rows] < t))
+        cells = rows[cells]
+        self.fired[cells, slots] = t
+        self.scheduled[cells, slots] = np.inf
+        children = self._allocate(lambda rows: ~self.alive[rows], cells, self.ORIGIN_ARRAYS)
+        self.alive[cells, children] = True
+        self.parent[cells, children] = slots
+        self.fired[cells, children] = t
+        self.scheduled[cells, children] = np.inf
+        forks = self._allocate(lambda rows: np.isnan(self.fork_start[rows]), cells, self.FORK_ARRAYS)
+        self.fork_start[cells, forks] = t
+        self.fork_parent[cells, forks] = slots
+        self.fork_child[cells, forks] = children
+        np.add.at(self.n_forks, cells, 2.)
+        self.initiation_volumes.append(self.volume[np.unique(cells)])
+
+    def terminate(self):
+        t = self.time
+        rows = np.nonzero(t >= np.fmin.reduce(self.fork_start, axis=1) + self.params.REP_TIME)[0]
+        if len(rows)==0:
+            return
+        cells, forks = np.nonzero(t >= self.fork_start[rows] + self.params.REP_TIME)
+        cells = rows[cells]
+        self.parent[cells, self.fork_child[cells, forks]] = -1
+        self.fork_start[cells, forks] = np.nan
+        np.add.at(self.n_forks, cells, -2.)
+        slots = self._allocate(lambda rows: np.isinf(self.division[rows]), rows, ("division",))
+        self.division[rows, slots] = t + self.params.D
+
+    def roots(self, rows):
+        """
+            Slot of the chromosome root of every origin of the cells in rows (pointer jumping).
+        """
+        parent = self.parent[rows]
+        slots = np.broadcast_to(np.arange(parent.shape[1]), parent.shape)
+        root = np.where(self.alive[rows] & (parent >= 0), parent, slots)
+        while True:
+            jumped = np.take_along_axis(root, root, axis=1)
+            if np.array_equal(jumped, root):
+                return root
+            root = jumped
+
+    def divide(self):
+        t = self.time
+        p = self.params
+        rows = np.nonzero(np.min(self.division, axis=1) <= t)[0]
+        if len(rows)==0:
+            return
+        self.division[rows, np.argmin(self.division[rows], axis=1)] = np.inf
+        alive = self.alive[rows]
+        is_root = alive & (self.parent[rows] < 0)
+        n_roots = is_root.sum(axis=1)
+        genomes = np.maximum(1, n_roots//2)
+        # a random subset of `genomes` chromosomes goes to the first daughter
+        keys = np.where(is_root, self.rng.random(is_root.shape), np.inf)
+        selected = np.argsort(np.argsort(keys, axis=1), axis=1) < genomes[:, None]
+        in_first = alive & np.take_along_axis(selected, self.roots(rows), axis=1)
+        self.volume[rows] /= 2.
+        self.birth_volumes.append(self.volume[rows])
+        # the second daughter exists only if the mother had at least two chromosomes
+        two = n_roots >= 2
+        second = {name: getattr(self, name)[rows[two]].copy() for name in self.CELL_ARRAYS}
+        second["alive"] &= ~in_first[two]
+        self._keep(second, n_roots[two] - genomes[two])
+        first = {name: getattr(self, name)[rows] for name in self.CELL_ARRAYS}
+        first["alive"] = in_first
+        self._keep(first, genomes)
+        for name, values in first.items():
+            getattr(self, name)[rows] = values
+        self.add_cells(second)
+
+    def _keep(self, cells, genomes):
+        """
+            Drops the forks of discarded origins and recomputes n_forks and n_tot of new daughters.
+        """
+        p = self.params
+        kept = np.take_along_axis(cells["alive"], cells["fork_parent"], axis=1) & ~np.isnan(cells["fork_start"])
+        cells["fork_start"] = np.where(kept, cells["fork_start"], np.nan)
+        cells["n_forks"] = 2.*kept.sum(axis=1)
+        progress = np.where(kept, self.time - cells["fork_start"], 0.).sum(axis=1)
+        cells["n_tot"] = p.SITES*(genomes + progress/p.REP_TIME)
+        cells["scheduled"] = np.where(cells["alive"], cells["scheduled"], np.inf)
+
+    def add_cells(self, cells):
+        """
+            Adds newborn cells to the population and applies the population control.
+        """
+        k = len(cells["volume"])
+        if k==0:
+            return
+        N = self.size()
+        self.log_growth += np.log((N + k)/N)
+        if self.mode=="moran":
+            victims = self.rng.choice(N, size=min(k, N), replace=False)
+            for name, values in cells.items():
+                getattr(self, name)[victims] = values[:len(victims)]
+            return
+        for name, values in cells.items():
+            setattr(self, name, np.concatenate([getattr(self, name), values]))
+        if self.size() >= 2*self.n_cells:
+            keep = np.sort(self.rng.choice(self.size(), size=self.n_cells, replace=False))
+            for name in self.CELL_ARRAYS:
+                setattr(self, name, getattr(self, name)[keep])
+
+    # --- observables ----------------------------------------------------------------------------
+
+    def snapshot(self):
+        return {
+            "time": self.time,
+            "volume": self.volume.copy(),
+            "n_tot": self.n_tot.copy(),
+            "n_forks": self.n_forks.copy(),
+            "origins": self.alive.sum(axis=1),
+        }
+
+def run_population(cfg, n_cells=1000, mode="moran", seed=None, record_every=20, snapshot_times=()):
+    """
+        Simulates a population of n_cells cells up to cfg.simulation.T_MAX.
+
+        Returns a dict with:
+            - "time", "mean_volume", "cv_volume", "mean_forks", "mean_origins": population averages
+              every record_every steps,
+            - "snapshots": snapshot() at the first step after each time in snapshot_times and at the end,
+            - "initiation_volumes", "birth_volumes": volumes at every initiation and division,
+            - "growth_rate": population growth rate log_growth/T_MAX.
+    """
+    params = compile_config(cfg)
+    population = Population(params, n_cells, mode=mode, seed=seed)
+    data = {"time": [], "mean_volume": [], "cv_volume": [], "mean_forks": [], "mean_origins": [], "snapshots": []}
+    pending = sorted(snapshot_times)
+    count = 0
+    while population.time < params.T_MAX:
+        population.step(params.DT)
+        count += 1
+        if count%record_every==0:
+            volume = population.volume
+            data["time"].append(population.time)
+            data["mean_volume"].append(float(np.mean(volume)))
+            data["cv_volume"].append(float(np.std(volume)/np.mean(volume)))
+            data["mean_forks"].append(float(np.mean(population.n_forks)))
+            data["mean_origins"].append(float(np.mean(population.alive.sum(axis=1))))
+        while pending and population.time >= pending[0]:
+            data["snapshots"].append(population.snapshot())
+            pending.pop(0)
+    data["snapshots"].append(population.snapshot())
+    data["initiation_volumes"] = np.concatenate(population.initiation_volumes or [np.zeros(0)])
+    data["birth_volumes"] = np.concatenate(population.birth_volumes or [np.zeros(0)])
+    data["growth_rate"] = population.log_growth/population.time
+    return data
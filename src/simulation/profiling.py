@@ -0,0 +1,118 @@
+"""
+profiling.py
+
+Opt-in instrumentation of the simulation loop. A Profiler accumulates the wall time spent in each
+phase of TreeManager.simulate_step and in each sub-computation of make_step, together with event
+counters (eligible origins, RNG draws, initiations, terminations, divisions, size of the origins dict).
+
+Profiling is enabled by passing a Profiler to run_simulation; when no profiler is given the
+simulation runs the usual functions and the only cost is a `None` check per step.
+"""
+
+import json
+from collections import defaultdict
+from time import perf_counter
+from src.simulation.cycle_updates import grow, activation, bound, firing_rate
+
+class Profiler:
+    """
+        Accumulates timings and counters.
+
+        Attributes:
+            times (dict): Total wall time (s) per phase.
+            calls (dict): Number of timed calls per phase.
+            counters (dict): Totals of the event counters.
+            maxima (dict): Largest value observed for each counter in a single step.
+    """
+    def __init__(self):
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(float)
+        self.maxima = defaultdict(float)
+        self.steps = 0
+
+    def add_time(self, name, seconds):
+        self.times[name] += seconds
+        self.calls[name] += 1
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+        if value > self.maxima[name]:
+            self.maxima[name] = value
+
+    def summary(self):
+        """
+            Returns a dict with total and per-call times of every phase and the per-step averages
+            and maxima of every counter.
+        """
+        steps = max(self.steps, 1)
+        return {
+            "steps": self.steps,
+            "phases": {name: {"seconds": seconds,
+                              "calls": self.calls[name],
+                              "us_per_call": seconds/max(self.calls[name], 1)*1e6}
+                       for name, seconds in sorted(self.times.items(), key=lambda item: -item[1])},
+            "counters": {name: {"total": total,
+                                "per_step": total/steps,
+                                "max": self.maxima[name]}
+                         for name, total in sorted(self.counters.items())},
+        }
+
+    def report(self):
+        summary = self.summary()
+        lines = ["%-42s %10s %12s %12s"%("phase", "seconds", "calls", "us/call")]
+        for name, phase in summary["phases"].items():
+            lines.append("%-42s %10.3f %12d %12.3f"%(name, phase["seconds"], phase["calls"], phase["us_per_call"]))
+        lines.append("%-42s %12s %12s %10s"%("counter", "total", "per step", "max"))
+        for name, counter in summary["counters"].items():
+            lines.append("%-42s %12g %12.4g %10g"%(name, counter["total"], counter["per_step"], counter["max"]))
+        return "\n".join(lines)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+def profiled_make_step(n_forks, n_tot, volume, a_atp, a_adp, time, dt, y, chi, step, params, profiler, sites=None):
+    """
+        cycle_updates.make_step, timing each of its phases (the same functions are called).
+    """
+    start = perf_counter()
+    volume, n_tot = grow(n_forks, n_tot, volume, time, dt, params, sites)
+    t1 = perf_counter()
+    alpha, a_atp, a_adp = activation(n_forks, chi, volume, params)
+    t2 = perf_counter()
+    c_atp, c_adp = bound(alpha, n_tot, volume, params)
+    t3 = perf_counter()
+    f_rate = firing_rate(a_atp, a_adp, c_atp, c_adp, n_forks, n_tot, volume, y, chi, step, params)
+    t4 = perf_counter()
+    profiler.add_time("make_step.growth", t1-start)
+    profiler.add_time("make_step.alpha", t2-t1)
+    profiler.add_time("make_step.get_c", t3-t2)
+    profiler.add_time("make_step.firing_rate", t4-t3)
+    time += dt
+    return time, a_atp, a_adp, c_atp, c_adp, volume, n_tot, f_rate
+
+def profiled_simulate_step(tree_manager, params, profiler):
+    """
+        Same sequence of phases as TreeManager.simulate_step, timing each phase and counting events.
+    """
+    profiler.count("origins_dict_size", len(tree_manager.origins))
+    start = perf_counter()
+    draws = tree_manager.process_eligible_origins(params)
+    t1 = perf_counter()
+    initiations = tree_manager.perform_initiations(params)
+    t2 = perf_counter()
+    terminations = tree_manager.perform_termination(params)
+    t3 = perf_counter()
+    division = tree_manager.perform_division(params)
+    t4 = perf_counter()
+    profiler.add_time("simulate_step.process_eligible_origins", t1-start)
+    profiler.add_time("simulate_step.perform_initiations", t2-t1)
+    profiler.add_time("simulate_step.perform_termination", t3-t2)
+    profiler.add_time("simulate_step.perform_division", t4-t3)
+    profiler.count("eligible_origins", draws)
+    profiler.count("rng_draws", draws + int(division))
+    profiler.count("initiations", initiations)
+    profiler.count("terminations", terminations)
+    profiler.count("divisions", int(division))
+    profiler.steps += 1
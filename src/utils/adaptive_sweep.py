@@ -0,0 +1,160 @@
+"""
+adaptive_sweep.py
+
+Adaptive refinement of a sweep along one parameter. The sweep spec (src/utils/sweep.py) gives a
+coarse grid; for every combination of the other parameters the refined parameter spans a curve.
+Each interval between neighbouring points of a curve gets a loss: its length in the plane
+(scaled parameter, log CV, relative error of the CV), with every coordinate normalized to [0, 1]
+over the whole sweep. The intervals with the largest loss are split at their midpoint and the new
+points are simulated in batches, until the simulation budget is spent. Flat regions therefore keep
+the coarse spacing while the transitions of the CV get most of the points.
+"""
+
+import heapq
+import itertools
+import numpy as np
+from src.simulation.run_simulation import run_simulation
+from src.utils.statistics import initiation_volumes, bootstrap_cv
+from src.utils.sweep import normalize_spec, get_range, apply_values, resolve, run_bounded
+from src.utils.monitor import Monitored
+
+def initiation_cv(cfg, progress=None):
+    """
+        Default measurement: CV of the initiation volume of one simulation and its bootstrap error.
+    """
+    return bootstrap_cv(initiation_volumes(run_simulation(cfg, progress=progress)), rng=cfg.simulation.seed)
+
+def _evaluate(task):
+    _, measure, cfg, point = task
+    # a Monitored measurement reports the sweep point along with its progress
+    return measure(cfg, point=point) if isinstance(measure, Monitored) else measure(cfg)
+
+class Curve:
+    """
+        Points evaluated along the refined parameter for fixed values of the other parameters.
+
+        Attributes:
+            fixed (dict): Values of the other swept parameters.
+            x (list): Values of the refined parameter, sorted.
+            value (list): Measured CV at each x.
+            error (list): Bootstrap error of the CV at each x.
+    """
+    def __init__(self, fixed):
+        self.fixed = fixed
+        self.x, self.value, self.error = [], [], []
+
+    def add(self, x, value, error):
+        i = int(np.searchsorted(self.x, x))
+        self.x.insert(i, x)
+        self.value.insert(i, value)
+        self.error.insert(i, error)
+
+    def as_dict(self):
+        return {"fixed": self.fixed, "x": self.x, "cv": self.value, "error": self.error}
+
+class AdaptiveSweep:
+    """
+        Adaptive refinement of the parameter `refine` of a grid sweep spec.
+
+        Arguments:
+            cfg: Base configuration.
+            spec: Sweep spec (grid mode); spec["params"][refine] gives the range and the coarse points.
+            refine (str): Name of the refined parameter.
+            measure: Function cfg -> (value, error), picklable; by default initiation_cv. A Monitored
+                measure also gets the point of cfg.
+            min_dx (float): Intervals shorter than this (in scaled [0, 1] units) are not split.
+            error_weight (float): Weight of the relative-error coordinate in the loss.
+    """
+    def __init__(self, cfg, spec, refine, measure=initiation_cv, min_dx=1e-3, error_weight=1.):
+        self.spec = normalize_spec(spec)
+        if refine not in self.spec["params"]:
+            raise KeyError("refined parameter %s is not swept"%refine)
+        self.base = apply_values(cfg, self.spec["fixed"])
+        self.refine = refine
+        self.measure = measure
+        self.min_dx = min_dx
+        self.error_weight = error_weight
+        self.axis = self.spec["params"][refine]
+        self.log = self.axis.get("scale", "linear")=="log"
+        others = [name for name in self.spec["params"] if name!=refine]
+        self.curves = [Curve(dict(zip(others, map(float, values))))
+                       for values in itertools.product(*(get_range(self.spec["params"][name]) for name in others))]
+        self.n_evaluations = 0
+
+    def scaled(self, x):
+        lo, hi = float(np.min(get_range(self.axis))), float(np.max(get_range(self.axis)))
+        if self.log:
+            return (np.log(x) - np.log(lo))/(np.log(hi) - np.log(lo))
+        return (x - lo)/(hi - lo)
+
+    def midpoint(self, x0, x1):
+        return float(np.sqrt(x0*x1)) if self.log else 0.5*(x0 + x1)
+
+    def point(self, curve, x):
+        return {**curve.fixed, self.refine: x}
+
+    def config(self, curve, x):
+        return resolve(self.base, self.spec, self.point(curve, x))
+
+    def evaluate(self, tasks, max_workers=None):
+        """
+            Runs the measurement for a list of (curve, x) pairs and stores the results.
+        """
+        items = [(i, self.measure, self.config(curve, x), self.point(curve, x)) for i, (curve, x) in enumerate(tasks)]
+        if max_workers==1:
+            results = map(_evaluate, items)
+        else:
+            done = {item[0]: result for item, result in run_bounded(_evaluate, items, max_workers=max_workers)}
+            results = [done[i] for i in range(len(items))]
+        for (curve, x), (value, error) in zip(tasks, results):
+            curve.add(x, float(value), float(error))
+        self.n_evaluations += len(tasks)
+
+    def losses(self):
+        """
+            Returns a list of (loss, curve index, x0, x1) for every interval that can still be split.
+        """
+        log_values = [np.log(v) for curve in self.curves for v in curve.value if v > 0]
+        value_range = (max(log_values) - min(log_values)) if len(log_values) > 1 else 0.
+        rel_errors = [e/v for curve in self.curves for v, e in zip(curve.value, curve.error) if v > 0 and np.isfinite(e)]
+        error_range = max(rel_errors, default=0.) or 1.
+        intervals = []
+        for k, curve in enumerate(self.curves):
+            u = self.scaled(np.asarray(curve.x))
+            value = np.log(np.maximum(curve.value, 1e-300))/(value_range or 1.)
+            rel_error = np.nan_to_num(np.asarray(curve.error)/np.maximum(curve.value, 1e-300))/error_range
+            for i in range(len(curve.x) - 1):
+                du = u[i+1] - u[i]
+                if du < 2*self.min_dx:
+                    continue
+                dv = value[i+1] - value[i]
+                dw = self.error_weight*(rel_error[i+1] - rel_error[i])
+                if not np.isfinite(dv + dw):
+                    # failed measurement (too few initiations): counted as a full change of CV and error
+                    dv, dw = 1., self.error_weight
+                loss = np.sqrt(du**2 + dv**2 + dw**2)
+                intervals.append((loss, k, curve.x[i], curve.x[i+1]))
+        return intervals
+
+    def run(self, budget, batch=8, max_workers=None, callback=None):
+        """
+            Evaluates the coarse grid, then refines until `budget` simulations have been run in total.
+            callback(self) is called after every batch (e.g. to save intermediate results).
+        """
+        coarse = [(curve, float(x)) for curve in self.curves for x in get_range(self.axis)]
+        self.evaluate(coarse[:budget], max_workers=max_workers)
+        if callback is not None:
+            callback(self)
+        while self.n_evaluations < budget:
+            n_new = min(batch, budget - self.n_evaluations)
+            best = heapq.nlargest(n_new, self.losses(), key=lambda interval: interval[0])
+            if not best:
+                break
+            self.evaluate([(self.curves[k], self.midpoint(x0, x1)) for _, k, x0, x1 in best], max_workers=max_workers)
+            if callback is not None:
+                callback(self)
+        return self.curves
+
+    def results(self):
+        return {"refine": self.refine, "evaluations": self.n_evaluations,
+                "curves": [curve.as_dict() for curve in self.curves]}
@@ -0,0 +1,119 @@
+
+# src/utils/compiled_config.py
+"""
+Flat, validated view of a Config used by the simulation engine.
+
+compile_config resolves a Config once: it checks the parameters, precomputes the constants used
+at every step and returns a frozen CompiledParams, which also carries a content hash of the model
+and simulation parameters usable as a key for caches and result stores.
+"""
+
+import hashlib
+import json
+import math
+from dataclasses import dataclass, asdict
+from enum import Enum
+from functools import lru_cache
+from .config import Config
+from src.utils.setup import get_n_star_n_forks
+
+class Regime(str, Enum):
+    """
+        Regime of DnaA activation in get_alpha. Members compare equal to their string value.
+    """
+    CONSTANT = "constant"
+    LINEAR = "linear"
+
+@dataclass(frozen=True, slots=True)
+class CompiledParams:
+    # model parameters
+    SITES: float
+    REP_TIME: float
+    GROWTH_RATE: float
+    ORIGIN_SITES: float
+    E_COST: float
+    FIRING_MAX: float
+    K_OPEN: float
+    D: float
+    ECLIPSE: float
+    LICENSING: float
+    DNAA_CONCENTRATION: float
+    K: float
+    CHI0: float
+    COOP: float
+    REGIME: Regime
+    CHANGE: float
+    # simulation parameters
+    seed: int
+    T_MAX: float
+    DT: float
+    crn: bool
+    # derived constants
+    SITE_RATE: float        # titration sites added per fork per unit time, SITES/(2*REP_TIME)
+    GROWTH_FACTOR: float    # volume factor of one Euler step, 1+GROWTH_RATE*DT
+    LOG_GROWTH: float       # log(GROWTH_FACTOR)
+    LINEAR: bool            # REGIME is Regime.LINEAR
+    N_FORKS_INIT: int       # forks at initiation in steady state (get_n_star_n_forks)
+    CHI: float              # chi per fork, CHI0/N_FORKS_INIT
+    HASH: str               # content hash of the model and simulation parameters
+
+POSITIVE = ("SITES", "REP_TIME", "GROWTH_RATE", "ORIGIN_SITES", "FIRING_MAX", "K_OPEN",
+            "DNAA_CONCENTRATION", "K", "COOP", "CHANGE")
+NON_NEGATIVE = ("E_COST", "D", "ECLIPSE", "LICENSING", "CHI0")
+
+def config_hash(cfg):
+    """
+        sha256 of the model and simulation parameters (output settings are not included).
+    """
+    simulation = asdict(cfg.simulation)
+    if not simulation.get("crn"):
+        # configs without common random numbers keep the hash they had before the option existed
+        simulation.pop("crn", None)
+    content = {"model": asdict(cfg.model), "simulation": simulation}
+    text = json.dumps(content, sort_keys=True, default=float)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def validate(cfg):
+    """
+        Raises ValueError if a parameter of the config is outside of its allowed range.
+    """
+    model, simulation = cfg.model, cfg.simulation
+    for name in POSITIVE:
+        if not getattr(model, name) > 0:
+            raise ValueError("%s must be positive, got %r"%(name, getattr(model, name)))
+    for name in NON_NEGATIVE:
+        if not getattr(model, name) >= 0:
+            raise ValueError("%s must be non-negative, got %r"%(name, getattr(model, name)))
+    try:
+        Regime(model.REGIME)
+    except ValueError:
+        raise ValueError("unknown regime: %r"%model.REGIME) from None
+    if not simulation.DT > 0 or not simulation.T_MAX > 0:
+        raise ValueError("DT and T_MAX must be positive, got %r and %r"%(simulation.DT, simulation.T_MAX))
+
+@lru_cache(maxsize=1024)
+def compile_config(cfg: Config) -> CompiledParams:
+    """
+        Validates cfg and returns the flat parameter struct used by make_step and TreeManager.
+        Configs are hashable, so compiling the same config twice returns the cached struct.
+    """
+    validate(cfg)
+    model, simulation = cfg.model, cfg.simulation
+    _, n_forks_init = get_n_star_n_forks(cfg)
+    if n_forks_init <= 0:
+        raise ValueError("no ongoing replication at initiation for GROWTH_RATE=%g, REP_TIME=%g, D=%g: "
+                         "chi=CHI0/n_forks is not defined"%(model.GROWTH_RATE, model.REP_TIME, model.D))
+    growth_factor = 1. + model.GROWTH_RATE*simulation.DT
+    values = asdict(model)
+    values.update(asdict(simulation))
+    values.update(
+        REGIME=Regime(model.REGIME),
+        SITE_RATE=model.SITES/(2*model.REP_TIME),
+        GROWTH_FACTOR=growth_factor,
+        LOG_GROWTH=math.log(growth_factor),
+        LINEAR=Regime(model.REGIME) is Regime.LINEAR,
+        N_FORKS_INIT=int(n_forks_init),
+        CHI=model.CHI0/n_forks_init,
+        HASH=config_hash(cfg),
+    )
+    return CompiledParams(**values)
@@ -26,6 +26,7 @@ class SimulationParams:
     seed: int
     T_MAX: float
     DT: float
+    crn: bool = False       # common random numbers: seeded firing and division streams
 
 @dataclass(frozen=True)
 class Config:
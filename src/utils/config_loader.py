@@ -10,3 +10,12 @@ def load_config(path: str) -> Config:
     out_dir = data["output"]["dir"]
     dpi = data["output"]["dpi"]
     return Config(model=mp, simulation=sp, output_dir=out_dir, dpi=dpi)
+
+def config_from_dict(data: dict) -> Config:
+    """
+        Inverse of dataclasses.asdict(cfg).
+    """
+    return Config(model=ModelParams(**data["model"]),
+                  simulation=SimulationParams(**data["simulation"]),
+                  output_dir=data["output_dir"],
+                  dpi=data["dpi"])
@@ -0,0 +1,119 @@
+"""
+crn.py
+
+Paired comparisons of parameter points with common random numbers.
+
+With cfg.simulation.crn set, two configs with the same seed use the same firing and division
+streams (fork_tracker.TreeManager.use_common_random_numbers), so their outputs are positively
+correlated and the variance of their difference is much smaller than for independent runs.
+The estimators below always use paired replicates (same seed on both sides):
+
+    - paired_difference: mean difference of matched measurements, its standard error, and the
+      variance reduction with respect to independent runs of the same length.
+    - compare: runs both configs on a list of seeds and returns paired_difference.
+    - neighbour_differences: differences between consecutive points of a sweep.
+    - batch_differences: one long run per config, split into time windows used as paired batches.
+"""
+
+from dataclasses import replace
+import numpy as np
+from src.simulation.run_simulation import run_simulation
+from src.utils.statistics import get_discontinuities, initiation_volumes, cv
+from src.utils.sweep import run_bounded
+
+def with_crn(cfg, seed=None):
+    """
+        Copy of cfg in common-random-numbers mode, with seed if given.
+    """
+    seed = cfg.simulation.seed if seed is None else seed
+    return replace(cfg, simulation=replace(cfg.simulation, crn=True, seed=seed))
+
+def initiation_volume_cv(cfg):
+    """
+        Default measure: CV of the initiation volumes of one simulation.
+    """
+    volumes = initiation_volumes(run_simulation(cfg, verbose=False))
+    return float(cv(volumes)) if len(volumes) > 1 else np.nan
+
+def paired_difference(a, b):
+    """
+        Statistics of b - a for measurements paired by replicate (NaN pairs are dropped).
+
+        Returns a dict with the mean difference, its standard error, the correlation of the pairs
+        and variance_reduction = (var(a) + var(b))/var(b - a), the factor by which independent
+        runs would need more replicates to reach the same error.
+    """
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    ok = np.isfinite(a) & np.isfinite(b)
+    a, b = a[ok], b[ok]
+    n = len(a)
+    if n < 2:
+        return {"n": n, "difference": float(np.mean(b - a)) if n else np.nan, "stderr": np.nan,
+                "stderr_independent": np.nan, "correlation": np.nan, "variance_reduction": np.nan}
+    d = b - a
+    var_d = np.var(d, ddof=1)
+    var_independent = np.var(a, ddof=1) + np.var(b, ddof=1)
+    return {
+        "n": n,
+        "difference": float(np.mean(d)),
+        "stderr": float(np.sqrt(var_d/n)),
+        "stderr_independent": float(np.sqrt(var_independent/n)),
+        "correlation": float(np.corrcoef(a, b)[0, 1]) if np.std(a) > 0 and np.std(b) > 0 else np.nan,
+        "variance_reduction": float(var_independent/var_d) if var_d > 0 else np.inf,
+    }
+
+def _evaluate(task):
+    _, measure, cfg = task
+    return measure(cfg)
+
+def run_replicates(cfgs, seeds, measure=initiation_volume_cv, max_workers=None):
+    """
+        measure of every config for every seed, in common-random-numbers mode.
+        Returns an array of shape (len(cfgs), len(seeds)).
+    """
+    items = [((i, j), measure, with_crn(cfg, seed)) for i, cfg in enumerate(cfgs) for j, seed in enumerate(seeds)]
+    values = np.full((len(cfgs), len(seeds)), np.nan)
+    if max_workers==1:
+        results = ((item, _evaluate(item)) for item in items)
+    else:
+        results = run_bounded(_evaluate, items, max_workers=max_workers)
+    for item, value in results:
+        values[item[0]] = value
+    return values
+
+def compare(cfg_a, cfg_b, seeds, measure=initiation_volume_cv, max_workers=None):
+    values = run_replicates([cfg_a, cfg_b], seeds, measure=measure, max_workers=max_workers)
+    return paired_difference(values[0], values[1])
+
+def neighbour_differences(cfgs, seeds, measure=initiation_volume_cv, max_workers=None):
+    """
+        paired_difference between every pair of consecutive configs (e.g. adjacent y values).
+    """
+    values = run_replicates(cfgs, seeds, measure=measure, max_workers=max_workers)
+    return values, [paired_difference(values[i], values[i+1]) for i in range(len(cfgs) - 1)]
+
+def batch_values(simulation_data, n_batches, burn_in=1./3., statistic=cv):
+    """
+        statistic of the initiation volumes in n_batches equal time windows after the burn-in.
+    """
+    time = np.asarray(simulation_data["time"])
+    volume = np.asarray(simulation_data["volume"])
+    initiations, _, _ = get_discontinuities(simulation_data["origins"], simulation_data["n_forks"])
+    initiations = np.asarray(initiations, dtype=int)
+    edges = np.linspace(time[0] + burn_in*(time[-1] - time[0]), time[-1], n_batches + 1)
+    batch = np.searchsorted(edges, time[initiations], side="right") - 1
+    values = np.full(n_batches, np.nan)
+    for k in range(n_batches):
+        volumes = volume[initiations[batch==k]]
+        if len(volumes) > 1:
+            values[k] = statistic(volumes)
+    return values
+
+def batch_differences(cfg_a, cfg_b, n_batches=10, seed=None, statistic=cv):
+    """
+        Paired batch means from one long common-random-numbers run of each config: batches are
+        the same time windows in both runs.
+    """
+    a = batch_values(run_simulation(with_crn(cfg_a, seed), verbose=False), n_batches, statistic=statistic)
+    b = batch_values(run_simulation(with_crn(cfg_b, seed), verbose=False), n_batches, statistic=statistic)
+    return paired_difference(a, b)
@@ -0,0 +1,202 @@
+"""
+downsample.py
+
+Reduction of long time traces (10^5-10^6 samples) to about as many points as there are pixels.
+
+    - minmax_indices: for every bucket of samples keep the samples with the smallest and largest
+      value, so that peaks and the envelope of the trace are preserved.
+    - lttb_indices: largest-triangle-three-buckets, one sample per bucket chosen to preserve the
+      visual shape.
+    - step_indices: for piecewise-constant signals (origins, n_forks) keep the samples on both
+      sides of every change, so that every step edge is drawn exactly.
+
+TracePyramid precomputes min/max reductions at bucket sizes 8, 16, 32, ... and the step edges,
+and can be saved next to the trajectory (save_trajectory/load_trajectory). query(key, t0, t1,
+n_points) picks the coarsest level that still has ~n_points samples in the window and returns
+only those, so any window is loaded and drawn at screen resolution.
+"""
+
+import numpy as np
+
+STEP_SIGNALS = ("origins", "n_forks")
+
+def window_slice(t, t0=None, t1=None):
+    """
+        Slice of the sorted array t with t0 <= t <= t1, extended by one sample on each side so that
+        lines reach the edges of the window.
+    """
+    start = 0 if t0 is None else max(int(np.searchsorted(t, t0, side="left")) - 1, 0)
+    stop = len(t) if t1 is None else min(int(np.searchsorted(t, t1, side="right")) + 1, len(t))
+    return slice(start, stop)
+
+def minmax_indices(y, bucket):
+    """
+        Indices of the minimum and maximum of y in every bucket of `bucket` samples, in time order.
+        The first and last samples are always kept.
+    """
+    y = np.asarray(y)
+    n = len(y)
+    if bucket <= 2 or n <= 2*bucket:
+        return np.arange(n)
+    n_full = n//bucket
+    blocks = y[:n_full*bucket].reshape(n_full, bucket)
+    offsets = np.arange(n_full)*bucket
+    lo = offsets + np.argmin(blocks, axis=1)
+    hi = offsets + np.argmax(blocks, axis=1)
+    tail = np.arange(n_full*bucket, n)
+    return np.unique(np.concatenate([[0], lo, hi, tail, [n-1]]))
+
+def lttb_indices(t, y, n_out):
+    """
+        Largest-triangle-three-buckets: indices of n_out samples of (t, y).
+    """
+    t, y = np.asarray(t, dtype=float), np.asarray(y, dtype=float)
+    n = len(t)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n-1, n_out-1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n-1
+    a = 0
+    for i in range(n_out-2):
+        start, stop = edges[i], max(edges[i+1], edges[i]+1)
+        next_start, next_stop = stop, (edges[i+2] if i+2 < len(edges) else n)
+        next_stop = max(next_stop, next_start+1)
+        t_avg, y_avg = t[next_start:next_stop].mean(), y[next_start:next_stop].mean()
+        area = np.abs((t[a] - t_avg)*(y[start:stop] - y[a]) - (t[a] - t[start:stop])*(y_avg - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i+1] = a
+    return indices
+
+def step_indices(y):
+    """
+        Indices of the samples just before and just after every change of a piecewise-constant y,
+        plus the first and last samples.
+    """
+    y = np.asarray(y)
+    if len(y) < 2:
+        return np.arange(len(y))
+    changes = np.nonzero(y[1:] != y[:-1])[0]
+    return np.unique(np.concatenate([[0], changes, changes + 1, [len(y)-1]]))
+
+def reduce_trace(t, y, n_points=2000, method="minmax", t0=None, t1=None):
+    """
+        Samples of (t, y) in the window [t0, t1] reduced to about n_points points.
+        method is "minmax", "lttb" or "steps" (exact step edges, not limited to n_points).
+    """
+    t, y = np.asarray(t), np.asarray(y)
+    window = window_slice(t, t0, t1)
+    t, y = t[window], y[window]
+    if method=="steps":
+        indices = step_indices(y)
+    elif method=="lttb":
+        indices = lttb_indices(t, y, n_points)
+    elif method=="minmax":
+        indices = minmax_indices(y, max(len(y)//max(n_points//2, 1), 1))
+    else:
+        raise ValueError("unknown reduction method: %s"%method)
+    return t[indices], y[indices]
+
+class TracePyramid:
+    """
+        Multi-resolution min/max reductions of the traces of a simulation.
+
+        Attributes:
+            time (ndarray): Time of every sample.
+            traces (dict): Full-resolution arrays.
+            levels (dict): For every continuous trace, a list of (bucket, indices) pairs.
+            steps (dict): For every piecewise-constant trace, the indices of its step edges.
+    """
+    def __init__(self, time, traces, levels=None, steps=None, step_signals=STEP_SIGNALS, base=8, min_points=1000):
+        self.time = np.asarray(time, dtype=float)
+        self.traces = {key: np.asarray(value) for key, value in traces.items()}
+        if levels is None or steps is None:
+            levels, steps = {}, {}
+            for key, y in self.traces.items():
+                if key in step_signals:
+                    steps[key] = step_indices(y)
+                    continue
+                levels[key] = []
+                bucket = base
+                while len(y)//bucket >= min_points//2:
+                    levels[key].append((bucket, minmax_indices(y, bucket)))
+                    bucket *= 2
+        self.levels, self.steps = levels, steps
+
+    @classmethod
+    def from_simulation(cls, simulation_data, **kwargs):
+        return cls(simulation_data["time"], {key: value for key, value in simulation_data.items() if key!="time"}, **kwargs)
+
+    def query(self, key, t0=None, t1=None, n_points=2000):
+        """
+            Time and values of trace `key` in [t0, t1]: between n_points and 4*n_points samples for
+            continuous traces (all samples if the window is shorter), every step edge for
+            piecewise-constant ones.
+        """
+        y = self.traces[key]
+        window = window_slice(self.time, t0, t1)
+        if key in self.steps:
+            indices = self.steps[key]
+            lo, hi = np.searchsorted(indices, [window.start, window.stop])
+            indices = np.unique(np.concatenate([[window.start], indices[lo:hi], [window.stop-1]]))
+            return self.time[indices], y[indices]
+        n_window = window.stop - window.start
+        indices = None
+        for bucket, level in self.levels.get(key, []):
+            if bucket*n_points > n_window:
+                break
+            indices = level
+        if indices is None:
+            return self.time[window], y[window]
+        lo, hi = np.searchsorted(indices, [window.start, window.stop])
+        # the first and last samples of the window, so that the line reaches its bounds
+        indices = np.unique(np.concatenate([[window.start], indices[lo:hi], [window.stop-1]]))
+        return self.time[indices], y[indices]
+
+    def to_arrays(self):
+        arrays = {"time": self.time}
+        for key, y in self.traces.items():
+            arrays["trace/%s"%key] = y
+        for key, levels in self.levels.items():
+            for bucket, indices in levels:
+                arrays["level/%s/%d"%(key, bucket)] = indices
+        for key, indices in self.steps.items():
+            arrays["steps/%s"%key] = indices
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        traces, levels, steps = {}, {}, {}
+        for name in arrays.keys():
+            kind, _, rest = name.partition("/")
+            if kind=="trace":
+                traces[rest] = arrays[name]
+            elif kind=="level":
+                key, _, bucket = rest.rpartition("/")
+                levels.setdefault(key, []).append((int(bucket), arrays[name]))
+            elif kind=="steps":
+                steps[rest] = arrays[name]
+        for key in levels:
+            levels[key].sort(key=lambda level: level[0])
+        return cls(arrays["time"], traces, levels=levels, steps=steps)
+
+def save_trajectory(path, simulation_data, **kwargs):
+    """
+        Saves a run_simulation output together with its pyramid in a compressed .npz file.
+    """
+    pyramid = TracePyramid.from_simulation(simulation_data, **kwargs)
+    np.savez_compressed(path, **pyramid.to_arrays())
+    return pyramid
+
+def load_trajectory(path):
+    with np.load(path) as data:
+        return TracePyramid.from_arrays({name: data[name] for name in data.files})
+
+def plot_trace(ax, pyramid, key, t0=None, t1=None, n_points=None, **kwargs):
+    """
+        Plots trace `key` of a TracePyramid in [t0, t1] at about the pixel resolution of ax.
+    """
+    if n_points is None:
+        n_points = max(int(ax.get_window_extent().width), 200)
+    t, y = pyramid.query(key, t0, t1, n_points=n_points)
+    return ax.plot(t, y, **kwargs)
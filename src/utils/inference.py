@@ -0,0 +1,409 @@
+"""
+inference.py
+
+Approximate Bayesian computation (ABC-SMC) of model parameters from measured initiation-volume and
+division-size distributions.
+
+The prior is a sweep spec (src/utils/sweep.py): every entry of spec["params"] is a uniform prior on
+its min_val/max_val range, on a "log" or "linear" scale, and the fixed values and derived rules of
+the spec are applied to every proposed point as in iter_configs. Particles live in the unit cube
+of the swept parameters (sweep.from_unit).
+
+Every simulation is reduced to summary statistics while it runs: OnlineSummary is the progress
+callback of run_simulation, scans only the samples added since its previous call for initiations
+and divisions, keeps running moments (Welford) of their volumes, and drops the scanned samples from
+the trace so that the memory of a simulation does not grow with T_MAX. The statistics are the mean
+and CV of the initiation volume and of the volume at division; the distance to the data is the
+Euclidean distance of the statistics, each divided by its median absolute deviation over the
+prior-predictive population.
+
+ABC-SMC (Beaumont et al. 2009): generation 0 samples the prior; every following generation
+takes the tolerance as a quantile of the distances of the previous population, perturbs particles
+drawn by weight with a Gaussian kernel of twice their weighted covariance, and keeps proposals
+closer than the tolerance, with importance weights prior/sum_j w_j K(theta|theta_j). The truncation
+of the kernel at the edges of the prior is ignored in the weights.
+
+Proposals are simulated in a process pool (sweep.run_bounded) in batches streamed from a
+generator. Each proposal has its own seed drawn from the inference generator, and a generation
+keeps the accepted proposals of the shortest prefix (in proposal order) with enough of them, so
+that the result does not depend on the completion order of the workers. Summaries are stored in
+a SummaryCache keyed by the config hash, so that an interrupted run started again with the same
+seed only simulates what it has not seen. Simulations run in common-random-numbers mode
+(crn.with_crn), where the seed fixes the whole run, so a cached summary is exactly what the
+simulation would return again.
+
+Proposals whose config is degenerate are redrawn before they are simulated, as if the prior were
+truncated to the admissible points: configs that do not compile, and derived K_OPEN or CHI0 that
+are not finite or below MIN_DERIVED (at CHANGE=1 the constant regime has no optimal activation and
+change_kori gives K_OPEN ~1e-10*COOP, with volumes that collapse to 0).
+"""
+
+import json
+import os
+import numpy as np
+from src.simulation.run_simulation import run_simulation
+from src.utils.compiled_config import config_hash
+from src.utils.crn import with_crn
+from src.utils.sweep import DERIVED, normalize_spec, apply_values, resolve, run_bounded, from_unit, check_point
+
+STATISTICS = ("initiation_volume_mean", "initiation_volume_cv", "division_volume_mean", "division_volume_cv")
+# derived K_OPEN or CHI0 below which a proposal is degenerate
+MIN_DERIVED = 1e-4
+
+class Moments:
+    """
+        Running count, mean and sum of squared deviations (Welford).
+    """
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.
+        self.m2 = 0.
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta/self.n
+        self.m2 += delta*(x - self.mean)
+
+    def cv(self):
+        return float(np.sqrt(self.m2/self.n)/self.mean) if self.n > 1 else np.nan
+
+class OnlineSummary:
+    """
+        Callback of run_simulation(cfg, progress=...): accumulates the volumes at initiation and at
+        division (the volume just before the drop) of the events after burn_in*t_max. With trim,
+        the scanned samples are deleted from simulation_data, which only keeps the last `every` steps.
+    """
+    def __init__(self, burn_in=1./3., every=2000, trim=True):
+        self.burn_in = burn_in
+        self.every = every
+        self.trim = trim
+        self.initiation = Moments()
+        self.division = Moments()
+        self.last = None
+        self.scanned = 0
+
+    def __call__(self, t, t_max, simulation_data):
+        time, volume = simulation_data["time"], simulation_data["volume"]
+        origins, forks = simulation_data["origins"], simulation_data["n_forks"]
+        t_burn = self.burn_in*t_max
+        for i in range(self.scanned, len(time)):
+            if self.last is not None and time[i] >= t_burn:
+                d_o = origins[i] - self.last[0]
+                d_f = forks[i] - self.last[1]
+                if d_o > 0 and d_f > 0:
+                    self.initiation.add(volume[i])
+                elif d_o < 0 and d_f < 0:
+                    self.division.add(self.last[2])
+            self.last = (origins[i], forks[i], volume[i])
+        self.scanned = len(time)
+        if self.trim:
+            # run_simulation only appends to the trace, so the scanned samples can go
+            for values in simulation_data.values():
+                del values[:]
+            self.scanned = 0
+
+    def statistics(self):
+        return {
+            "initiation_volume_mean": self.initiation.mean if self.initiation.n else np.nan,
+            "initiation_volume_cv": self.initiation.cv(),
+            "division_volume_mean": self.division.mean if self.division.n else np.nan,
+            "division_volume_cv": self.division.cv(),
+            "n_initiations": self.initiation.n,
+            "n_divisions": self.division.n,
+        }
+
+def simulate_summary(task):
+    """
+        Worker: runs one config with an OnlineSummary and returns its statistics.
+    """
+    _, cfg, burn_in = task
+    summary = OnlineSummary(burn_in=burn_in)
+    simulation_data = run_simulation(cfg, progress=summary)
+    # samples logged after the last callback
+    summary(cfg.simulation.T_MAX, cfg.simulation.T_MAX, simulation_data)
+    return summary.statistics()
+
+def observed_statistics(initiation_volumes=None, division_volumes=None):
+    """
+        Statistics of measured volumes (in the volume units of the model). Either sample may be
+        missing, in which case its statistics are not used in the distance.
+    """
+    statistics = {}
+    for name, values in (("initiation_volume", initiation_volumes), ("division_volume", division_volumes)):
+        if values is None:
+            continue
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if len(values) < 2:
+            raise ValueError("need at least 2 measured values of %s, got %d"%(name, len(values)))
+        statistics[name + "_mean"] = float(np.mean(values))
+        statistics[name + "_cv"] = float(np.std(values)/np.mean(values))
+    if not statistics:
+        raise ValueError("no initiation_volume or division_volume data")
+    return statistics
+
+def load_observations(path):
+    """
+        Measured volumes from a .json (lists), .npz (arrays) or .csv (header row) file with columns
+        initiation_volume and/or division_volume; returns observed_statistics.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension==".json":
+        with open(path) as f:
+            data = json.load(f)
+    elif extension==".npz":
+        data = dict(np.load(path))
+    elif extension==".csv":
+        table = np.genfromtxt(path, delimiter=",", names=True)
+        data = {name: table[name] for name in table.dtype.names}
+    else:
+        raise ValueError("unknown data format: %s (expected .json, .npz or .csv)"%path)
+    return observed_statistics(data.get("initiation_volume"), data.get("division_volume"))
+
+class SummaryCache:
+    """
+        Statistics of simulations already run, keyed by config hash and burn-in. With a path, every
+        new entry is appended to a JSON lines file, which is read back on creation.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = {name: np.nan if value is None else value
+                                                      for name, value in entry["statistics"].items()}
+
+    @staticmethod
+    def key(cfg, burn_in):
+        return "%s-%g"%(config_hash(cfg), burn_in)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, statistics):
+        self.entries[key] = statistics
+        if self.path is not None:
+            clean = {name: None if not np.isfinite(value) else value for name, value in statistics.items()}
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"key": key, "statistics": clean}) + "\n")
+
+    def __len__(self):
+        return len(self.entries)
+
+def weighted_quantiles(values, weights, q):
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order])
+    cumulative /= cumulative[-1]
+    return values[order][np.minimum(np.searchsorted(cumulative, q), len(values) - 1)]
+
+class ABCSMC:
+    """
+        ABC-SMC posterior of the swept parameters of spec given observed statistics.
+
+        Arguments:
+            cfg: Base configuration (T_MAX and DT of the simulations; its seed is replaced).
+            spec: Sweep spec whose params (min_val/max_val ranges) are the uniform priors.
+            observed (dict): Observed statistics (observed_statistics or load_observations); only
+                these enter the distance.
+            n_particles (int): Population size.
+            quantile (float): Tolerance of a generation, as a quantile of the previous distances.
+            burn_in (float): Fraction of T_MAX discarded before the statistics are accumulated.
+            cache (SummaryCache): Simulations already run (default: in memory only).
+            max_proposals (int): Proposals per generation after which the run stops with a
+                RuntimeError (default: 100*n_particles); also the number of degenerate draws in a
+                row after which a proposal gives up.
+            seed: Seed of the proposals and of the simulation seeds.
+    """
+    def __init__(self, cfg, spec, observed, n_particles=100, quantile=0.5, burn_in=1./3., cache=None,
+                 max_proposals=None, seed=0):
+        self.spec = normalize_spec(spec)
+        self.base = apply_values(cfg, self.spec["fixed"])
+        self.names = list(self.spec["params"])
+        self.checked = {DERIVED[rule][0] for rule in self.spec["derived"]} & {"K_OPEN", "CHI0"}
+        self.statistics = [name for name in STATISTICS if name in observed]
+        self.observed = np.array([observed[name] for name in self.statistics])
+        self.n_particles = n_particles
+        self.quantile = quantile
+        self.burn_in = burn_in
+        self.max_proposals = max_proposals or 100*n_particles
+        self.cache = cache if cache is not None else SummaryCache()
+        self.rng = np.random.default_rng(seed)
+        self.scale = None
+        self.population = None
+        self.history = []
+        self.simulations = 0
+        self.cache_hits = 0
+        self.degenerate = 0
+
+    def point(self, u):
+        return {name: from_unit(u[k], self.spec["params"][name]) for k, name in enumerate(self.names)}
+
+    def config(self, u, seed):
+        return with_crn(resolve(self.base, self.spec, self.point(u)), seed)
+
+    def admissible(self, u):
+        """
+            False if the point of u resolves to a config that does not compile, or whose derived
+            K_OPEN or CHI0 is not finite or below MIN_DERIVED.
+        """
+        point = self.point(u)
+        cfg = resolve(self.base, self.spec, point)
+        if not all(np.isfinite(getattr(cfg.model, name)) and getattr(cfg.model, name) >= MIN_DERIVED
+                   for name in self.checked):
+            return False
+        try:
+            check_point(point, cfg)
+        except ValueError:
+            return False
+        return True
+
+    def draw(self, propose):
+        """
+            First admissible proposal of propose(), counting the degenerate ones.
+        """
+        for _ in range(self.max_proposals):
+            u, seed = propose()
+            if self.admissible(u):
+                return u, seed
+            self.degenerate += 1
+        raise RuntimeError("no admissible proposal in %d draws: the derived parameters are degenerate "
+                           "over the prior"%self.max_proposals)
+
+    def distance(self, S):
+        d = np.sqrt(np.sum(((S - self.observed)/self.scale)**2, axis=-1))
+        return np.where(np.isfinite(d), d, np.inf)
+
+    def summarize(self, proposals, max_workers=None):
+        """
+            Statistics of a list of (u, seed) proposals, from the cache or simulated in the pool.
+            Returns an array of shape (len(proposals), len(self.statistics)).
+        """
+        keys, missing = [], {}
+        for i, (u, seed) in enumerate(proposals):
+            cfg = self.config(u, seed)
+            key = SummaryCache.key(cfg, self.burn_in)
+            keys.append(key)
+            if self.cache.get(key) is None and key not in missing:
+                missing[key] = (key, cfg, self.burn_in)
+        self.cache_hits += len(proposals) - len(missing)
+        self.simulations += len(missing)
+        if max_workers==1:
+            results = ((item, simulate_summary(item)) for item in missing.values())
+        else:
+            results = run_bounded(simulate_summary, missing.values(), max_workers=max_workers)
+        for item, statistics in results:
+            self.cache.put(item[0], statistics)
+        return np.array([[self.cache.get(key)[name] for name in self.statistics] for key in keys], dtype=float)
+
+    def sample(self, accept, propose, max_workers=None):
+        """
+            Draws proposals in chunks until n_particles are accepted. A chunk is sized from the
+            acceptance rate so far, and only the accepted proposals up to the n_particles-th (in
+            proposal order) are kept. Returns U, S and the number of proposals used.
+        """
+        n_workers = max_workers or os.cpu_count() or 1
+        U, S = [], []
+        n_proposed, n_accepted = 0, 0
+        while n_accepted < self.n_particles:
+            if n_proposed >= self.max_proposals:
+                raise RuntimeError("only %d of %d particles accepted after %d proposals"%(
+                    n_accepted, self.n_particles, n_proposed))
+            needed = self.n_particles - n_accepted
+            rate = max(n_accepted/n_proposed, 0.01) if n_proposed else 1.
+            chunk = max(n_workers, int(np.ceil(1.2*needed/rate)))
+            proposals = [self.draw(propose) for _ in range(chunk)]
+            statistics = self.summarize(proposals, max_workers=max_workers)
+            for (u, _), s in zip(proposals, statistics):
+                n_proposed += 1
+                if accept(s):
+                    U.append(u)
+                    S.append(s)
+                    n_accepted += 1
+                    if n_accepted==self.n_particles:
+                        break
+        return np.array(U), np.array(S), n_proposed
+
+    def prior_proposal(self):
+        return self.rng.random(len(self.names)), int(self.rng.integers(2**31))
+
+    def run(self, n_generations, max_workers=None, callback=None):
+        """
+            Generation 0 from the prior, then n_generations - 1 SMC generations. Returns posterior().
+        """
+        d = len(self.names)
+        U, S, n_proposed = self.sample(lambda s: np.all(np.isfinite(s)), self.prior_proposal, max_workers)
+        mad = np.median(np.abs(S - np.median(S, axis=0)), axis=0)
+        self.scale = np.where(mad > 0, mad, np.maximum(np.abs(self.observed), 1e-12))
+        W = np.full(len(U), 1./len(U))
+        self.population = (U, W, S, self.distance(S))
+        self.record(np.inf, n_proposed)
+        if callback is not None:
+            callback(self)
+        for _ in range(1, n_generations):
+            U, W, S, D = self.population
+            epsilon = float(np.quantile(D, self.quantile))
+            mean = W@U
+            cov = 2.*((U - mean).T*W)@(U - mean) + 1e-10*np.eye(d)
+            L = np.linalg.cholesky(cov)
+            inverse = np.linalg.inv(cov)
+
+            def propose():
+                while True:
+                    u = U[self.rng.choice(len(U), p=W)] + L@self.rng.standard_normal(d)
+                    if np.all((u >= 0.) & (u < 1.)):
+                        return u, int(self.rng.integers(2**31))
+
+            new_U, new_S, n_proposed = self.sample(lambda s: self.distance(s) <= epsilon, propose, max_workers)
+            delta = new_U[:, None, :] - U[None, :, :]
+            kernel = np.exp(-0.5*np.einsum("ijk,kl,ijl->ij", delta, inverse, delta))
+            new_W = 1./(kernel@W)
+            self.population = (new_U, new_W/np.sum(new_W), new_S, self.distance(new_S))
+            self.record(epsilon, n_proposed)
+            if callback is not None:
+                callback(self)
+        return self.posterior()
+
+    def record(self, epsilon, n_proposed):
+        _, W, _, D = self.population
+        self.history.append({
+            "generation": len(self.history),
+            "epsilon": epsilon,
+            "proposals": n_proposed,
+            "acceptance_rate": self.n_particles/n_proposed,
+            "ess": float(1./np.sum(W**2)),
+            "median_distance": float(np.median(D)),
+            "simulations": self.simulations,
+            "cache_hits": self.cache_hits,
+            "degenerate": self.degenerate,
+        })
+
+    def posterior(self):
+        """
+            Particles of the last generation in parameter units, with weights, distances and
+            statistics, and the weighted mean and 5/50/95% quantiles of every parameter.
+        """
+        U, W, S, D = self.population
+        values = {name: np.array([from_unit(u, self.spec["params"][name]) for u in U[:, k]])
+                  for k, name in enumerate(self.names)}
+        return {
+            "particles": values,
+            "weights": W,
+            "distances": D,
+            "statistics": {name: S[:, k] for k, name in enumerate(self.statistics)},
+            "summary": {name: {"mean": float(W@value),
+                               "quantiles": [float(q) for q in weighted_quantiles(value, W, [0.05, 0.5, 0.95])]}
+                        for name, value in values.items()},
+        }
+
+    def resample(self, n):
+        """
+            n unweighted posterior samples (drawn by weight from the last population).
+        """
+        U, W, _, _ = self.population
+        chosen = U[self.rng.choice(len(U), size=n, p=W)]
+        return {name: np.array([from_unit(u, self.spec["params"][name]) for u in chosen[:, k]])
+                for k, name in enumerate(self.names)}
@@ -0,0 +1,196 @@
+"""
+monitor.py
+
+Live progress of long sweeps. Every simulation gets a ProgressReporter, which run_simulation calls
+every `every` steps; the reporter computes the progress, steps/second, ETA, memory use and the
+running CV of the initiation volume of its simulation, and puts a small dict on a queue. A Monitor
+in the main process drains the queue and serves the latest state of every simulation as JSON over
+HTTP on localhost:
+
+    monitor = Monitor(port=8765)
+    measure = Monitored(initiation_cv, monitor.queue)     # picklable, works in a process pool
+    measure(cfg, point=point)
+    ...
+    curl http://127.0.0.1:8765/
+
+The queue is a multiprocessing.Manager queue, so it can be passed to the workers of a plain
+ProcessPoolExecutor. Reports are sent with put_nowait and never block the simulation.
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Manager
+from queue import Empty
+from src.utils.compiled_config import config_hash
+from src.utils.statistics import get_discontinuities, cv
+
+def rss_mb():
+    """
+        Resident memory of the current process in MB (None where /proc is not available).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1])*os.sysconf("SC_PAGE_SIZE")/2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class ProgressReporter:
+    """
+        Callback of run_simulation(cfg, progress=...). Called as progress(time, t_max, simulation_data)
+        every `every` steps; only the samples added since the previous call are scanned for initiations.
+    """
+    def __init__(self, queue, key, point=None, every=5000, burn_in=1./3.):
+        self.queue = queue
+        self.key = key
+        self.point = point
+        self.every = every
+        self.burn_in = burn_in
+        self.start = time.perf_counter()
+        self.scanned = 0
+        self.initiation_volumes = []
+        self.steps = 0
+
+    def state(self, t, t_max, status):
+        elapsed = time.perf_counter() - self.start
+        rate = self.steps/elapsed if elapsed > 0 else 0.
+        fraction = min(t/t_max, 1.) if t_max > 0 else 1.
+        volumes = self.initiation_volumes[int(len(self.initiation_volumes)*self.burn_in):]
+        return {
+            "key": self.key,
+            "point": self.point,
+            "pid": os.getpid(),
+            "status": status,
+            "time": t,
+            "fraction": fraction,
+            "steps": self.steps,
+            "steps_per_second": rate,
+            "elapsed_seconds": elapsed,
+            "eta_seconds": elapsed*(1. - fraction)/fraction if fraction > 0 else None,
+            "rss_mb": rss_mb(),
+            "n_initiations": len(self.initiation_volumes),
+            "cv": float(cv(volumes)) if len(volumes) > 1 else None,
+            "updated": time.time(),
+        }
+
+    def send(self, state):
+        try:
+            self.queue.put_nowait(state)
+        except Exception:
+            # a full or closed queue must never stop the simulation
+            pass
+
+    def __call__(self, t, t_max, simulation_data):
+        origins, forks = simulation_data["origins"], simulation_data["n_forks"]
+        self.steps = len(origins)
+        start = max(self.scanned - 1, 0)
+        if self.steps - start >= 2:
+            initiations, _, _ = get_discontinuities(origins[start:], forks[start:])
+            volume = simulation_data["volume"]
+            self.initiation_volumes += [volume[start + i] for i in initiations]
+            self.scanned = self.steps
+        self.send(self.state(t, t_max, "running"))
+
+    def finish(self, t_max, status="done"):
+        self.send(self.state(t_max, t_max, status))
+
+class Monitored:
+    """
+        Wraps a measurement function measure(cfg, progress=None) so that every call reports its
+        progress on queue, labelled with the sweep point of cfg. Picklable if measure is a
+        module-level function.
+    """
+    def __init__(self, measure, queue, every=5000):
+        self.measure = measure
+        self.queue = queue
+        self.every = every
+
+    def __call__(self, cfg, point=None):
+        key = "%s-%d"%(config_hash(cfg)[:12], os.getpid())
+        reporter = ProgressReporter(self.queue, key, point=point, every=self.every)
+        try:
+            result = self.measure(cfg, progress=reporter)
+        except BaseException:
+            reporter.finish(cfg.simulation.T_MAX, status="failed")
+            raise
+        reporter.finish(cfg.simulation.T_MAX)
+        return result
+
+class Monitor:
+    """
+        Collects the reports of all simulations and serves them on http://host:port/ as JSON.
+        GET / returns every simulation, GET /summary only the totals.
+    """
+    def __init__(self, port=8765, host="127.0.0.1"):
+        self.manager = Manager()
+        self.queue = self.manager.Queue()
+        self.simulations = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self._stop = threading.Event()
+        self._drain_thread = threading.Thread(target=self._drain, daemon=True)
+        self._drain_thread.start()
+        monitor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") in ("", "/summary"):
+                    body = monitor.summary() if self.path.rstrip("/")=="/summary" else monitor.snapshot()
+                    data = json.dumps(body, indent=2).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                else:
+                    self.send_error(404)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._server_thread.start()
+        self.url = "http://%s:%d/"%(host, self.server.server_address[1])
+
+    def _drain(self):
+        while not self._stop.is_set():
+            try:
+                state = self.queue.get(timeout=0.5)
+            except (Empty, EOFError, OSError):
+                continue
+            with self.lock:
+                self.simulations[state["key"]] = state
+
+    def summary(self):
+        with self.lock:
+            states = list(self.simulations.values())
+        running = [s for s in states if s["status"]=="running"]
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "running": len(running),
+            "done": sum(s["status"]=="done" for s in states),
+            "failed": sum(s["status"]=="failed" for s in states),
+            "steps_per_second": sum(s["steps_per_second"] for s in running),
+            "rss_mb": sum(s["rss_mb"] or 0. for s in running),
+        }
+
+    def snapshot(self):
+        with self.lock:
+            simulations = dict(self.simulations)
+        return {"summary": self.summary(), "simulations": simulations}
+
+    def close(self):
+        self._stop.set()
+        self.server.shutdown()
+        self.server.server_close()
+        self._drain_thread.join(timeout=2.)
+        self.manager.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,93 @@
+"""
+optimal_parameters.py
+
+Vectorized version of the steady-state derivations in src/utils/setup.py
+(get_n_star_n_forks, get_v_opt, get_chi0, get_alpha_opt, get_y_opt) and of the
+re-optimization of K_OPEN for a new cooperativity (change_kori).
+
+Any numeric field of ModelParams can be given as an array; all derived quantities are
+computed in one NumPy pass over the broadcast of the arrays.
+"""
+
+from dataclasses import asdict, replace
+from functools import lru_cache
+import numpy as np
+
+def get_optimal_parameters(SITES, REP_TIME, GROWTH_RATE, D, DNAA_CONCENTRATION, CHANGE, COOP,
+                           K_OPEN, E_COST, ORIGIN_SITES, K, REGIME="constant", **_):
+    """
+        Returns a dict of arrays with:
+            - "n_star": number of titration sites at initiation (n_sites_at_initiation),
+            - "n_forks": number of forks at initiation (n_forks_at_initiation),
+            - "v_opt": optimal volume at initiation,
+            - "chi0": CHI0 selected from v_opt and CHANGE,
+            - "alpha_opt": optimal fraction of active DnaA,
+            - "y_opt": cooperativity that maximizes the Hill coefficient,
+            - "COOP": the requested cooperativity,
+            - "K_OPEN": dissociation constant that is still optimal for COOP (change_kori).
+    """
+    tau = np.log(2.)/np.asarray(GROWTH_RATE, dtype=float)
+    t_ter = tau - D
+    cycles = np.floor((REP_TIME + D)/tau)
+    t_in = (cycles+1)*tau - REP_TIME - D
+
+    n_origins = 2.**cycles
+    n_forks = np.trunc(np.where(t_in < t_ter, 2.*(n_origins-1.), 4.*(n_origins/2.-1.)))
+
+    # sum_{i<r} (r-i) 2^i = 2^(r+1) - r - 2
+    rounds = np.floor(REP_TIME/tau)
+    n_star = SITES*(1. + tau/REP_TIME*(2.**(rounds+1.) - rounds - 2.))
+    n_star = np.where(t_in > t_ter, 2.*n_star, n_star)
+
+    v_opt = n_star/DNAA_CONCENTRATION
+    chi0 = v_opt/CHANGE
+    if REGIME=="constant":
+        alpha_opt = np.maximum((v_opt-chi0)/v_opt, 1e-10)
+    elif REGIME=="linear":
+        alpha_opt = np.maximum(v_opt/(v_opt+chi0), 1e-10)
+    else:
+        print("unknown regime in get_optimal_parameters: %s"%REGIME)
+        alpha_opt = np.zeros_like(v_opt)
+    y_opt = K_OPEN*np.exp(E_COST/ORIGIN_SITES)/(alpha_opt*np.sqrt(K*DNAA_CONCENTRATION))
+    # change_kori applied to the optimal configuration: K_OPEN scales linearly with y
+    kori = K_OPEN*COOP/y_opt
+
+    table = {
+        "n_star": n_star,
+        "n_forks": n_forks,
+        "v_opt": v_opt,
+        "chi0": chi0,
+        "alpha_opt": alpha_opt,
+        "y_opt": y_opt,
+        "COOP": COOP,
+        "K_OPEN": kori,
+    }
+    shape = np.broadcast_shapes(*(np.shape(value) for value in table.values()))
+    return {key: np.broadcast_to(value, shape) for key, value in table.items()}
+
+@lru_cache(maxsize=None)
+def _base_table(model):
+    return get_optimal_parameters(**asdict(model))
+
+def optimal_table(cfg, **overrides):
+    """
+        Derived steady-state quantities for the base configuration cfg, with any ModelParams
+        field replaced by an array (e.g. CHANGE=changes[:, None], COOP=ys[None, :]).
+        The table of the base configuration itself is computed once per ModelParams.
+    """
+    if not overrides:
+        return _base_table(cfg.model)
+    params = asdict(cfg.model)
+    for key, value in overrides.items():
+        if key not in params:
+            raise KeyError("unknown model parameter: %s"%key)
+        params[key] = value if key=="REGIME" else np.asarray(value, dtype=float)
+    return get_optimal_parameters(**params)
+
+def make_optimal_config(cfg):
+    """
+        Same as experiments/run_optimal_y.make_optimal: sets CHI0 from CHANGE and COOP to the
+        optimal cooperativity.
+    """
+    table = optimal_table(cfg)
+    return replace(cfg, model=replace(cfg.model, CHI0=float(table["chi0"]), COOP=float(table["y_opt"])))
@@ -41,11 +41,14 @@ def n_sites_at_initiation(cfg, tau, t_in, t_ter):
 def sites_concentration(n_sites, volume):
     return n_sites/volume
 
-def initial_tree(cfg):
+def initial_tree(params):
     """
         The tree is needed to keep track of all the origins. 
+        params is the CompiledParams of the configuration (compiled_config.compile_config).
     """
-    tree_manager = TreeManager(cfg)
+    tree_manager = TreeManager(params)
+    if params.crn:
+        tree_manager.use_common_random_numbers(params.seed)
     tree_manager.add_initial_origin()
     return tree_manager
 
@@ -136,7 +139,9 @@ def initialize_n_nforks(cfg):
     n_tot = cfg.model.SITES
     return n_tot, n_forks
 
-def main(cfg= load_config("src/configs/base.yaml")):
+def main(cfg=None):
+    if cfg is None:
+        cfg = load_config("src/configs/base.yaml")
     n_star, n_forks=get_n_star_n_forks(cfg)
     print("n_star =", n_star)
     print("n_forks =", n_forks)
@@ -0,0 +1,195 @@
+"""
+shared_results.py
+
+Returns the columns of simulation_data from pool workers through shared memory instead of pickling
+millions of floats back to the parent.
+
+The worker copies every column into one multiprocessing.shared_memory block and returns only a
+small SharedTrajectory handle (block name, column offsets and dtypes). The parent attaches to the
+block and gets NumPy arrays that are views on it, without any copy:
+
+    for point, arrays in run_shared(simulate, items, max_workers=8):
+        with arrays:
+            volume = arrays["volume"]       # ndarray view on shared memory
+            ...                             # the block is unlinked when the with block exits
+
+Lifetime: the parent owns every block it receives and unlinks it when it is released (end of the
+with block, or at the next iteration of run_shared at the latest). Arrays still referenced after
+release stay valid until they are garbage collected: unlinking only removes the name, and the
+arrays hold an export of the mapping (through a ctypes buffer), so it is unmapped only once the
+last of them is gone.
+A worker that fails while writing unlinks its block; blocks lost with a killed worker or left by
+a consumer that stops early are removed by name prefix when run_shared finishes, and otherwise
+by the resource tracker of the parent when it exits.
+"""
+
+import ctypes
+import os
+import uuid
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from src.utils.sweep import run_bounded
+
+ALIGN = 64
+SHM_DIR = "/dev/shm"
+
+def new_prefix():
+    return "dnaa%s_"%uuid.uuid4().hex[:8]
+
+class SharedTrajectory:
+    """
+        Picklable handle of a block written by export.
+
+        Attributes:
+            name (str): Name of the shared memory block.
+            columns (list): (key, offset, length, dtype) of every column.
+    """
+    def __init__(self, name, columns):
+        self.name = name
+        self.columns = columns
+
+    @classmethod
+    def export(cls, simulation_data, prefix=""):
+        """
+            Copies every column of simulation_data into a new shared memory block (in the worker).
+        """
+        arrays = {key: np.asarray(value) for key, value in simulation_data.items()}
+        columns, size = [], 0
+        for key, array in arrays.items():
+            columns.append((key, size, len(array), array.dtype.str))
+            size += -(-array.nbytes//ALIGN)*ALIGN
+        shm = SharedMemory(name=prefix + uuid.uuid4().hex[:16], create=True, size=max(size, 1))
+        try:
+            for key, offset, length, dtype in columns:
+                np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=offset)[:] = arrays[key]
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        shm.close()
+        return cls(shm.name, columns)
+
+    def attach(self):
+        return SharedArrays(self)
+
+class _Mapping(SharedMemory):
+    """
+        SharedMemory whose close() leaves the mapping open while arrays still export it; the
+        mapping is then unmapped when the last of them is garbage collected.
+    """
+    def close(self):
+        try:
+            super().close()
+        except BufferError:
+            pass
+
+class SharedArrays:
+    """
+        NumPy views on the columns of a SharedTrajectory (in the parent). Behaves as a read-only
+        dict of arrays; release() (or leaving a with block) unlinks the block.
+    """
+    def __init__(self, handle):
+        self.handle = handle
+        self.shm = _Mapping(name=handle.name)
+        # numpy keeps the mmap itself as the base of views on shm.buf, without holding an export,
+        # so closing the block would unmap memory the views still point to; a ctypes buffer holds one
+        buffer = (ctypes.c_char*self.shm.size).from_buffer(self.shm.buf)
+        self.arrays = {key: np.ndarray(length, dtype=dtype, buffer=buffer, offset=offset)
+                       for key, offset, length, dtype in handle.columns}
+        self.released = False
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def __contains__(self, key):
+        return key in self.arrays
+
+    def __len__(self):
+        return len(self.arrays)
+
+    def __iter__(self):
+        return iter(self.arrays)
+
+    def keys(self):
+        return self.arrays.keys()
+
+    def items(self):
+        return self.arrays.items()
+
+    def to_dict(self, lists=False):
+        """
+            Private copy of the columns, as arrays or (for json) as lists.
+        """
+        return {key: array.tolist() if lists else array.copy() for key, array in self.arrays.items()}
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        self.arrays = {}
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        # unmaps now if no view is left, otherwise when the last one is collected
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+def unlink_prefix(prefix):
+    """
+        Removes the blocks whose name starts with prefix (Linux, where blocks live in /dev/shm).
+        Returns the number of removed blocks.
+    """
+    if not prefix or not os.path.isdir(SHM_DIR):
+        return 0
+    removed = 0
+    for name in os.listdir(SHM_DIR):
+        if name.startswith(prefix):
+            try:
+                shm = SharedMemory(name=name)
+            except FileNotFoundError:
+                continue
+            shm.close()
+            shm.unlink()
+            removed += 1
+    return removed
+
+class _SharedCall:
+    """
+        Picklable wrapper that runs func in the worker and exports its result.
+    """
+    def __init__(self, func, prefix):
+        self.func = func
+        self.prefix = prefix
+
+    def __call__(self, item):
+        return SharedTrajectory.export(self.func(item), prefix=self.prefix)
+
+def run_shared(func, items, max_workers=None, max_pending=None):
+    """
+        Like sweep.run_bounded, for a func that returns a simulation_data dict: yields
+        (item, SharedArrays) pairs in completion order. Each SharedArrays is released at the next
+        iteration if the caller has not released it.
+    """
+    # start the resource tracker here, so that the workers share it and blocks registered by a
+    # worker that dies are cleaned up by the parent
+    resource_tracker.ensure_running()
+    prefix = new_prefix()
+    results = run_bounded(_SharedCall(func, prefix), items, max_workers=max_workers, max_pending=max_pending)
+    arrays = None
+    try:
+        for item, handle in results:
+            arrays = handle.attach()
+            yield item, arrays
+            arrays.release()
+    finally:
+        if arrays is not None:
+            arrays.release()
+        results.close()
+        unlink_prefix(prefix)
@@ -0,0 +1,93 @@
+"""
+statistics.py
+
+Cell-cycle statistics of a simulation trace: detection of initiation, termination and division
+events, initiation volumes and their coefficient of variation with a bootstrap error.
+"""
+
+from typing import Sequence, List
+import numpy as np
+
+def get_discontinuities(origins: Sequence[float], forks: Sequence[float]):
+    """
+    Detect indices of initiations, terminations, and divisions based on two traces:
+    origins and forks. Indices returned correspond to the right-hand sample (i+1),
+    i.e., the index where the new value appears after a change between i -> i+1.
+
+    Rules:
+      - Initiation:  Δorigins > 0 and Δforks > 0
+      - Division:    Δorigins < 0 and Δforks < 0
+      - Termination: Δorigins == 0 and Δforks < 0
+
+    Parameters
+    ----------
+    origins : Sequence[float]
+        Time series of origin counts.
+    forks : Sequence[float]
+        Time series of fork counts.
+
+    Returns
+    -------
+    initiations, terminations, divisions : Tuple[List[int], List[int], List[int]]
+        Lists of indices (0-based) where each event is detected. The index refers
+        to the right-hand point of the transition (i+1).
+
+    Raises
+    ------
+    ValueError
+        If lengths differ or sequences are shorter than 2.
+
+    Notes
+    -----
+    - If you prefer 1-based indices, add +1 to each reported index.
+    - If the data is noisy or floating-point, consider adding a tolerance.
+    """
+
+    if len(origins) != len(forks):
+        raise ValueError("origins and forks must have the same length.")
+    if len(origins) < 2:
+        raise ValueError("origins and forks must have length >= 2.")
+
+    initiations: List[int] = []
+    terminations: List[int] = []
+    divisions: List[int] = []
+
+    # Scan adjacent pairs (i -> i+1), record i+1 on matching rule
+    for i in range(len(origins) - 1):
+        d_o = origins[i + 1] - origins[i]
+        d_f = forks[i + 1] - forks[i]
+
+        if d_o > 0 and d_f > 0:
+            initiations.append(i + 1)
+        elif d_o < 0 and d_f < 0:
+            divisions.append(i + 1)
+        elif d_o == 0 and d_f < 0:
+            terminations.append(i + 1)
+
+    return initiations, terminations, divisions
+
+def initiation_volumes(simulation_data, burn_in=1./3.):
+    """
+        Volumes at the initiation events of a run_simulation output, dropping the first
+        `burn_in` fraction of the events (transient from the initial condition).
+    """
+    volume = simulation_data["volume"]
+    initiations, _, _ = get_discontinuities(simulation_data["origins"], simulation_data["n_forks"])
+    volume_at_in = [volume[ind] for ind in initiations]
+    return np.asarray(volume_at_in[int(len(volume_at_in)*burn_in):], dtype=float)
+
+def cv(values):
+    values = np.asarray(values, dtype=float)
+    return np.sqrt(np.var(values))/np.mean(values)
+
+def bootstrap_cv(values, n_boot=200, rng=None):
+    """
+        CV of values and its bootstrap standard error. Returns (nan, nan) for fewer than 3 values.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) < 3:
+        return np.nan, np.nan
+    rng = np.random.default_rng(rng)
+    samples = values[rng.integers(0, len(values), size=(n_boot, len(values)))]
+    cvs = np.sqrt(np.var(samples, axis=1))/np.mean(samples, axis=1)
+    return cv(values), float(np.std(cvs, ddof=1))
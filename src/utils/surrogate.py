@@ -0,0 +1,273 @@
+"""
+surrogate.py
+
+Gaussian-process surrogate of a noisy simulation output (by default the log CV of the initiation
+volume) and a batch Bayesian optimizer that minimizes it over the parameters of a sweep spec.
+
+The swept parameters (spec["params"], ranges with min_val/max_val and a scale) are mapped to the
+unit cube. The GP uses an ARD Matern 5/2 kernel, a per-point noise variance taken from the
+bootstrap error of each estimate, and hyperparameters fitted by maximum marginal likelihood.
+New points are chosen by expected improvement over a random candidate set; a batch is built with
+the "kriging believer" heuristic (each selected point is added to the GP with its predicted mean
+before the next one is chosen), so that a whole batch can be simulated in parallel.
+"""
+
+import json
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve
+from scipy.optimize import minimize
+from scipy.stats import norm
+from src.utils.adaptive_sweep import initiation_cv
+from src.utils.monitor import Monitored
+from src.utils.sweep import normalize_spec, apply_values, resolve, run_bounded, from_unit, to_unit
+
+def matern52(X1, X2, lengthscales, variance):
+    d = np.sqrt(np.sum(((X1[:, None, :] - X2[None, :, :])/lengthscales)**2, axis=-1))*np.sqrt(5.)
+    return variance*(1. + d + d**2/3.)*np.exp(-d)
+
+class GaussianProcess:
+    """
+        GP regression on the unit cube with heteroscedastic noise.
+
+        Attributes:
+            X (ndarray): Training inputs, shape (n, d).
+            y (ndarray): Training targets, shape (n,).
+            noise (ndarray): Noise variance of each target.
+            theta (ndarray): log of (lengthscales..., signal variance, nugget), in units of the
+                standardized targets.
+    """
+    def __init__(self, X, y, noise, theta=None):
+        self.X = np.atleast_2d(np.asarray(X, dtype=float))
+        self.y = np.asarray(y, dtype=float)
+        self.noise = np.asarray(noise, dtype=float)
+        self.y_mean = float(np.mean(self.y))
+        self.y_std = float(np.std(self.y)) or 1.
+        if theta is None:
+            theta = self.fit()
+        self.set_theta(theta)
+
+    def _cholesky(self, theta):
+        d = self.X.shape[1]
+        lengthscales, variance, nugget = np.exp(theta[:d]), np.exp(theta[d]), np.exp(theta[d+1])
+        K = matern52(self.X, self.X, lengthscales, variance)
+        K[np.diag_indices_from(K)] += self.noise/self.y_std**2 + nugget + 1e-10
+        return cho_factor(K, lower=True)
+
+    def neg_log_likelihood(self, theta):
+        y = (self.y - self.y_mean)/self.y_std
+        try:
+            L = self._cholesky(theta)
+        except np.linalg.LinAlgError:
+            return 1e10
+        alpha = cho_solve(L, y)
+        return 0.5*y@alpha + np.sum(np.log(np.diag(L[0]))) + 0.5*len(y)*np.log(2*np.pi)
+
+    def fit(self, restarts=5, rng=0):
+        """
+            Maximum marginal likelihood estimate of theta, from several random starting points.
+        """
+        d = self.X.shape[1]
+        bounds = [(np.log(1e-2), np.log(10.))]*d + [(np.log(1e-2), np.log(1e2)), (np.log(1e-6), np.log(1.))]
+        rng = np.random.default_rng(rng)
+        best = None
+        for i in range(restarts):
+            start = np.array([np.log(0.3)]*d + [0., np.log(1e-2)]) if i==0 else \
+                    np.array([rng.uniform(lo, hi) for lo, hi in bounds])
+            result = minimize(self.neg_log_likelihood, start, method="L-BFGS-B", bounds=bounds)
+            if best is None or result.fun < best.fun:
+                best = result
+        return best.x
+
+    def set_theta(self, theta):
+        self.theta = np.asarray(theta, dtype=float)
+        d = self.X.shape[1]
+        self.lengthscales, self.variance = np.exp(self.theta[:d]), np.exp(self.theta[d])
+        self.L = self._cholesky(self.theta)
+        self.alpha = cho_solve(self.L, (self.y - self.y_mean)/self.y_std)
+
+    def predict(self, X, full_cov=False):
+        """
+            Posterior mean and standard deviation (or covariance) of the latent function at X.
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        Ks = matern52(X, self.X, self.lengthscales, self.variance)
+        mean = Ks@self.alpha
+        v = cho_solve(self.L, Ks.T)
+        if full_cov:
+            cov = matern52(X, X, self.lengthscales, self.variance) - Ks@v
+            return self.y_mean + self.y_std*mean, self.y_std**2*cov
+        var = np.maximum(self.variance - np.sum(Ks*v.T, axis=1), 1e-12)
+        return self.y_mean + self.y_std*mean, self.y_std*np.sqrt(var)
+
+    def condition(self, X_new, y_new, noise_new):
+        """
+            Returns a GP with extra observations and the same hyperparameters (no refit).
+        """
+        return GaussianProcess(np.vstack([self.X, X_new]), np.concatenate([self.y, y_new]),
+                               np.concatenate([self.noise, noise_new]), theta=self.theta)
+
+def expected_improvement(mean, std, best, xi=0.):
+    """
+        Expected improvement below `best` for minimization.
+    """
+    z = (best - mean - xi)/std
+    return (best - mean - xi)*norm.cdf(z) + std*norm.pdf(z)
+
+class Surrogate:
+    """
+        A fitted GP together with the sweep spec that maps parameter values to the unit cube.
+        predict takes parameter values, e.g. surrogate.predict({"COOP": ys, "CHANGE": 1.2}).
+    """
+    def __init__(self, gp, spec):
+        self.gp = gp
+        self.spec = spec
+        self.names = list(spec["params"])
+
+    def to_unit(self, points):
+        values = np.broadcast_arrays(*(np.asarray(points[name], dtype=float) for name in self.names))
+        return np.stack([to_unit(value, self.spec["params"][name]) for name, value in zip(self.names, values)], axis=-1)
+
+    def predict(self, points):
+        U = self.to_unit(points)
+        mean, std = self.gp.predict(U.reshape(-1, len(self.names)))
+        return mean.reshape(U.shape[:-1]), std.reshape(U.shape[:-1])
+
+    def save(self, path):
+        np.savez(path, X=self.gp.X, y=self.gp.y, noise=self.gp.noise, theta=self.gp.theta,
+                 spec=json.dumps(self.spec))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        gp = GaussianProcess(data["X"], data["y"], data["noise"], theta=data["theta"])
+        return cls(gp, json.loads(str(data["spec"])))
+
+def _evaluate(task):
+    _, measure, cfg, point = task
+    # a Monitored measurement reports the sweep point along with its progress
+    return measure(cfg, point=point) if isinstance(measure, Monitored) else measure(cfg)
+
+class SurrogateOptimizer:
+    """
+        Batch Bayesian minimization of log(measure) over the swept parameters of spec.
+
+        Arguments:
+            cfg: Base configuration.
+            spec: Sweep spec whose params are min_val/max_val ranges; fixed values and derived
+                rules are applied to every point as in iter_configs.
+            measure: Function cfg -> (value, error), picklable; by default initiation_cv. A Monitored
+                measure also gets the point of cfg.
+            n_candidates (int): Random candidates scored by expected improvement at each step.
+            seed: Seed of the candidate and initial-design generator.
+    """
+    def __init__(self, cfg, spec, measure=initiation_cv, n_candidates=2000, seed=0):
+        self.spec = normalize_spec(spec)
+        self.base = apply_values(cfg, self.spec["fixed"])
+        self.names = list(self.spec["params"])
+        self.measure = measure
+        self.n_candidates = n_candidates
+        self.rng = np.random.default_rng(seed)
+        self.U, self.value, self.error = [], [], []
+        self.gp = None
+
+    def point(self, u):
+        return {name: from_unit(u[k], self.spec["params"][name]) for k, name in enumerate(self.names)}
+
+    def evaluate(self, U, max_workers=None):
+        points = [self.point(u) for u in U]
+        items = [(i, self.measure, resolve(self.base, self.spec, point), point) for i, point in enumerate(points)]
+        if max_workers==1:
+            results = list(map(_evaluate, items))
+        else:
+            done = {item[0]: result for item, result in run_bounded(_evaluate, items, max_workers=max_workers)}
+            results = [done[i] for i in range(len(items))]
+        for u, (value, error) in zip(U, results):
+            self.U.append(np.asarray(u, dtype=float))
+            self.value.append(float(value))
+            self.error.append(float(error))
+
+    def targets(self):
+        """
+            log values and their noise variances (delta method). Failed measurements get the
+            largest observed log value, so that the optimizer moves away from them.
+        """
+        value, error = np.asarray(self.value), np.asarray(self.error)
+        ok = np.isfinite(value) & (value > 0)
+        y = np.full(len(value), np.max(np.log(value[ok])) if np.any(ok) else 0.)
+        y[ok] = np.log(value[ok])
+        noise = np.where(ok & np.isfinite(error), (error/np.where(ok, value, 1.))**2, 1.)
+        return y, noise
+
+    def fit(self):
+        y, noise = self.targets()
+        self.gp = GaussianProcess(np.array(self.U), y, noise)
+        return self.gp
+
+    def select_batch(self, batch):
+        """
+            Chooses `batch` new points by expected improvement with the kriging believer heuristic.
+        """
+        gp = self.gp
+        best = np.min(gp.predict(gp.X)[0])
+        candidates = self.rng.random((self.n_candidates, len(self.names)))
+        chosen = []
+        for _ in range(batch):
+            mean, std = gp.predict(candidates)
+            i = int(np.argmax(expected_improvement(mean, std, best)))
+            chosen.append(candidates[i])
+            gp = gp.condition(candidates[i:i+1], mean[i:i+1], np.zeros(1))
+            candidates = np.delete(candidates, i, axis=0)
+        return chosen
+
+    def run(self, budget, n_initial=None, batch=4, max_workers=None, callback=None):
+        """
+            Latin-hypercube initial design of n_initial points (default: max(5, 2*dim+1)), then
+            batches chosen by expected improvement until `budget` simulations have been run.
+        """
+        d = len(self.names)
+        n_initial = min(n_initial or max(5, 2*d + 1), budget)
+        strata = np.array([self.rng.permutation(n_initial) for _ in range(d)]).T
+        self.evaluate((strata + self.rng.random((n_initial, d)))/n_initial, max_workers=max_workers)
+        self.fit()
+        if callback is not None:
+            callback(self)
+        while len(self.value) < budget:
+            self.evaluate(self.select_batch(min(batch, budget - len(self.value))), max_workers=max_workers)
+            self.fit()
+            if callback is not None:
+                callback(self)
+        return self.optimum()
+
+    def optimum(self, n_samples=500, n_grid=1000):
+        """
+            Minimum of the posterior mean, with its uncertainty from joint posterior samples:
+            for each sample the location and value of its minimum over a candidate set are
+            recorded, and their spread is reported.
+        """
+        candidates = np.vstack([np.array(self.U), self.rng.random((n_grid, len(self.names)))])
+        mean, std = self.gp.predict(candidates)
+        i = int(np.argmin(mean))
+        # joint samples on the most promising candidates
+        top = np.argsort(mean - 2*std)[:200]
+        mu, cov = self.gp.predict(candidates[top], full_cov=True)
+        L = np.linalg.cholesky(cov + 1e-9*np.eye(len(top)))
+        samples = mu + self.rng.standard_normal((n_samples, len(top)))@L.T
+        argmins = candidates[top][np.argmin(samples, axis=1)]
+        locations = [self.point(u) for u in argmins]
+        return {
+            "point": self.point(candidates[i]),
+            "log_value": float(mean[i]),
+            "log_value_std": float(std[i]),
+            "value": float(np.exp(mean[i])),
+            "point_quantiles": {name: [float(q) for q in np.quantile([p[name] for p in locations], [0.05, 0.5, 0.95])]
+                                for name in self.names},
+            "min_log_value_quantiles": [float(q) for q in np.quantile(np.min(samples, axis=1), [0.05, 0.5, 0.95])],
+            "evaluations": len(self.value),
+        }
+
+    def surrogate(self):
+        return Surrogate(self.gp, self.spec)
+
+    def history(self):
+        return [{"point": self.point(u), "value": value, "error": error}
+                for u, value, error in zip(self.U, self.value, self.error)]
@@ -0,0 +1,282 @@
+"""
+sweep.py
+
+Parameter sweeps over any field of ModelParams or SimulationParams.
+
+A sweep spec (usually loaded from a YAML in src/configs/sweeps) looks like
+
+    type: "grid"            # grid | zip | random | lhs | list
+    samples: 100            # random and lhs only
+    seed: 0                 # random and lhs only
+    fixed:                  # values applied to the base config before anything else
+      CHANGE: 1.05
+    params:
+      COOP:                 # a range ...
+        scale: "log"
+        min_val: 1.0
+        max_val: 2000.0
+        steps: 8
+      simulation.T_MAX:     # ... or explicit values
+        values: [1000., 2000.]
+    derived: ["chi0", "change_kori"]
+
+For "list" sweeps, params is replaced by `points`, a list of {field: value} dicts.
+The older single-parameter format (param, scale, min_val, max_val, steps at the top level)
+is still accepted.
+
+iter_configs expands a spec lazily: it yields one resolved Config at a time, so that large
+sweeps can be streamed into an executor (run_bounded) without building the whole product.
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import fields, replace
+import numpy as np
+import yaml
+from src.utils.config import ModelParams, SimulationParams
+from src.utils.compiled_config import compile_config
+from src.utils.optimal_parameters import optimal_table
+
+MODES = ("grid", "zip", "random", "lhs", "list")
+MODEL_FIELDS = {f.name for f in fields(ModelParams)}
+SIMULATION_FIELDS = {f.name for f in fields(SimulationParams)}
+
+# derived parameters, applied in the order listed in the spec to the model of each point:
+# rule -> (ModelParams field that is set, column of optimal_parameters.optimal_table)
+DERIVED = {
+    "chi0": ("CHI0", "chi0"),
+    # K_OPEN that is still optimal for the cooperativity of the point (change_kori in the sweep scripts)
+    "change_kori": ("K_OPEN", "K_OPEN"),
+    "y_opt": ("COOP", "y_opt"),
+}
+# ModelParams fields the optimal table depends on (besides REGIME)
+TABLE_FIELDS = ("SITES", "REP_TIME", "GROWTH_RATE", "D", "DNAA_CONCENTRATION", "CHANGE", "COOP",
+                "K_OPEN", "E_COST", "ORIGIN_SITES", "K")
+CHUNK = 1024
+# derived rules of the scripts when the spec lists none: CHI0 from CHANGE and K_OPEN re-optimized
+# for COOP, as in the original COOP x CHANGE grid
+DEFAULT_DERIVED = ("chi0", "change_kori")
+
+def load_sweep(path):
+    with open(path) as f:
+        return normalize_spec(yaml.safe_load(f))
+
+def load_spec(path, default_derived=DEFAULT_DERIVED):
+    """
+        The sweep at path, with the default_derived rules if it lists none. A default rule that
+        would overwrite a swept field (e.g. change_kori when K_OPEN is in params) is left out.
+    """
+    spec = load_sweep(path)
+    if not spec["derived"]:
+        swept = {split_name(name)[1] for name in spec["params"]}
+        spec["derived"] = [rule for rule in default_derived if DERIVED[rule][0] not in swept]
+    return spec
+
+def normalize_spec(spec):
+    """
+        Returns a copy of spec in the current format, checking the mode, field names and derived rules.
+    """
+    spec = dict(spec)
+    if "param" in spec and "params" not in spec:
+        spec["params"] = {spec.pop("param"): {key: spec.pop(key) for key in ("scale", "min_val", "max_val", "steps")
+                                              if key in spec}}
+    spec.setdefault("type", "grid")
+    spec.setdefault("params", {})
+    spec.setdefault("fixed", {})
+    spec.setdefault("derived", [])
+    if spec["type"] not in MODES:
+        raise ValueError("unknown sweep type: %s (expected one of %s)"%(spec["type"], ", ".join(MODES)))
+    names = list(spec["params"]) + list(spec["fixed"])
+    for point in spec.get("points", []):
+        names += list(point)
+    for name in names:
+        split_name(name)
+    for rule in spec["derived"]:
+        if rule not in DERIVED:
+            raise KeyError("unknown derived parameter: %s"%rule)
+    if spec["type"]=="list" and "points" not in spec:
+        raise ValueError("list sweeps need a `points` entry")
+    if spec["type"] in ("random", "lhs") and "samples" not in spec:
+        raise ValueError("%s sweeps need a `samples` entry"%spec["type"])
+    return spec
+
+def split_name(name):
+    """
+        Maps "COOP", "model.COOP", "T_MAX" or "simulation.T_MAX" to (section, field).
+    """
+    section, _, field = name.rpartition(".")
+    if section in ("", "model") and field in MODEL_FIELDS:
+        return "model", field
+    if section in ("", "simulation") and field in SIMULATION_FIELDS:
+        return "simulation", field
+    raise KeyError("unknown sweep parameter: %s"%name)
+
+def get_range(sweep_dict):
+    """
+        Values of one swept parameter: an explicit list, or steps points between min_val and max_val
+        on a "log" or "linear" scale.
+    """
+    if "values" in sweep_dict:
+        return np.asarray(sweep_dict["values"], dtype=float)
+    steps = sweep_dict["steps"]
+    if sweep_dict.get("scale", "linear")=="log":
+        return np.exp(np.linspace(np.log(sweep_dict["min_val"]), np.log(sweep_dict["max_val"]), steps))
+    return np.linspace(sweep_dict["min_val"], sweep_dict["max_val"], steps)
+
+def from_unit(u, sweep_dict):
+    """
+        Maps u in [0, 1) to the range of a parameter (used by random and lhs sweeps).
+    """
+    if "values" in sweep_dict:
+        values = sweep_dict["values"]
+        return float(values[min(int(u*len(values)), len(values)-1)])
+    lo, hi = sweep_dict["min_val"], sweep_dict["max_val"]
+    if sweep_dict.get("scale", "linear")=="log":
+        return float(np.exp(np.log(lo) + u*(np.log(hi) - np.log(lo))))
+    return float(lo + u*(hi - lo))
+
+def to_unit(value, sweep_dict):
+    """
+        Inverse of from_unit for min_val/max_val ranges.
+    """
+    lo, hi = sweep_dict["min_val"], sweep_dict["max_val"]
+    if sweep_dict.get("scale", "linear")=="log":
+        return (np.log(value) - np.log(lo))/(np.log(hi) - np.log(lo))
+    return (np.asarray(value) - lo)/(hi - lo)
+
+def zip_length(ranges):
+    """
+        Common length of the ranges of a zip sweep; raises ValueError if they differ.
+    """
+    lengths = [len(values) for values in ranges]
+    if len(set(lengths)) > 1:
+        raise ValueError("zip sweeps need ranges of equal length, got %s"%lengths)
+    return lengths[0] if lengths else 0
+
+def iter_points(spec):
+    """
+        Lazily yields the swept values of each point as a dict {name: value}.
+    """
+    params = spec["params"]
+    names = list(params)
+    mode = spec["type"]
+    if mode=="list":
+        for point in spec["points"]:
+            yield dict(point)
+    elif mode=="grid":
+        for values in itertools.product(*(get_range(params[name]) for name in names)):
+            yield {name: float(value) for name, value in zip(names, values)}
+    elif mode=="zip":
+        ranges = [get_range(params[name]) for name in names]
+        zip_length(ranges)
+        for values in zip(*ranges):
+            yield {name: float(value) for name, value in zip(names, values)}
+    else:
+        rng = np.random.default_rng(spec.get("seed"))
+        n = spec["samples"]
+        if mode=="lhs":
+            # one stratum per sample and dimension, strata shuffled independently per dimension
+            strata = np.array([rng.permutation(n) for _ in names]).reshape(len(names), n)
+        for i in range(n):
+            u = rng.random(len(names))
+            if mode=="lhs":
+                u = (strata[:, i] + u)/n
+            yield {name: from_unit(u[k], params[name]) for k, name in enumerate(names)}
+
+def sweep_size(spec):
+    mode = spec["type"]
+    if mode=="list":
+        return len(spec["points"])
+    if mode in ("random", "lhs"):
+        return spec["samples"]
+    ranges = [get_range(value) for value in spec["params"].values()]
+    if mode=="zip":
+        return zip_length(ranges)
+    return int(np.prod([len(values) for values in ranges]))
+
+def apply_values(cfg, values):
+    """
+        Returns cfg with the fields in values ({name: value}) replaced.
+    """
+    updates = {"model": {}, "simulation": {}}
+    for name, value in values.items():
+        section, field = split_name(name)
+        old = getattr(getattr(cfg, section), field)
+        updates[section][field] = int(round(value)) if isinstance(old, int) and not isinstance(old, bool) else value
+    return replace(cfg,
+                   model=replace(cfg.model, **updates["model"]),
+                   simulation=replace(cfg.simulation, **updates["simulation"]))
+
+def derive(cfgs, rules):
+    """
+        Applies the derived rules to a list of configs. Each rule is one vectorized optimal_table
+        over all the configs with the same REGIME, instead of one scalar derivation per point.
+    """
+    cfgs = list(cfgs)
+    for rule in rules:
+        field, column = DERIVED[rule]
+        groups = {}
+        for i, cfg in enumerate(cfgs):
+            groups.setdefault(cfg.model.REGIME, []).append(i)
+        for indices in groups.values():
+            table = optimal_table(cfgs[indices[0]], **{name: [getattr(cfgs[i].model, name) for i in indices]
+                                                      for name in TABLE_FIELDS})
+            for i, value in zip(indices, table[column].tolist()):
+                cfgs[i] = replace(cfgs[i], model=replace(cfgs[i].model, **{field: value}))
+    return cfgs
+
+def resolve(cfg, spec, point):
+    """
+        Applies one point of the sweep to the base config, then the derived parameters.
+    """
+    return derive([apply_values(cfg, point)], spec["derived"])[0]
+
+def check_point(point, cfg):
+    """
+        Raises ValueError, naming the point, if its resolved config does not compile (e.g. no
+        ongoing replication at initiation, or a degenerate derived parameter).
+    """
+    try:
+        compile_config(cfg)
+    except ValueError as error:
+        raise ValueError("sweep point %s: %s"%(point, error)) from None
+
+def iter_configs(cfg, spec, chunk=CHUNK):
+    """
+        Generator of (point, config) pairs, one per point of the sweep. Points are expanded
+        `chunk` at a time, and the derived parameters of a chunk come from a single table.
+        Every config of a chunk is checked with check_point before the first one is yielded, so an
+        invalid point is rejected while the sweep is expanded rather than when it runs.
+    """
+    spec = normalize_spec(spec)
+    base = apply_values(cfg, spec["fixed"])
+    points = iter_points(spec)
+    while True:
+        batch = list(itertools.islice(points, chunk))
+        if not batch:
+            return
+        cfgs = derive([apply_values(base, point) for point in batch], spec["derived"])
+        for point, cfg0 in zip(batch, cfgs):
+            check_point(point, cfg0)
+        yield from zip(batch, cfgs)
+
+def run_bounded(func, items, max_workers=None, max_pending=None):
+    """
+        Applies func to every item in a process pool, keeping at most max_pending tasks submitted
+        at any time, so that items can come from a lazy generator. Yields (item, result) pairs in
+        completion order.
+    """
+    max_pending = max_pending or 2*(max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        items = iter(items)
+        for item in itertools.islice(items, max_pending):
+            pending[executor.submit(func, item)] = item
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                yield item, future.result()
+                for new_item in itertools.islice(items, 1):
+                    pending[executor.submit(func, new_item)] = new_item
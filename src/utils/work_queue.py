@@ -0,0 +1,326 @@
+"""
+work_queue.py
+
+SQLite-backed queue of sweep points, shared by any number of workers on any host that sees the
+database file (e.g. on a shared filesystem).
+
+Every point is stored with its full resolved configuration and keyed by its content hash
+(compiled_config.config_hash), so enqueueing the same sweep twice does not duplicate work.
+A worker claims a point inside a BEGIN IMMEDIATE transaction, which takes the database write lock,
+so two workers never claim the same point. While it runs, the worker updates a heartbeat; points
+whose heartbeat is older than `timeout` (crashed or killed worker) go back to the queue, until
+they have been attempted max_attempts times. Results are written to
+<output_dir>/<hash>.json (or .json.gz), with output_dir taken from the Config of the point.
+ResultWriter writes them from a background thread, for loops that should not wait on the disk.
+
+The rollback journal (not WAL) is used, since WAL needs shared memory that network filesystems
+do not provide.
+"""
+
+import gzip
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import asdict
+from queue import Empty, Queue
+from src.utils.compiled_config import config_hash
+from src.utils.config_loader import config_from_dict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    point TEXT NOT NULL,
+    config TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    heartbeat REAL,
+    result TEXT,
+    error TEXT,
+    created REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS points_status ON points (status, id);
+"""
+
+STATUSES = ("pending", "running", "done", "failed")
+
+def worker_name():
+    return "%s-%d"%(socket.gethostname(), os.getpid())
+
+class WorkQueue:
+    """
+        Arguments:
+            path (str): SQLite database file, created if needed.
+            timeout (float): Seconds without heartbeat after which a running point is requeued.
+            max_attempts (int): Attempts after which a point is marked as failed.
+    """
+    def __init__(self, path, timeout=300., max_attempts=3):
+        self.path = path
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.db = self.connect()
+        self.db.executescript(SCHEMA)
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=60., isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def enqueue(self, configs, batch=1000):
+        """
+            Adds the (point, cfg) pairs of an iterable (e.g. sweep.iter_configs) in transactions of
+            `batch` points. Returns the number of new points.
+        """
+        added = 0
+        rows = []
+        for point, cfg in configs:
+            rows.append((config_hash(cfg), json.dumps(point), json.dumps(asdict(cfg)), time.time()))
+            if len(rows) >= batch:
+                added += self._insert(rows)
+                rows = []
+        if rows:
+            added += self._insert(rows)
+        return added
+
+    def _insert(self, rows):
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            before = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO points (key, point, config, created) VALUES (?, ?, ?, ?)", rows)
+            return self.db.total_changes - before
+
+    def requeue_stale(self):
+        """
+            Puts back the running points whose worker stopped sending heartbeats.
+            Must be called inside a write transaction.
+        """
+        limit = time.time() - self.timeout
+        self.db.execute("UPDATE points SET status='failed', error='heartbeat lost', worker=NULL "
+                        "WHERE status='running' AND heartbeat < ? AND attempts >= ?", (limit, self.max_attempts))
+        self.db.execute("UPDATE points SET status='pending', worker=NULL "
+                        "WHERE status='running' AND heartbeat < ?", (limit,))
+
+    def claim(self, worker):
+        """
+            Atomically takes the oldest pending point. Returns (id, point, cfg), or None if there is
+            nothing left to claim.
+        """
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.requeue_stale()
+            row = self.db.execute("SELECT id, point, config FROM points WHERE status='pending' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE points SET status='running', worker=?, heartbeat=?, attempts=attempts+1 WHERE id=?",
+                            (worker, time.time(), row["id"]))
+        return row["id"], json.loads(row["point"]), config_from_dict(json.loads(row["config"]))
+
+    def heartbeat(self, point_id, worker, db=None):
+        """
+            Returns False if the point is no longer owned by the worker (it was requeued).
+        """
+        db = db or self.db
+        with db:
+            cursor = db.execute("UPDATE points SET heartbeat=? WHERE id=? AND worker=? AND status='running'",
+                                (time.time(), point_id, worker))
+        return cursor.rowcount==1
+
+    def complete(self, point_id, worker, result):
+        with self.db:
+            self.db.execute("UPDATE points SET status='done', result=?, finished=?, error=NULL "
+                            "WHERE id=? AND worker=?", (result, time.time(), point_id, worker))
+
+    def fail(self, point_id, worker, error):
+        with self.db:
+            self.db.execute("UPDATE points SET status=CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                            "error=?, worker=NULL WHERE id=? AND worker=?",
+                            (self.max_attempts, error, point_id, worker))
+
+    def retry_failed(self):
+        with self.db:
+            return self.db.execute("UPDATE points SET status='pending', attempts=0 WHERE status='failed'").rowcount
+
+    def status(self):
+        counts = dict.fromkeys(STATUSES, 0)
+        for row in self.db.execute("SELECT status, COUNT(*) AS n FROM points GROUP BY status"):
+            counts[row["status"]] = row["n"]
+        return counts
+
+class Heartbeat:
+    """
+        Background thread sending heartbeats for a claimed point, with its own connection.
+        lost is set if the point was taken away from the worker.
+    """
+    def __init__(self, queue, point_id, worker, interval):
+        self.queue, self.point_id, self.worker, self.interval = queue, point_id, worker, interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        db = self.queue.connect()
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    if not self.queue.heartbeat(self.point_id, self.worker, db=db):
+                        self.lost = True
+                except sqlite3.OperationalError:
+                    # database busy: try again at the next interval
+                    pass
+        finally:
+            db.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+COMPRESSLEVEL = 6
+
+def result_path(cfg, compress=False):
+    return os.path.join(cfg.output_dir, "%s.json%s"%(config_hash(cfg), ".gz" if compress else ""))
+
+def find_result(cfg):
+    """
+        Path of the stored result of cfg, compressed or not, or None if there is none.
+    """
+    for compress in (False, True):
+        path = result_path(cfg, compress)
+        if os.path.exists(path):
+            return path
+    return None
+
+def write_result(cfg, point, data, compress=False):
+    """
+        Writes data to <cfg.output_dir>/<config hash>.json (.json.gz with compress) atomically,
+        replacing a result of cfg in the other format. Returns the path.
+    """
+    os.makedirs(cfg.output_dir, exist_ok=True)
+    path = result_path(cfg, compress)
+    tmp = "%s.%s.%d.tmp"%(path, worker_name(), threading.get_ident())
+    opener = gzip.open(tmp, "wt", compresslevel=COMPRESSLEVEL) if compress else open(tmp, "w")
+    with opener as f:
+        json.dump({"point": point, "config": asdict(cfg), "simulation_data": data}, f)
+    os.replace(tmp, path)
+    try:
+        os.remove(result_path(cfg, not compress))
+    except FileNotFoundError:
+        pass
+    return path
+
+def read_result(cfg):
+    """
+        The {"point", "config", "simulation_data"} dict written by write_result for cfg, or None if
+        there is no result for it yet.
+    """
+    path = find_result(cfg)
+    if path is None:
+        return None
+    with (gzip.open(path, "rt") if path.endswith(".gz") else open(path)) as f:
+        return json.load(f)
+
+class ResultWriter:
+    """
+        Writes results with write_result from a background thread, so that the loop producing
+        them does not wait on serialization, compression and disk. submit() blocks only while
+        maxsize results are already waiting, which caps the memory held by the queue.
+
+        A failed write does not stop the thread: the results queued after it are still written,
+        and the error is raised by the next submit() and by close(). close(), or leaving the with
+        block, returns once everything submitted is on disk. If the main thread ends without
+        closing the writer (e.g. on an uncaught exception), the thread, which is not a daemon,
+        writes what is left in the queue before the interpreter exits.
+
+        Arguments:
+            maxsize (int): Results waiting in the queue at most.
+            compress (bool): Write .json.gz instead of .json.
+    """
+    def __init__(self, maxsize=2, compress=True):
+        self.compress = compress
+        self.paths = []
+        self.errors = []
+        self.waited = 0.  # seconds submit() spent blocked on a full queue
+        self._queue = Queue(maxsize)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="result-writer")
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=0.2)
+            except Empty:
+                if threading.main_thread().is_alive() or not self._queue.empty():
+                    continue
+                return
+            if item is None:
+                return
+            cfg, point, data = item
+            try:
+                self.paths.append(write_result(cfg, point, data, compress=self.compress))
+            except Exception as error:
+                self.errors.append((point, error))
+
+    def _raise(self):
+        if self.errors:
+            point, error = self.errors[0]
+            raise RuntimeError("writing the result of point %s failed (%d failed writes)"
+                               %(point, len(self.errors))) from error
+
+    def submit(self, cfg, point, data):
+        """
+            Queues data for <cfg.output_dir>; data must not be modified afterwards.
+        """
+        self._raise()
+        if self._closed:
+            raise RuntimeError("submit on a closed ResultWriter")
+        start = time.perf_counter()
+        self._queue.put((cfg, point, data))
+        self.waited += time.perf_counter() - start
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+        self._raise()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def run_worker(queue, run, worker=None, heartbeat=30., max_points=None):
+    """
+        Claims and runs points until the queue is empty (or max_points have been run).
+        run(cfg) returns the data written to the result file. Returns the number of completed points.
+    """
+    worker = worker or worker_name()
+    done = 0
+    while max_points is None or done < max_points:
+        claimed = queue.claim(worker)
+        if claimed is None:
+            break
+        point_id, point, cfg = claimed
+        print("%s: point %d %s"%(worker, point_id, point))
+        try:
+            with Heartbeat(queue, point_id, worker, heartbeat) as beat:
+                data = run(cfg)
+            if beat.lost:
+                print("%s: point %d was requeued while running, result discarded"%(worker, point_id))
+                continue
+            queue.complete(point_id, worker, write_result(cfg, point, data))
+            done += 1
+        except Exception as error:
+            queue.fail(point_id, worker, "%s: %s"%(type(error).__name__, error))
+            print("%s: point %d failed: %r"%(worker, point_id, error))
+    return done
@@ -0,0 +1,12 @@
+import numpy as np
+from src.utils.config_loader import load_config
+from src.utils.inference import ABCSMC
+from src.utils.sweep import load_spec
+
+def test_degenerate_change_rejected():
+    spec = load_spec("src/configs/sweeps/abc_prior.yaml")
+    abc = ABCSMC(load_config("src/configs/base.yaml"), spec, {"initiation_volume_mean": 1.})
+    assert abc.admissible(np.array([0.5, 0.]))
+    spec["params"]["CHANGE"] = {"min_val": 1., "max_val": 1.5}
+    abc = ABCSMC(load_config("src/configs/base.yaml"), spec, {"initiation_volume_mean": 1.})
+    assert not abc.admissible(np.array([0.5, 0.]))
@@ -0,0 +1,24 @@
+import gc
+import numpy as np
+from src.utils.shared_results import SharedTrajectory, run_shared
+
+def _trajectory(n):
+    return {"time": np.arange(n, dtype=float), "origins": np.full(n, n, dtype=int)}
+
+def test_view_after_release():
+    handle = SharedTrajectory.export(_trajectory(1000))
+    arrays = handle.attach()
+    view = arrays["time"]
+    arrays.release()
+    del arrays
+    gc.collect()
+    assert view.sum() == 999*1000/2
+
+def test_views_kept_across_run_shared():
+    kept = []
+    for n, arrays in run_shared(_trajectory, [10, 20, 30], max_workers=1):
+        kept.append((n, arrays["time"], arrays["origins"]))
+    gc.collect()
+    for n, time, origins in kept:
+        assert np.array_equal(time, np.arange(n))
+        assert np.all(origins == n)
@@ -0,0 +1,23 @@
+import pytest
+from src.utils.config_loader import load_config
+from src.utils.sweep import iter_configs, iter_points, load_spec, sweep_size
+
+CONFIG = "src/configs/base.yaml"
+
+def test_lhs_sweep_resolves():
+    spec = load_spec("src/configs/sweeps/lhs_coop_growth.yaml")
+    assert len(list(iter_configs(load_config(CONFIG), spec))) == spec["samples"]
+
+def test_point_without_replication_rejected():
+    spec = {"type": "list", "points": [{"GROWTH_RATE": 0.03}, {"GROWTH_RATE": 0.017}], "derived": ["chi0"]}
+    with pytest.raises(ValueError, match="no ongoing replication"):
+        next(iter_configs(load_config(CONFIG), spec))
+
+def test_zip_size_matches_points():
+    spec = {"type": "zip", "params": {"COOP": {"values": [1., 2., 3.]}, "CHANGE": {"values": [1.1, 1.2, 1.3]}}}
+    assert sweep_size(spec) == len(list(iter_points(spec))) == 3
+    spec["params"]["CHANGE"]["values"].pop()
+    with pytest.raises(ValueError, match="equal length"):
+        sweep_size(spec)
+    with pytest.raises(ValueError, match="equal length"):
+        list(iter_points(spec))